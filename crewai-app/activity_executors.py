@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+import asyncio
+import functools
+import os
+from temporalio import activity
+
+# Where an activity's work runs:
+#   thread  - a synchronous activity on the worker's ThreadPoolExecutor (good for I/O and for
+#             code that releases the GIL, such as NumPy)
+#   process - an async activity that hands the call to a ProcessPoolExecutor (pure-Python CPU
+#             work that would otherwise hold the GIL); the function and its arguments must pickle
+#   loop    - an async activity that runs the call directly on the event loop
+EXECUTION_MODES = ("thread", "process", "loop")
+
+ACTIVITY_THREADS = int(os.environ.get("ACTIVITY_THREADS", "16"))
+ACTIVITY_PROCESSES = int(os.environ.get("ACTIVITY_PROCESSES", str(os.cpu_count() or 1)))
+
+# Mode per CPU-bound activity; override with ACTIVITY_EXECUTION="name=mode,name=mode"
+DEFAULT_EXECUTION = {
+    # Pure-Python JSON parsing and NumPy reductions over every segment
+    "analyze_message_log": "process",
+    # Parses segments in its own process pool and writes SQLite here, which releases the GIL
+    "reindex_message_log": "thread",
+}
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def execution_modes() -> Dict[str, str]:
+    """The per-activity execution modes, with ACTIVITY_EXECUTION overrides applied"""
+    modes = dict(DEFAULT_EXECUTION)
+    for entry in filter(None, os.environ.get("ACTIVITY_EXECUTION", "").split(",")):
+        name, _, mode = entry.partition("=")
+        if mode.strip() not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode {mode!r} for activity {name!r}")
+        modes[name.strip()] = mode.strip()
+    return modes
+
+def activity_thread_pool() -> ThreadPoolExecutor:
+    """Executor for synchronous activities; pass it to the Worker as activity_executor"""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=ACTIVITY_THREADS, thread_name_prefix="activity")
+    return _thread_pool
+
+def activity_process_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all process-mode activities"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=ACTIVITY_PROCESSES)
+    return _process_pool
+
+def as_activity(fn: Callable, mode: str) -> Callable:
+    """Wrap a plain function as an activity (named after the function) that runs in `mode`"""
+    if mode == "thread":
+        @activity.defn(name=fn.__name__)
+        @functools.wraps(fn)
+        def run_in_thread(*args):
+            return fn(*args)
+        return run_in_thread
+    if mode == "process":
+        @activity.defn(name=fn.__name__)
+        @functools.wraps(fn)
+        async def run_in_process(*args):
+            return await asyncio.get_running_loop().run_in_executor(activity_process_pool(), fn, *args)
+        return run_in_process
+    if mode == "loop":
+        @activity.defn(name=fn.__name__)
+        @functools.wraps(fn)
+        async def run_on_loop(*args):
+            return fn(*args)
+        return run_on_loop
+    raise ValueError(f"Unknown execution mode {mode!r}")
+
+def build_activities(functions: List[Callable], modes: Optional[Dict[str, str]] = None) -> List[Callable]:
+    """Wrap each function according to its configured mode (thread when not configured)"""
+    modes = execution_modes() if modes is None else modes
+    return [as_activity(fn, modes.get(fn.__name__, "thread")) for fn in functions]
+
+def shutdown_executors() -> None:
+    """Shut the pools down; call only after every worker using them has shut down"""
+    global _thread_pool, _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+    if _thread_pool is not None:
+        _thread_pool.shutdown()
+        _thread_pool = None
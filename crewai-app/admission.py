@@ -0,0 +1,198 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Set
+import asyncio
+import contextlib
+import os
+import time
+
+# Target end-to-end latency of an admitted crew, and the early signals that it is about to be
+# missed: tasks waiting on a task queue, or LLM calls waiting on the worker's limiter
+ADMISSION_LATENCY_SLO = float(os.environ.get("ADMISSION_LATENCY_SLO_SECONDS", "300"))
+ADMISSION_BACKLOG_AGE = float(os.environ.get("ADMISSION_BACKLOG_AGE_SECONDS", "10"))
+ADMISSION_LLM_WAIT = float(os.environ.get("ADMISSION_LLM_WAIT_SECONDS", "5"))
+
+# Bounds of the number of crews in flight, and how the limit moves between them
+ADMISSION_MIN_IN_FLIGHT = int(os.environ.get("ADMISSION_MIN_IN_FLIGHT", "1"))
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "50"))
+ADMISSION_INTERVAL = float(os.environ.get("ADMISSION_INTERVAL_SECONDS", "5"))
+DECREASE_FACTOR = 0.75  # Multiplicative decrease when overloaded
+INCREASE_HEADROOM = 0.8  # Grow only while recent crews finish this far inside the SLO
+LATENCY_WINDOW = 50  # Recent crew latencies the SLO check looks at
+
+@dataclass
+class LoadSignals:
+    backlog_count: int = 0  # Tasks waiting across the watched task queues
+    backlog_age: float = 0.0  # Age of the oldest of them, in seconds
+    llm_wait: float = 0.0  # Recent LLM limiter wait on the critical path, in seconds
+
+def llm_limiter_wait() -> float:
+    """Recent wait of this worker's critical and normal LLM calls (background work may wait)"""
+    from llm_limiter import LLM_LIMITER
+    waits = LLM_LIMITER.stats()["wait_seconds"]
+    return max(waits["critical"]["recent"], waits["normal"]["recent"])
+
+def temporal_probe(client, task_queues: List[str],
+                   llm_wait: Optional[Callable[[], float]] = llm_limiter_wait) -> Callable[[], Awaitable[LoadSignals]]:
+    """Probe reading workflow and activity backlog of `task_queues` from the server (DescribeTaskQueue)
+    and, when the starter shares a process with a worker, that worker's LLM limiter"""
+    from temporalio.api.enums.v1 import TaskQueueType
+    from temporalio.api.taskqueue.v1 import TaskQueue
+    from temporalio.api.workflowservice.v1 import DescribeTaskQueueRequest
+
+    async def probe() -> LoadSignals:
+        signals = LoadSignals(llm_wait=llm_wait() if llm_wait is not None else 0.0)
+        for task_queue in task_queues:
+            for queue_type in (TaskQueueType.TASK_QUEUE_TYPE_WORKFLOW, TaskQueueType.TASK_QUEUE_TYPE_ACTIVITY):
+                response = await client.workflow_service.describe_task_queue(DescribeTaskQueueRequest(
+                    namespace=client.namespace,
+                    task_queue=TaskQueue(name=task_queue),
+                    task_queue_type=queue_type,
+                    report_stats=True,
+                ))
+                if response.HasField("stats"):
+                    signals.backlog_count += response.stats.approximate_backlog_count
+                    signals.backlog_age = max(signals.backlog_age,
+                                              response.stats.approximate_backlog_age.ToTimedelta().total_seconds())
+        return signals
+    return probe
+
+class AdmissionController:
+    """Caps the crews in flight and queues new starts beyond the cap (first come, first served).
+    The cap follows additive increase / multiplicative decrease: it shrinks when crews miss
+    (or are already running past) the SLO, task queues back up or LLM calls wait too long, and
+    grows by one when the cap is what holds crews back and the crews finished since the last
+    change came in comfortably under the SLO."""
+
+    def __init__(self, probe: Callable[[], Awaitable[LoadSignals]],
+                 latency_slo: float = ADMISSION_LATENCY_SLO,
+                 backlog_age_target: float = ADMISSION_BACKLOG_AGE,
+                 llm_wait_target: float = ADMISSION_LLM_WAIT,
+                 min_in_flight: int = ADMISSION_MIN_IN_FLIGHT,
+                 max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+                 initial_limit: Optional[float] = None):
+        self.probe = probe
+        self.latency_slo = latency_slo
+        self.backlog_age_target = backlog_age_target
+        self.llm_wait_target = llm_wait_target
+        self.min_in_flight = min_in_flight
+        self.max_in_flight = max_in_flight
+        self.limit = float(initial_limit if initial_limit is not None else max_in_flight)
+        self.in_flight = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._started: Deque[float] = deque()  # Start times of crews in flight, oldest first
+        self.signals = LoadSignals()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.trackers: Set[asyncio.Task] = set()  # Keeps start_workflow's trackers alive
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    @asynccontextmanager
+    async def admit(self):
+        """Wait for admission, then count the block as one crew in flight"""
+        if self.in_flight >= int(self.limit) or self.queued:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._finish(None, None)  # Admitted at the same moment; pass the place on
+                raise
+        else:
+            self.in_flight += 1
+        started = time.monotonic()
+        self._started.append(started)
+        try:
+            yield
+        except BaseException:
+            self._finish(started, None)
+            raise
+        self._finish(started, time.monotonic() - started)
+
+    def _finish(self, started: Optional[float], latency: Optional[float]) -> None:
+        self.in_flight -= 1
+        if started is not None:
+            self._started.remove(started)
+        if latency is not None:
+            self.latencies.append(latency)
+        self._admit_waiters()
+
+    def _admit_waiters(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def latency_p90(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[int(len(latencies) * 0.9)]
+
+    def oldest_in_flight(self) -> float:
+        """Age of the longest-running crew in flight, in seconds"""
+        return time.monotonic() - self._started[0] if self._started else 0.0
+
+    def adjust(self, signals: LoadSignals) -> None:
+        """Move the limit according to one sample of the load signals"""
+        self.signals = signals
+        latency = self.latency_p90()
+        overloaded = (signals.backlog_age > self.backlog_age_target
+                      or signals.llm_wait > self.llm_wait_target
+                      or (latency is not None and latency > self.latency_slo)
+                      or self.oldest_in_flight() > self.latency_slo)
+        if overloaded:
+            self.limit = max(float(self.min_in_flight), self.limit * DECREASE_FACTOR)
+            # The SLO check restarts on crews that finish after the cut
+            self.latencies.clear()
+        elif (self.in_flight >= int(self.limit) and self.queued
+              and latency is not None and latency <= self.latency_slo * INCREASE_HEADROOM):
+            self.limit = min(float(self.max_in_flight), self.limit + 1)
+            # Wait for crews admitted under the new limit to finish before growing again
+            self.latencies.clear()
+            self._admit_waiters()
+        from metrics import record_admission
+        record_admission(self.limit, self.in_flight, self.queued)
+
+    async def run(self, interval: float = ADMISSION_INTERVAL) -> None:
+        """Sample the load signals and adjust the limit until cancelled"""
+        while True:
+            try:
+                self.adjust(await self.probe())
+            except Exception as e:
+                # Keep the current limit when the server cannot be reached
+                print(f"Warning: Admission probe failed: {e}")
+            await asyncio.sleep(interval)
+
+async def start_workflow(controller: AdmissionController, client, workflow_run: Any, **kwargs):
+    """Start a workflow once admitted and keep it counted in flight until it finishes. Returns
+    the handle; calls queue here while the controller holds crews back."""
+    admitted = asyncio.get_running_loop().create_future()
+
+    async def track() -> None:
+        try:
+            async with controller.admit():
+                handle = await client.start_workflow(workflow_run, **kwargs)
+                admitted.set_result(handle)
+                with contextlib.suppress(Exception):
+                    await handle.result()  # The caller sees any failure through the handle
+        except asyncio.CancelledError:
+            admitted.cancel()
+        except Exception as e:
+            if not admitted.done():
+                admitted.set_exception(e)
+
+    tracker = asyncio.create_task(track())
+    controller.trackers.add(tracker)
+    tracker.add_done_callback(controller.trackers.discard)
+    try:
+        return await asyncio.shield(admitted)
+    except asyncio.CancelledError:
+        if not admitted.done():
+            tracker.cancel()
+        raise
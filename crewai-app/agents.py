@@ -88,6 +88,24 @@ async def setup_integrator_agent() -> AgentConfig:
     print(f"Created agent: {integrator.name}")
     return integrator
 
+@activity.defn
+async def setup_reviewer_agent(number: int) -> AgentConfig:
+    """Create and initialize an additional reviewer agent, numbered to tell several apart"""
+    print(f"Setting up reviewer agent {number}")
+    
+    reviewer = AgentConfig(
+        name=f"Reviewer {number}",
+        role="Peer Reviewer",
+        goal="Check that the report is correct, complete and useful to its readers",
+        backstory="You review technical reports from the point of view of the practitioners who will act on them",
+        skills=["Peer Review", "Technical Validation", "Editing"],
+        knowledge_areas=["AI Systems", "Workflow Orchestration", "Technical Documentation Standards"],
+        communication_style="Concise and specific"
+    )
+    
+    print(f"Created agent: {reviewer.name}")
+    return reviewer
+
 @activity.defn
 async def agent_response_to_feedback(agent: Any, feedback: str, topic: str) -> Dict[str, Any]:
     """Generate a response to feedback for the agent"""
@@ -96,11 +114,17 @@ async def agent_response_to_feedback(agent: Any, feedback: str, topic: str) -> D
     
     print(f"Agent {agent_name} responding to feedback on {topic}")
     
+    from llm import generate
+    
     # In real implementation, we would use the agent's actual reasoning
+    response_text = await generate(
+        f"You are {agent_name}, a {agent_role}. Respond to this feedback on {topic}: {feedback}",
+        simulated_response=f"Thank you for the feedback. As a {agent_role}, I will incorporate these suggestions to improve the {topic}."
+    )
     response = {
         "agent": agent_name,
         "original_feedback": feedback,
-        "response": f"Thank you for the feedback. As a {agent_role}, I will incorporate these suggestions to improve the {topic}.",
+        "response": response_text,
         "changes_planned": [
             "Add more specific examples",
             "Clarify technical terminology",
@@ -122,6 +146,12 @@ async def resolve_agent_disagreement(agents: List[Any], topic: str, positions: L
     
     print(f"Resolving disagreement between {', '.join(agent_names)} on {topic}")
     
+    from llm import generate
+    final_resolution = await generate(
+        f"Agents {', '.join(agent_names)} disagree on {topic}. Positions: {'; '.join(positions)}. Propose a compromise.",
+        simulated_response=f"The agents have agreed on a compromise approach to {topic} that incorporates elements from each perspective."
+    )
+    
     # In real implementation, would involve complex negotiation between agents
     resolution = {
         "topic": topic,
@@ -133,7 +163,7 @@ async def resolve_agent_disagreement(agents: List[Any], topic: str, positions: L
             "Negotiated compromise on contentious issues",
             "Synthesized a solution incorporating multiple perspectives"
         ],
-        "final_resolution": f"The agents have agreed on a compromise approach to {topic} that incorporates elements from each perspective.",
+        "final_resolution": final_resolution,
         "consensus_level": "Medium-high"
     }
     
@@ -1,29 +1,52 @@
 import os
 import socket
 import asyncio
+import contextlib
 import time
 from datetime import timedelta
-from temporalio.client import Client as TemporalClient
+from collections import deque
+from typing import Deque, Set
+from temporalio.client import Client as TemporalClient, WorkflowQueryFailedError
+from temporalio.service import RPCError
 from temporalio.worker import Worker
 
 # Import agent config and components from other modules
 from agents import AgentConfig
-from workflows import CollaborativeAgentWorkflow
+from workflows import (CollaborativeAgentWorkflow, ResearchWorkflow, BatchReportWorkflow, MessageLogAnalyticsWorkflow,
+                       BATCH_MAX_CONCURRENT)
 
 # Import all activities
 from agents import (setup_researcher_agent, setup_writer_agent, setup_critic_agent, 
-                   setup_integrator_agent, agent_response_to_feedback, resolve_agent_disagreement)
+                   setup_integrator_agent, setup_reviewer_agent, agent_response_to_feedback,
+                   resolve_agent_disagreement)
 from thinking import (researcher_detailed_thinking, writer_detailed_thinking, 
                      researcher_think, writer_think)
 from tasks import (researcher_perform_research, writer_create_report, 
-                  collaborative_research, collaborative_report_writing)
+                  collaborative_research, collaborative_report_writing, revise_report_sections,
+                  store_report)
+from message_log import run_maintenance
+from report_sections import hash_text, load_report
+from phase_cache import lookup_research_phase, store_research_phase
 from messages import (send_message, ask_question, provide_answer, make_proposal, 
-                     provide_feedback, get_conversation_history, collaborate_on_decision)
+                     provide_feedback, get_conversation_history, get_thread, get_inbox,
+                     collaborate_on_decision, MESSAGE_LOG, MESSAGE_WRITER)
+from policies import get_activity_policies, LatencyInterceptor
+from metrics import init_runtime, record_blocked_communication, sample_llm_limiter, monitor_event_loop_lag
+from tracing import init_tracing
+from profiling import ProfilingInterceptor
+from sandbox import workflow_runner
+from cpu_activities import CPU_FUNCTIONS
+from activity_executors import build_activities, activity_thread_pool, shutdown_executors
+from priority_lanes import PRIORITY_LANES, lane_tuner, task_queue_for
+from admission import AdmissionController, temporal_probe, start_workflow
 
 # Flag to control whether to use Temporal
 use_temporal = True  # Set to True to use Temporal, False to run directly
 use_collaborative_mode = True  # Set to True to use the collaborative workflow
 
+# Every workflow the worker runs
+WORKER_WORKFLOWS = [CollaborativeAgentWorkflow, ResearchWorkflow, BatchReportWorkflow, MessageLogAnalyticsWorkflow]
+
 # Define the communication adjacency matrix as a sparse matrix (dictionary)
 # Keys are (sender, recipient) tuples, values are 0-1 (0=no communication, 1=allowed)
 COMMUNICATION_MATRIX = {
@@ -116,6 +139,7 @@ async def communication_middleware_activity(activity_fn, *args, **kwargs):
                     allowed_recipients.append(r)
                 else:
                     print(f"⛔ Communication blocked: {sender_name} -> {r_name} (not allowed)")
+                    record_blocked_communication(sender_name, r_name)
             
             if not allowed_recipients:
                 print(f"⛔ All communications blocked for {sender_name}. No allowed recipients.")
@@ -130,6 +154,7 @@ async def communication_middleware_activity(activity_fn, *args, **kwargs):
             recipient_name = recipient["name"] if isinstance(recipient, dict) else recipient.name
             if not is_communication_allowed(sender_name, recipient_name):
                 print(f"⛔ Communication blocked: {sender_name} -> {recipient_name} (not allowed)")
+                record_blocked_communication(sender_name, recipient_name)
                 return {"error": "Communication not allowed", "blocked": True}
     
     # If we get here, communication is allowed (or this isn't a messaging activity)
@@ -149,22 +174,225 @@ provide_answer = lambda *args, **kwargs: communication_middleware_activity(origi
 make_proposal = lambda *args, **kwargs: communication_middleware_activity(original_make_proposal, *args, **kwargs)
 provide_feedback = lambda *args, **kwargs: communication_middleware_activity(original_provide_feedback, *args, **kwargs)
 
+# Every activity the worker registers
+WORKER_ACTIVITIES = [
+        # Agent activities
+        setup_researcher_agent,
+        setup_writer_agent,
+        setup_critic_agent, 
+        setup_integrator_agent,
+        setup_reviewer_agent,
+        agent_response_to_feedback,
+        resolve_agent_disagreement,
+
+        # Thinking activities
+        researcher_detailed_thinking,
+        writer_detailed_thinking,
+        researcher_think,
+        writer_think,
+
+        # Task activities
+        researcher_perform_research,
+        writer_create_report,
+        collaborative_research,
+        collaborative_report_writing,
+        revise_report_sections,
+        store_report,
+        lookup_research_phase,
+        store_research_phase,
+
+        # Communication activities - using original versions (middleware handled separately)
+        original_send_message,
+        original_ask_question,
+        original_provide_answer,
+        original_make_proposal,
+        original_provide_feedback,
+        get_conversation_history,
+        get_thread,
+        get_inbox,
+        collaborate_on_decision,
+
+        # Policy activities
+        get_activity_policies,
+
+        # CPU-bound activities, each on a thread or process pool as configured in activity_executors
+        *build_activities(CPU_FUNCTIONS),
+]
+
+# Combine the workflow's progress query with the heartbeats of its running activities
+async def fetch_progress(handle):
+    """Return workflow progress plus the latest heartbeat of each in-flight activity"""
+    progress = await handle.query(CollaborativeAgentWorkflow.get_progress)
+    description = await handle.describe()
+    progress["running_activities"] = []
+    for pending in description.raw_description.pending_activities:
+        details = []
+        if pending.heartbeat_details.payloads:
+            details = await description.data_converter.decode(pending.heartbeat_details.payloads)
+        progress["running_activities"].append({
+            "activity": pending.activity_type.name,
+            "attempt": pending.attempt,
+            "heartbeat": details[0] if details else None
+        })
+    return progress
+
+# How long to wait for a worker to answer the get_report query before trying the report store
+REPORT_QUERY_TIMEOUT = timedelta(seconds=float(os.environ.get("REPORT_QUERY_TIMEOUT", "10")))
+
+async def fetch_report(handle, result):
+    """Return the full report for a completed workflow
+
+    The get_report query is answered by whichever worker polls the workflow's task queue, so it
+    works from any host. Only when no worker answers is the report read from the report store,
+    which is on this host unless REPORT_DIR is storage shared with the workers.
+    """
+    report_id = result["report"]["report_id"]
+    try:
+        report = await handle.query(CollaborativeAgentWorkflow.get_report, rpc_timeout=REPORT_QUERY_TIMEOUT)
+    except (WorkflowQueryFailedError, RPCError) as e:
+        print(f"Warning: Could not query the report of {handle.id}, trying the report store: {e}")
+        report = None
+    if report is not None and report_id is not None and hash_text(report) != report_id:
+        print(f"Warning: Report of {handle.id} does not match its stored id {report_id}")
+    if report is None and report_id is not None:
+        report = load_report(report_id)
+    return report
+
+def lane_workers(client, tuner=None):
+    """One worker per priority lane; all of them draw task slots from the same weighted pools"""
+    tuner = lane_tuner() if tuner is None else tuner
+    return [
+        Worker(
+            client=client,
+            task_queue=task_queue,
+            workflows=WORKER_WORKFLOWS,
+            # Pass activity modules through the workflow sandbox rather than re-importing them per run
+            workflow_runner=workflow_runner(),
+            activities=WORKER_ACTIVITIES,
+            # Synchronous activities run here, off the event loop
+            activity_executor=activity_thread_pool(),
+            # Interactive work keeps its reserved share of slots however busy the bulk lane is
+            tuner=tuner,
+            # Collect per-activity latency histograms that timeouts and retries are derived from, and
+            # profile sampled activities when PROFILE_SAMPLE_RATE or PROFILE_ACTIVITIES is set
+            interceptors=[LatencyInterceptor(), ProfilingInterceptor()],
+            # Send heartbeats (and the checkpoints they carry) at least every 2 seconds
+            max_heartbeat_throttle_interval=timedelta(seconds=2),
+            default_heartbeat_throttle_interval=timedelta(seconds=2),
+        )
+        for task_queue in PRIORITY_LANES.values()
+    ]
+
+async def admit_batch_children(controller: AdmissionController, handle, interval: float = 0.5) -> None:
+    """Hold one admission place per child an admitted BatchReportWorkflow runs: ask for a place
+    for every child waiting to start, grant it to the batch once admitted and give it back when
+    the batch reports a child finished, so each child counts (and is measured) as a crew"""
+    releases: Deque[asyncio.Future] = deque()  # One per place asked for, in admission order
+    holders: Set[asyncio.Task] = set()
+    finished = 0
+
+    async def hold(release: asyncio.Future) -> None:
+        async with controller.admit():
+            await handle.signal(BatchReportWorkflow.grant_places, 1)
+            await release
+
+    result = asyncio.ensure_future(handle.result())
+    try:
+        while True:
+            done = result.done()
+            try:
+                progress = await handle.query(BatchReportWorkflow.get_progress)
+            except Exception as e:
+                print(f"Warning: Could not fetch batch progress: {e}")
+                progress = None
+            if progress is not None:
+                for _ in range(min(progress["finished"] - finished, len(releases))):
+                    releases.popleft().set_result(None)
+                finished = progress["finished"]
+            if done:
+                break
+            while progress is not None and len(releases) < progress["waiting"] + progress["running"]:
+                release = asyncio.get_running_loop().create_future()
+                releases.append(release)
+                holder = asyncio.create_task(hold(release))
+                holders.add(holder)
+                holder.add_done_callback(holders.discard)
+            await asyncio.wait([result], timeout=interval)
+    finally:
+        result.cancel()
+        # Places still held were granted but never used; they leave without a latency sample
+        for holder in list(holders):
+            holder.cancel()
+
+async def submit_batch(controller: AdmissionController, client, requests, task_queue: str = task_queue_for("bulk"),
+                       feedback_rounds: int = 1):
+    """Start a BatchReportWorkflow for (research_topic, report_title) pairs; requests sharing a
+    topic share one research phase. Every research and report child is admitted by the
+    controller like any other crew, so the batch runs as many children at once as it holds
+    places. Returns the workflow handle."""
+    handle = await client.start_workflow(
+        BatchReportWorkflow.run,
+        args=[[{"research_topic": topic, "report_title": title} for topic, title in requests], feedback_rounds,
+              BATCH_MAX_CONCURRENT, True],
+        id=f"batch-report-workflow-{int(time.time())}",
+        task_queue=task_queue,
+    )
+    tracker = asyncio.create_task(admit_batch_children(controller, handle))
+    controller.trackers.add(tracker)
+    tracker.add_done_callback(controller.trackers.discard)
+    return handle
+
+async def watch_progress(handle, interval: float = 1.0):
+    """Print live progress whenever the phase or the number of visible thinking steps changes"""
+    last_seen = None
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            progress = await fetch_progress(handle)
+        except Exception as e:
+            print(f"Warning: Could not fetch workflow progress: {e}")
+            continue
+        live_steps = sum(len(a["heartbeat"]["thinking_steps"]) for a in progress["running_activities"]
+                         if isinstance(a["heartbeat"], dict))
+        current = (progress["phase"], len(progress["thinking_steps"]), live_steps)
+        if current != last_seen:
+            last_seen = current
+            print(f"📈 Progress: phase={current[0]}, recorded thinking steps={current[1]}, "
+                  f"in-flight thinking steps={current[2]}")
+
 # Main function to start the workflow with Temporal
-async def main_temporal():
+async def main_temporal(priority: str = "interactive"):
     temporal_host = os.environ.get("TEMPORAL_HOST", "temporal")
     temporal_port = os.environ.get("TEMPORAL_PORT", "7233")
     
     print(f"Connecting to Temporal at {temporal_host}:{temporal_port}")
-    client = await TemporalClient.connect(f"{temporal_host}:{temporal_port}")
+    # The runtime serves worker telemetry and agent metrics on a local Prometheus endpoint
+    # The tracing interceptor (if OpenTelemetry is installed) is inherited by the workers below
+    tracing_interceptor = init_tracing()
+    client = await TemporalClient.connect(
+        f"{temporal_host}:{temporal_port}",
+        runtime=init_runtime(),
+        interceptors=[tracing_interceptor] if tracing_interceptor else [],
+    )
+    limiter_sampler = asyncio.create_task(sample_llm_limiter())
+    # Compact small message log segments and delete expired ones in the background
+    log_maintenance = asyncio.create_task(run_maintenance(MESSAGE_LOG))
+    # Publish event loop lag, which blocking work inside async activities shows up as
+    loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    # Hold crew latency to the SLO by queueing starts while task queues or the LLM limiter back up
+    admission_controller = AdmissionController(
+        temporal_probe(client, list(PRIORITY_LANES.values()))
+    )
+    admission_adjuster = asyncio.create_task(admission_controller.run())
     
     # Define the tasks for our agents
     research_topic = "Integration of Temporal with AI systems"
     report_title = "Benefits of Temporal for AI Workflows"
     
-    # Use the collaborative workflow
-    task_queue = "collaborative-agent-queue"
+    # Use the collaborative workflow, on the task queue of its priority class
+    task_queue = task_queue_for(priority)
     
-    print(f"Starting Temporal worker on task queue: {task_queue}")
+    print(f"Starting Temporal workers on task queues: {', '.join(PRIORITY_LANES.values())}")
     print(f"\n{'-'*20} AGENT COMMUNICATION PERMISSIONS {'-'*20}")
     print("The following agent communication paths are enabled:")
     for (sender, recipient), permission in sorted(COMMUNICATION_MATRIX.items()):
@@ -172,61 +400,50 @@ async def main_temporal():
         print(f"  {sender} -> {recipient}: {permission:.1f} ({status})")
     print(f"{'-'*65}\n")
     
-    async with Worker(
-        client=client,
-        task_queue=task_queue,
-        workflows=[CollaborativeAgentWorkflow],
-        activities=[
-            # Agent activities
-            setup_researcher_agent,
-            setup_writer_agent,
-            setup_critic_agent, 
-            setup_integrator_agent,
-            agent_response_to_feedback,
-            resolve_agent_disagreement,
+    try:
+        async with contextlib.AsyncExitStack() as workers:
+            for worker in lane_workers(client):
+                await workers.enter_async_context(worker)
+            print(f"Executing collaborative agent workflow ({priority} priority)")
+            handle = await start_workflow(
+                admission_controller,
+                client,
+                CollaborativeAgentWorkflow.run,
+                args=[research_topic, report_title],
+                id=f"collaborative-agent-workflow-{int(time.time())}",
+                task_queue=task_queue,
+            )
+            watcher = asyncio.create_task(watch_progress(handle))
+            try:
+                result = await handle.result()
+            finally:
+                watcher.cancel()
             
-            # Thinking activities
-            researcher_detailed_thinking,
-            writer_detailed_thinking,
-            researcher_think,
-            writer_think,
-            
-            # Task activities
-            researcher_perform_research,
-            writer_create_report,
-            collaborative_research,
-            collaborative_report_writing,
-            
-            # Communication activities - using original versions (middleware handled separately)
-            original_send_message,
-            original_ask_question,
-            original_provide_answer,
-            original_make_proposal,
-            original_provide_feedback,
-            get_conversation_history,
-            collaborate_on_decision,
-        ],
-    ):
-        print("Executing collaborative agent workflow")
-        result = await client.execute_workflow(
-            CollaborativeAgentWorkflow.run,
-            args=[research_topic, report_title],
-            id=f"collaborative-agent-workflow-{int(time.time())}",
-            task_queue=task_queue,
-        )
-        
-        print(f"\nWorkflow result summary:")
-        print(f"Final report length: {len(result['final_report'])} characters")
-        print(f"Total thinking steps: {result['collaborative_process']['thinking_steps']}")
-        print(f"Team members: {', '.join(result['team'].values())}")
-        
-        return result
+            print(f"\nWorkflow result summary:")
+            print(f"Final report: {result['report']['report_id']} ({result['report']['characters']} characters)")
+            print(f"Total thinking steps: {result['collaborative_process']['thinking_steps']}")
+            print(f"Team members: {', '.join(result['team'].values())}")
+            # Still inside the worker block, so a worker is polling to answer the report query
+            report = await fetch_report(handle, result)
+            print(f"Report title: {report.splitlines()[0] if report else '(not found)'}")
+    finally:
+        limiter_sampler.cancel()
+        log_maintenance.cancel()
+        loop_lag_monitor.cancel()
+        admission_adjuster.cancel()
+        # Only now that the workers have shut down (and their activities finished) can nothing
+        # else submit messages or use the executors: persist what is still queued, then stop the pools
+        await asyncio.to_thread(MESSAGE_WRITER.close)
+        shutdown_executors()
+    
+    return result
 
 if __name__ == "__main__":
     if use_temporal:
         # Run with Temporal
         print("Running with Temporal orchestration")
-        asyncio.run(main_temporal())
+        # WORKFLOW_PRIORITY picks the lane: "interactive" for crews a user waits on, "bulk" for batch runs
+        asyncio.run(main_temporal(os.environ.get("WORKFLOW_PRIORITY", "interactive")))
     else:
         # Run without Temporal
         run_without_temporal() 
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""Benchmark a burst of crew starts with and without the admission controller
+
+Each crew makes a sequence of LLM calls through one worker's LLM limiter. Without admission
+control every crew starts at once and all of their calls queue on the limiter; with it, crews
+queue at the starter and the controller (probing the same limiter) decides how many run.
+Calls that wait longer than --call-timeout would have hit their activity timeout.
+
+    python bench_admission.py --crews 200 --slo 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from admission import AdmissionController, LoadSignals
+from llm_limiter import LLMLimiter
+
+def percentile(samples: List[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+async def run(controlled: bool, crews: int, calls: int, work: float, llm_concurrency: int,
+              slo: float, llm_wait_target: float, call_timeout: float) -> Dict[str, float]:
+    limiter = LLMLimiter(llm_concurrency, tokens_per_second=1e9, burst=1e9)
+    call_waits: List[float] = []
+    crew_latencies: List[float] = []
+    end_to_end: List[float] = []
+
+    async def probe() -> LoadSignals:
+        return LoadSignals(llm_wait=limiter.stats()["wait_seconds"]["normal"]["recent"])
+
+    controller = AdmissionController(probe, latency_slo=slo, llm_wait_target=llm_wait_target,
+                                     min_in_flight=1, max_in_flight=crews, initial_limit=llm_concurrency)
+
+    async def crew() -> None:
+        started = time.perf_counter()
+        for _ in range(calls):
+            async with limiter.acquire("normal") as waited:
+                call_waits.append(waited)
+                await asyncio.sleep(work)
+        crew_latencies.append(time.perf_counter() - started)
+
+    async def submit() -> None:
+        submitted = time.perf_counter()
+        if controlled:
+            async with controller.admit():
+                await crew()
+        else:
+            await crew()
+        end_to_end.append(time.perf_counter() - submitted)
+
+    adjuster = asyncio.create_task(controller.run(interval=0.1)) if controlled else None
+    start = time.perf_counter()
+    await asyncio.gather(*[submit() for _ in range(crews)])
+    elapsed = time.perf_counter() - start
+    if adjuster is not None:
+        adjuster.cancel()
+    return {
+        "crew_p50": statistics.median(crew_latencies),
+        "crew_p99": percentile(crew_latencies, 0.99),
+        "slo_met": sum(latency <= slo for latency in crew_latencies) / crews,
+        "e2e_p50": statistics.median(end_to_end),
+        "e2e_p99": percentile(end_to_end, 0.99),
+        "timeouts": sum(wait > call_timeout for wait in call_waits),
+        "crews_per_second": crews / elapsed,
+        "final_limit": controller.limit,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--crews", type=int, default=200, help="Crews started in one burst")
+    parser.add_argument("--calls", type=int, default=10, help="LLM calls per crew")
+    parser.add_argument("--work-ms", type=float, default=50, help="Duration of each LLM call")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--slo", type=float, default=3.0, help="Target crew latency in seconds")
+    parser.add_argument("--llm-wait-target", type=float, default=0.5)
+    parser.add_argument("--call-timeout", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{args.crews} crews x {args.calls} LLM calls of {args.work_ms:.0f}ms, {args.llm_concurrency} LLM slots, "
+          f"SLO {args.slo:.1f}s, call timeout {args.call_timeout:.1f}s")
+    for controlled in (False, True):
+        result = asyncio.run(run(controlled, args.crews, args.calls, args.work_ms / 1000, args.llm_concurrency,
+                                 args.slo, args.llm_wait_target, args.call_timeout))
+        label = "admission" if controlled else "no control"
+        print(f"  {label:>10}: crew latency p50 {result['crew_p50']:.1f}s, p99 {result['crew_p99']:.1f}s "
+              f"({result['slo_met']:.0%} within SLO); submit-to-done p50 {result['e2e_p50']:.1f}s, "
+              f"p99 {result['e2e_p99']:.1f}s; {result['timeouts']} calls past the timeout; "
+              f"{result['crews_per_second']:.1f} crews/s"
+              + (f"; limit settled at {result['final_limit']:.1f}" if controlled else ""))
@@ -0,0 +1,113 @@
+"""Benchmark report throughput for a batch of requests where many share a research topic
+
+Runs the same batch twice with an in-process worker against a Temporal server (or a
+downloaded dev server with --dev-server): once as independent CollaborativeAgentWorkflow
+runs, each with its own research phase, and once through BatchReportWorkflow, which
+researches each distinct topic once and fans the findings out to the reports. Every child
+of the batch is admitted by an admission controller that starts at --max-concurrent crews in
+flight, so the children running at once never exceed its limit.
+
+    python bench_batch_submission.py --requests 20 --duplicate-ratio 0.5 --max-concurrent 8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+from typing import List, Tuple
+
+from temporalio.client import Client as TemporalClient
+from temporalio.worker import Worker
+
+from activity_executors import activity_thread_pool, shutdown_executors
+from admission import AdmissionController, temporal_probe
+from app import WORKER_ACTIVITIES, WORKER_WORKFLOWS, submit_batch
+from sandbox import workflow_runner
+from workflows import BATCH_MAX_CONCURRENT, BatchReportWorkflow, CollaborativeAgentWorkflow
+
+TASK_QUEUE = "bench-batch-submission"
+
+def build_requests(count: int, duplicate_ratio: float) -> List[Tuple[str, str]]:
+    """`count` requests, of which `duplicate_ratio` repeat an earlier topic (with different wording)"""
+    distinct = max(1, round(count * (1 - duplicate_ratio)))
+    topics = [f"Temporal for AI workload {n}" for n in range(distinct)]
+    return [(topics[i] if i < distinct else topics[i % distinct].lower() + ".", f"Report {i}")
+            for i in range(count)]
+
+async def run_independent(client: TemporalClient, requests: List[Tuple[str, str]]) -> float:
+    start = time.perf_counter()
+    handles = await asyncio.gather(*[
+        client.start_workflow(CollaborativeAgentWorkflow.run, args=[topic, title],
+                              id=f"bench-independent-{i}-{int(time.time())}", task_queue=TASK_QUEUE)
+        for i, (topic, title) in enumerate(requests)
+    ])
+    await asyncio.gather(*[handle.result() for handle in handles])
+    return time.perf_counter() - start
+
+async def run_batch(controller: AdmissionController, client: TemporalClient,
+                    requests: List[Tuple[str, str]]) -> Tuple[float, dict, int]:
+    """Run the batch; returns its duration, result and the most children seen running at once"""
+    start = time.perf_counter()
+    handle = await submit_batch(controller, client, requests, TASK_QUEUE)
+    peak = 0
+
+    async def watch() -> None:
+        nonlocal peak
+        while True:
+            peak = max(peak, (await handle.query(BatchReportWorkflow.get_progress))["running"])
+            await asyncio.sleep(0.2)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        result = await handle.result()
+    finally:
+        watcher.cancel()
+    return time.perf_counter() - start, result, peak
+
+async def bench(client: TemporalClient, count: int, duplicate_ratio: float, max_concurrent: int) -> None:
+    requests = build_requests(count, duplicate_ratio)
+    async with Worker(client, task_queue=TASK_QUEUE, workflows=WORKER_WORKFLOWS,
+                      activities=WORKER_ACTIVITIES, activity_executor=activity_thread_pool(),
+                      workflow_runner=workflow_runner()):
+        with contextlib.redirect_stdout(io.StringIO()):
+            independent = await run_independent(client, requests)
+            controller = AdmissionController(temporal_probe(client, [TASK_QUEUE]), initial_limit=max_concurrent)
+            adjuster = asyncio.create_task(controller.run())
+            try:
+                batched, result, peak = await run_batch(controller, client, requests)
+            finally:
+                adjuster.cancel()
+    print(f"{count} requests, {result['distinct_topics']} distinct topics "
+          f"({duplicate_ratio:.0%} duplicates)")
+    print(f"  independent: {count} research phases, {independent:.1f}s, "
+          f"{count / independent * 60:.1f} reports/min")
+    print(f"      batched: {result['distinct_topics']} research phases, {batched:.1f}s, "
+          f"{count / batched * 60:.1f} reports/min ({result['failed']} failed), "
+          f"at most {peak} children running at once (admission limit {max_concurrent} -> "
+          f"{int(controller.limit)})")
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.5)
+    parser.add_argument("--max-concurrent", type=int, default=BATCH_MAX_CONCURRENT,
+                        help="Admission limit the batch starts with; each child takes a place")
+    parser.add_argument("--address", default=f"{os.environ.get('TEMPORAL_HOST', 'localhost')}:"
+                                             f"{os.environ.get('TEMPORAL_PORT', '7233')}")
+    parser.add_argument("--dev-server", action="store_true",
+                        help="Start a local Temporal dev server instead of connecting to --address")
+    args = parser.parse_args()
+    try:
+        if args.dev_server:
+            from temporalio.testing import WorkflowEnvironment
+            async with await WorkflowEnvironment.start_local() as env:
+                await bench(env.client, args.requests, args.duplicate_ratio, args.max_concurrent)
+        else:
+            await bench(await TemporalClient.connect(args.address), args.requests, args.duplicate_ratio,
+                        args.max_concurrent)
+    finally:
+        shutdown_executors()
+
+if __name__ == "__main__":
+    asyncio.run(main())
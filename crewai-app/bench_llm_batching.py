@@ -0,0 +1,73 @@
+"""Benchmark micro-batched vs one-prompt-per-request LLM calls against a local stand-in server
+
+The stand-in server mimics a batching inference endpoint: every request pays a fixed
+overhead (scheduling, a forward pass) plus a small cost per prompt in the batch.
+
+    python bench_llm_batching.py --prompts 200 --overhead-ms 40 --per-prompt-ms 2
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import llm
+from llm_limiter import LLM_LIMITER
+
+def start_stand_in_server(overhead: float, per_prompt: float) -> ThreadingHTTPServer:
+    class CompletionsHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompts = body["prompt"] if isinstance(body["prompt"], list) else [body["prompt"]]
+            time.sleep(overhead + per_prompt * len(prompts))
+            payload = json.dumps({"choices": [
+                {"index": i, "text": f"completion for: {prompt[:40]}"} for i, prompt in enumerate(prompts)
+            ]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CompletionsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def run(backend: str, prompts: int) -> float:
+    llm.LLM_BACKEND = backend
+    start = time.monotonic()
+    results = await asyncio.gather(*[
+        llm.generate(f"Respond to feedback number {i} on the report", priority="background")
+        for i in range(prompts)
+    ])
+    elapsed = time.monotonic() - start
+    assert all(result.startswith("completion for: Respond to feedback number") for result in results)
+    assert all(f"number {i} " in result for i, result in enumerate(results))
+    return elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--overhead-ms", type=float, default=40)
+    parser.add_argument("--per-prompt-ms", type=float, default=2)
+    args = parser.parse_args()
+
+    server = start_stand_in_server(args.overhead_ms / 1000, args.per_prompt_ms / 1000)
+    llm.LLM_COMPLETIONS_ENDPOINT = f"http://127.0.0.1:{server.server_port}/v1/completions"
+    # Only concurrency should limit throughput here, not the token bucket
+    LLM_LIMITER.tokens_per_second = LLM_LIMITER.burst = float("inf")
+    LLM_LIMITER._tokens = float("inf")
+
+    print(f"{args.prompts} concurrent prompts, LLM concurrency {LLM_LIMITER.max_concurrency}, "
+          f"batch window {llm.LLM_BATCH_WINDOW * 1000:.0f}ms, max batch {llm.LLM_BATCH_MAX_SIZE}")
+    for backend in ["openai", "batch"]:
+        elapsed = asyncio.run(run(backend, args.prompts))
+        label = "batched" if backend == "batch" else "unbatched"
+        print(f"  {label:>9}: {elapsed:.2f}s, {args.prompts / elapsed:.1f} prompts/s")
+    print(f"  batches sent: {llm.BATCHER.batches_sent} "
+          f"(mean size {llm.BATCHER.prompts_sent / max(1, llm.BATCHER.batches_sent):.1f})")
+    server.shutdown()
@@ -0,0 +1,75 @@
+"""Benchmark event-loop lag while agents send messages, for each message persistence mode
+
+Concurrent senders deliver messages the way the messaging activities do, while a lag
+monitor measures how late the event loop runs a timer. Inline persistence writes the log
+and the search index on the loop; write-behind moves both to the writer thread.
+
+    python bench_message_persistence.py --senders 20 --messages 200
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+import messages
+import search_index
+from message_log import MessageLog
+from metrics import monitor_event_loop_lag
+from write_behind import WriteBehindWriter, DURABILITY_INLINE, DURABILITY_FLUSH, DURABILITY_FIRE_AND_FORGET
+
+async def run(durability: str, senders: int, per_sender: int, log_dir: str) -> dict:
+    messages.MESSAGE_LOG = MessageLog(log_dir)
+    messages.MESSAGE_WRITER = WriteBehindWriter(messages.MESSAGE_LOG, after_write=messages._index_written,
+                                                durability=durability)
+    lags = []
+    monitor = asyncio.create_task(monitor_event_loop_lag(interval=0.005, samples=lags))
+
+    async def sender(i: int) -> None:
+        conversation_id = None
+        for n in range(per_sender):
+            result = await messages._deliver_message(
+                f"Agent{i}", {"name": f"Agent{(i + 1) % senders}"},
+                f"Message {n} from agent {i}: " + "findings and analysis " * 20, "proposal",
+                conversation_id, None
+            )
+            conversation_id = result["conversation_id"]
+            await asyncio.sleep(0.001)  # Other work the activity awaits between messages
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*[sender(i) for i in range(senders)])
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.02)  # Let the monitor record a wake-up delayed by the last blocking stretch
+    monitor.cancel()
+    await asyncio.to_thread(messages.MESSAGE_WRITER.close)
+    lags.sort()
+    return {
+        "elapsed": elapsed,
+        "lag_p50": statistics.median(lags) if lags else 0.0,
+        "lag_p99": lags[int(len(lags) * 0.99)] if lags else 0.0,
+        "lag_max": lags[-1] if lags else 0.0,
+        "batches": messages.MESSAGE_WRITER.batches_written,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--senders", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=200, help="Messages per sender")
+    args = parser.parse_args()
+
+    total = args.senders * args.messages
+    print(f"{args.senders} senders x {args.messages} messages, lag sampled every 5ms")
+    for durability in [DURABILITY_INLINE, DURABILITY_FLUSH, DURABILITY_FIRE_AND_FORGET]:
+        with tempfile.TemporaryDirectory() as log_dir:
+            search_index._connection = None
+            search_index.get_connection(os.path.join(log_dir, "search_index.db"))
+            result = asyncio.run(run(durability, args.senders, args.messages, log_dir))
+            search_index._connection.close()
+            search_index._connection = None
+        print(f"  {durability:>15}: {total / result['elapsed']:.0f} msgs/s, event loop lag "
+              f"p50 {result['lag_p50'] * 1000:.1f}ms, p99 {result['lag_p99'] * 1000:.1f}ms, "
+              f"max {result['lag_max'] * 1000:.1f}ms ({result['batches']} write batches)")
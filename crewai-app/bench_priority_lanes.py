@@ -0,0 +1,118 @@
+"""Benchmark interactive task latency while a bulk backlog saturates the worker, with and without priority lanes
+
+Models one worker the way the SDK drives it: pollers reserve a task slot, then wait for a task
+from their queue, and each task makes one LLM call through the worker's LLM limiter.
+  shared - one task queue and one fixed pool of slots; interactive tasks queue behind the backlog
+  lanes  - a task queue per lane sharing a WeightedSlotPool, bulk LLM calls demoted in the limiter
+No Temporal server is involved, so server-side queueing is the FIFO task queue modelled here.
+
+    python bench_priority_lanes.py --bulk 3000 --interactive 100
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+
+from llm_limiter import LLMLimiter
+from priority_lanes import PRIORITY_LANES, WeightedSlotPool, llm_priority
+
+POLLERS_PER_QUEUE = 5  # The SDK's default maximum of concurrent activity polls
+
+@dataclass
+class ReserveContext:
+    task_queue: str
+    slot_type: str = "activity"
+
+@dataclass
+class ReleaseContext:
+    permit: object
+    slot_info: object = None
+
+class SharedSlots:
+    """A fixed-size slot pool, as the default worker tuner uses"""
+    def __init__(self, total: int):
+        self._semaphore = asyncio.Semaphore(total)
+
+    async def reserve_slot(self, ctx: ReserveContext) -> object:
+        await self._semaphore.acquire()
+        return object()
+
+    def release_slot(self, ctx: ReleaseContext) -> None:
+        self._semaphore.release()
+
+async def run(mode: str, slots: int, llm_concurrency: int, work: float, bulk: int, interactive: int,
+              interval: float, weights: Dict[str, float]) -> Dict[str, float]:
+    limiter = LLMLimiter(llm_concurrency, tokens_per_second=1e9, burst=1e9)
+    if mode == "shared":
+        queues = {"shared": asyncio.Queue()}
+        pool = SharedSlots(slots)
+        route = {"interactive": "shared", "bulk": "shared"}
+    else:
+        queues = {queue: asyncio.Queue() for queue in PRIORITY_LANES.values()}
+        pool = WeightedSlotPool(slots, weights)
+        route = dict(PRIORITY_LANES)
+    latencies: Dict[str, List[float]] = {"interactive": [], "bulk": []}
+    interactive_done = asyncio.Event()
+
+    async def execute(task_queue: str, lane: str, queued_at: float, permit: object) -> None:
+        try:
+            priority = llm_priority(task_queue, "normal") if mode == "lanes" else "normal"
+            async with limiter.acquire(priority):
+                await asyncio.sleep(work)  # The model call
+        finally:
+            pool.release_slot(ReleaseContext(permit))
+        latencies[lane].append(time.perf_counter() - queued_at)
+        if lane == "interactive" and len(latencies["interactive"]) == interactive:
+            interactive_done.set()
+
+    async def poller(task_queue: str) -> None:
+        while True:
+            permit = await pool.reserve_slot(ReserveContext(task_queue))
+            lane, queued_at = await queues[task_queue].get()
+            asyncio.create_task(execute(task_queue, lane, queued_at, permit))
+
+    pollers = [asyncio.create_task(poller(queue)) for queue in queues for _ in range(POLLERS_PER_QUEUE)]
+    start = time.perf_counter()
+    for _ in range(bulk):  # The nightly backlog lands all at once
+        queues[route["bulk"]].put_nowait(("bulk", start))
+    for _ in range(interactive):  # Users start crews at a steady rate
+        queues[route["interactive"]].put_nowait(("interactive", time.perf_counter()))
+        await asyncio.sleep(interval)
+    await interactive_done.wait()
+    elapsed = time.perf_counter() - start
+    bulk_completed = len(latencies["bulk"])
+    for task in pollers:
+        task.cancel()
+
+    samples = sorted(latencies["interactive"])
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "max": samples[-1],
+        "bulk_per_second": bulk_completed / elapsed,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--slots", type=int, default=32, help="Activity slots on the worker")
+    parser.add_argument("--llm-concurrency", type=int, default=16)
+    parser.add_argument("--work-ms", type=float, default=50, help="Duration of each task's model call")
+    parser.add_argument("--bulk", type=int, default=3000, help="Bulk tasks queued up front")
+    parser.add_argument("--interactive", type=int, default=100, help="Interactive tasks, one every --interval-ms")
+    parser.add_argument("--interval-ms", type=float, default=20)
+    parser.add_argument("--weights", default="interactive=1,bulk=3")
+    args = parser.parse_args()
+
+    weights = {lane: float(weight) for lane, weight in
+               (entry.split("=") for entry in args.weights.split(","))}
+    print(f"{args.slots} slots, {args.llm_concurrency} LLM slots, {args.work_ms:.0f}ms per task; "
+          f"{args.bulk} bulk tasks queued, {args.interactive} interactive tasks every {args.interval_ms:.0f}ms")
+    scenarios = [("idle", "shared", 0), ("shared", "shared", args.bulk), ("lanes", "lanes", args.bulk)]
+    for label, mode, bulk in scenarios:
+        result = asyncio.run(run(mode, args.slots, args.llm_concurrency, args.work_ms / 1000, bulk,
+                                 args.interactive, args.interval_ms / 1000, weights))
+        print(f"  {label:>6}: interactive latency p50 {result['p50'] * 1000:.0f}ms, "
+              f"p99 {result['p99'] * 1000:.0f}ms, max {result['max'] * 1000:.0f}ms; "
+              f"bulk {result['bulk_per_second']:.0f} tasks/s")
@@ -0,0 +1,85 @@
+"""Benchmark the first and Nth workflow task of CollaborativeAgentWorkflow under each workflow runner
+
+Each run replays a synthetic history that ends at the first workflow task, so no Temporal
+server is needed: the timing covers creating the workflow's sandbox, importing its modules
+and running the workflow until it schedules its first activity.
+
+    python bench_workflow_sandbox.py --runs 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from temporalio.api.enums.v1 import EventType
+from temporalio.api.history.v1 import HistoryEvent
+from temporalio.client import WorkflowHistory
+from temporalio.converter import DataConverter
+from temporalio.worker import Replayer, UnsandboxedWorkflowRunner
+from temporalio.worker.workflow_sandbox import SandboxedWorkflowRunner
+
+from sandbox import workflow_runner
+from workflows import CollaborativeAgentWorkflow
+
+TASK_QUEUE = "bench-workflow-sandbox"
+
+def first_task_history(run: int) -> WorkflowHistory:
+    """A started workflow whose first workflow task has been picked up by a worker"""
+    started = HistoryEvent(event_id=1, event_type=EventType.EVENT_TYPE_WORKFLOW_EXECUTION_STARTED)
+    attributes = started.workflow_execution_started_event_attributes
+    attributes.workflow_type.name = "CollaborativeAgentWorkflow"
+    attributes.task_queue.name = TASK_QUEUE
+    attributes.input.payloads.extend(
+        DataConverter.default.payload_converter.to_payloads(["AI agents", "Benchmark report"])
+    )
+    attributes.workflow_task_timeout.seconds = 10
+    attributes.original_execution_run_id = attributes.first_execution_run_id = f"run-{run}"
+    attributes.attempt = 1
+
+    scheduled = HistoryEvent(event_id=2, event_type=EventType.EVENT_TYPE_WORKFLOW_TASK_SCHEDULED)
+    scheduled.workflow_task_scheduled_event_attributes.task_queue.name = TASK_QUEUE
+    scheduled.workflow_task_scheduled_event_attributes.attempt = 1
+
+    task_started = HistoryEvent(event_id=3, event_type=EventType.EVENT_TYPE_WORKFLOW_TASK_STARTED)
+    task_started.workflow_task_started_event_attributes.scheduled_event_id = 2
+
+    for event in (started, scheduled, task_started):
+        event.event_time.GetCurrentTime()
+    return WorkflowHistory(f"bench-{run}", [started, scheduled, task_started])
+
+async def run(runner, runs: int) -> List[float]:
+    """Replay `runs` histories on one worker and return the time each workflow task took"""
+    replayer = Replayer(workflows=[CollaborativeAgentWorkflow], workflow_runner=runner)
+
+    async def histories():
+        for i in range(runs):
+            yield first_task_history(i)
+
+    timings = []
+    async with replayer.workflow_replay_iterator(histories()) as results:
+        start = time.perf_counter()
+        async for result in results:
+            if result.replay_failure:
+                raise result.replay_failure
+            now = time.perf_counter()
+            timings.append(now - start)
+            start = now
+    return timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    runners = {
+        "default sandbox": SandboxedWorkflowRunner(),
+        "tuned sandbox": workflow_runner(),
+        "unsandboxed": UnsandboxedWorkflowRunner(),
+    }
+    print(f"{args.runs} workflow runs per runner, first workflow task only")
+    for label, runner in runners.items():
+        timings = asyncio.run(run(runner, args.runs))
+        print(f"  {label:>15}: first {timings[0] * 1000:.1f}ms, "
+              f"Nth median {statistics.median(timings[1:]) * 1000:.1f}ms, "
+              f"Nth max {max(timings[1:]) * 1000:.1f}ms")
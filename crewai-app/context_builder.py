@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List
+import os
+from messages import Message, CONVERSATION_STORE
+
+# Token budget for the conversation part of an agent's prompt, and the share kept for the summary
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "2000"))
+SUMMARY_SHARE = 0.25
+SUMMARY_LINE_CHARS = 160  # Longest line an older message contributes to the extractive summary
+# Conversations whose rolling summary stays cached; the least recently used one is dropped beyond this
+SUMMARY_CACHE_SIZE = int(os.environ.get("CONTEXT_SUMMARY_CACHE_SIZE", "1024"))
+
+@dataclass
+class RollingSummary:
+    text: str = ""
+    covered: int = 0  # Number of leading conversation messages already folded into `text`
+
+# Rolling summaries cached per conversation_id, so older history of an active conversation is
+# summarized exactly once (an evicted conversation starts a new summary if it comes back)
+SUMMARY_CACHE: "OrderedDict[str, RollingSummary]" = OrderedDict()
+
+def cached_summary(conversation_id: str) -> RollingSummary:
+    """The conversation's rolling summary, created (evicting the least recently used) if missing"""
+    summary = SUMMARY_CACHE.get(conversation_id)
+    if summary is not None:
+        SUMMARY_CACHE.move_to_end(conversation_id)
+        return summary
+    summary = SUMMARY_CACHE[conversation_id] = RollingSummary()
+    if len(SUMMARY_CACHE) > SUMMARY_CACHE_SIZE:
+        SUMMARY_CACHE.popitem(last=False)
+    return summary
+
+def format_message(message: Message) -> str:
+    return f"{message.sender} -> {message.recipient} ({message.message_type}): {message.content}"
+
+def _fit_lines(lines: List[str], token_budget: int) -> List[str]:
+    """Keep the newest lines that fit in the budget"""
+    from llm import estimate_tokens
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        cost = estimate_tokens(line)
+        if used + cost > token_budget:
+            break
+        kept.append(line)
+        used += cost
+    return list(reversed(kept))
+
+async def summarize(previous: str, messages: List[Message], token_budget: int) -> str:
+    """Fold newly aged-out messages into the previous summary, staying within the budget"""
+    from llm import generate
+    new_lines = []
+    for message in messages:
+        line = format_message(message)
+        if len(line) > SUMMARY_LINE_CHARS:
+            line = line[:SUMMARY_LINE_CHARS - 3] + "..."
+        new_lines.append(f"- {line}")
+    # Simulated: an extractive summary; a real model gets the old summary plus only the new messages
+    extractive = "\n".join(_fit_lines(previous.splitlines() + new_lines, token_budget))
+    return await generate(
+        f"Update this conversation summary in at most {token_budget} tokens.\n"
+        f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n" + "\n".join(new_lines),
+        simulated_response=extractive
+    )
+
+async def build_context(conversation_id: str, agent_name: str, token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Assemble an agent's view of a conversation: a rolling summary of older messages plus recent ones verbatim"""
+    from llm import estimate_tokens
+    conversation = CONVERSATION_STORE.get(conversation_id)
+    messages = conversation.messages if conversation is not None else []
+    summary = cached_summary(conversation_id)
+    summary_budget = int(token_budget * SUMMARY_SHARE)
+    verbatim_budget = token_budget - summary_budget
+
+    # Walk back from the newest message while it fits, never reaching into already summarized history
+    start = len(messages)
+    used = 0
+    while start > summary.covered:
+        cost = estimate_tokens(format_message(messages[start - 1]))
+        if used + cost > verbatim_budget:
+            break
+        used += cost
+        start -= 1
+
+    # Only messages that just fell out of the verbatim window are summarized
+    if start > summary.covered:
+        summary.text = await summarize(summary.text, messages[summary.covered:start], summary_budget)
+        summary.covered = start
+
+    sections = [f"Conversation context for {agent_name}:"]
+    if summary.text:
+        sections.append("Summary of earlier messages:\n" + summary.text)
+    if start < len(messages):
+        sections.append("Recent messages:\n" + "\n".join(format_message(m) for m in messages[start:]))
+    return "\n\n".join(sections)
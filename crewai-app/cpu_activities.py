@@ -0,0 +1,22 @@
+from typing import Any, Dict
+
+# CPU-heavy maintenance over the message log. These are plain functions: activity_executors
+# wraps each one as an activity that runs on the worker's thread pool, its process pool or the
+# event loop, as configured in activity_executors.DEFAULT_EXECUTION.
+
+def analyze_message_log(log_dir: str) -> Dict[str, Any]:
+    """Capacity-planning summary of the message log (see message_analytics); parses and reduces
+    every segment, so it holds the GIL for as long as the log is large"""
+    from message_analytics import analyze
+    from message_log import segment_paths, segments_locked
+    with segments_locked(log_dir):
+        # Scan in this process: it already is one of the worker's pool processes
+        summary, _ = analyze(segment_paths(log_dir), max_workers=1)
+    return summary
+
+def reindex_message_log(log_dir: str) -> int:
+    """Add every message in the log to the search index; returns how many were new"""
+    from search_index import reindex_logs
+    return reindex_logs(log_dir)
+
+CPU_FUNCTIONS = [analyze_message_log, reindex_message_log]
@@ -0,0 +1,128 @@
+from typing import Any, List, Optional
+import asyncio
+import json
+import os
+import urllib.request
+from temporalio import activity
+from llm_limiter import LLM_LIMITER, ACTIVITY_PRIORITIES
+from llm_batching import MicroBatcher
+
+# "simulated" keeps the canned agent output; "ollama" sends prompts to the model server;
+# "openai" and "batch" use an OpenAI-compatible completions endpoint (e.g. vLLM), one prompt
+# per request or micro-batched respectively
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "simulated")
+OLLAMA_API_BASE = os.environ.get("OLLAMA_API_BASE", "http://localhost:11434")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "ollama/deepseek-r1")
+LLM_COMPLETIONS_ENDPOINT = os.environ.get("LLM_COMPLETIONS_ENDPOINT", "http://localhost:8000/v1/completions")
+LLM_MAX_TOKENS = int(os.environ.get("LLM_MAX_TOKENS", "512"))
+LLM_REQUEST_TIMEOUT = float(os.environ.get("LLM_REQUEST_TIMEOUT", "300"))
+
+# Micro-batching: wait up to this long for more prompts, or flush as soon as the batch is full
+LLM_BATCH_WINDOW = float(os.environ.get("LLM_BATCH_WINDOW_MS", "20")) / 1000
+LLM_BATCH_MAX_SIZE = int(os.environ.get("LLM_BATCH_MAX_SIZE", "16"))
+
+# Semantic cache tier: reuse the answer to a near-identical earlier prompt (opt-in, needs numpy)
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_CAPACITY = int(os.environ.get("SEMANTIC_CACHE_CAPACITY", "1024"))
+_semantic_cache = None
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count used for rate limiting (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+def current_priority() -> str:
+    """Priority class of the activity making the call (demoted on the bulk lane), or "normal" outside activities"""
+    if activity.in_activity():
+        from priority_lanes import llm_priority
+        info = activity.info()
+        return llm_priority(info.task_queue, ACTIVITY_PRIORITIES.get(info.activity_type, "normal"))
+    return "normal"
+
+def _model_name() -> str:
+    return OLLAMA_MODEL.split("/", 1)[1] if OLLAMA_MODEL.startswith("ollama/") else OLLAMA_MODEL
+
+def model_id() -> str:
+    """The backend and model answering prompts, for keying cached model output"""
+    return f"{LLM_BACKEND}:{_model_name()}"
+
+def _ollama_generate(prompt: str) -> str:
+    request = urllib.request.Request(
+        f"{OLLAMA_API_BASE}/api/generate",
+        data=json.dumps({"model": _model_name(), "prompt": prompt, "stream": False}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=LLM_REQUEST_TIMEOUT) as response:
+        return json.loads(response.read())["response"]
+
+def _completions(prompts: List[str]) -> List[str]:
+    """Send one or more prompts in a single OpenAI-compatible completions request"""
+    request = urllib.request.Request(
+        LLM_COMPLETIONS_ENDPOINT,
+        data=json.dumps({"model": _model_name(), "prompt": prompts, "max_tokens": LLM_MAX_TOKENS}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=LLM_REQUEST_TIMEOUT) as response:
+        choices = json.loads(response.read())["choices"]
+    # Choices may come back in any order; each carries the index of its prompt
+    return [choice["text"] for choice in sorted(choices, key=lambda c: c["index"])]
+
+async def _send_batch(prompts: List[str]) -> List[str]:
+    return await asyncio.to_thread(_completions, prompts)
+
+# Shared by every activity on this worker when LLM_BACKEND is "batch"
+BATCHER = MicroBatcher(_send_batch, LLM_BATCH_WINDOW, LLM_BATCH_MAX_SIZE, estimate_tokens)
+
+def get_semantic_cache():
+    """Create the worker's semantic cache on first use"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        from semantic_cache import SemanticCache
+        _semantic_cache = SemanticCache(SEMANTIC_CACHE_CAPACITY, SEMANTIC_CACHE_THRESHOLD)
+    return _semantic_cache
+
+def cache_namespace(prompt: str, scope: Any = None) -> int:
+    """Semantic cache namespace of a prompt: the calling activity, the model and the exact
+    `scope` values the answer depends on (by default the prompt itself, i.e. exact matches only)"""
+    from semantic_cache import namespace_key
+    activity_type = activity.info().activity_type if activity.in_activity() else None
+    return namespace_key(activity_type, model_id(), prompt if scope is None else scope)
+
+async def generate(prompt: str, simulated_response: str = "", simulated_latency: float = 0.0,
+                   priority: Optional[str] = None, cache: bool = False, cache_scope: Any = None) -> str:
+    """Run one LLM call through the semantic cache (if requested) and the worker-wide rate limiter.
+    Cached answers are only reused for prompts with the same `cache_scope`; within it, prompts
+    that differ slightly (e.g. in conversation context, or in the wording of a topic the scope
+    holds normalized) match by similarity."""
+    from tracing import span
+    with span("llm.generate", **{"llm.backend": LLM_BACKEND, "llm.prompt_tokens": estimate_tokens(prompt)}) as current:
+        if cache and SEMANTIC_CACHE_ENABLED:
+            namespace = cache_namespace(prompt, cache_scope)
+            hit = get_semantic_cache().lookup(prompt, namespace)
+            if current is not None:
+                current.set_attribute("llm.cache_hit", hit is not None)
+            if hit is not None:
+                print(f"♻️  Semantic cache hit (similarity {hit[1]:.3f})")
+                return hit[0]
+        
+        response = await _generate(prompt, simulated_response, simulated_latency, priority)
+        
+        if cache and SEMANTIC_CACHE_ENABLED:
+            get_semantic_cache().store(prompt, response, namespace)
+        return response
+
+async def _generate(prompt: str, simulated_response: str, simulated_latency: float,
+                    priority: Optional[str]) -> str:
+    if priority is None:
+        priority = current_priority()
+    if LLM_BACKEND == "batch":
+        # The batcher takes a limiter slot per batch rather than per prompt
+        return await BATCHER.submit(prompt, priority)
+    async with LLM_LIMITER.acquire(priority, cost=estimate_tokens(prompt)):
+        # The HTTP clients block, so keep them off the worker's event loop
+        if LLM_BACKEND == "ollama":
+            return await asyncio.to_thread(_ollama_generate, prompt)
+        if LLM_BACKEND == "openai":
+            return (await asyncio.to_thread(_completions, [prompt]))[0]
+        await asyncio.sleep(simulated_latency)  # Simulate model latency
+        return simulated_response
@@ -0,0 +1,65 @@
+from typing import List, Callable, Awaitable, Optional
+import asyncio
+from llm_limiter import LLM_LIMITER, PRIORITY_CLASSES
+
+class MicroBatcher:
+    """Collect concurrent LLM prompts for a short window and send them as one batch request"""
+
+    def __init__(self, send_batch: Callable[[List[str]], Awaitable[List[str]]],
+                 window: float, max_size: int, estimate_tokens: Callable[[str], int]):
+        self.send_batch = send_batch
+        self.window = window
+        self.max_size = max_size
+        self.estimate_tokens = estimate_tokens
+        self._pending: List[tuple] = []  # (prompt, priority, future)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = set()
+        self.batches_sent = 0
+        self.prompts_sent = 0
+
+    async def submit(self, prompt: str, priority: str = "normal") -> str:
+        """Queue one prompt and wait for its own completion from the batch it lands in"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, priority, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            # Keep a reference so the task is not garbage collected mid-flight
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[tuple]) -> None:
+        live = [item for item in batch if not item[2].cancelled()]
+        if not live:
+            return
+        # The batch takes one limiter slot at the priority of its most urgent member
+        priority = min((item[1] for item in live),
+                       key=lambda p: PRIORITY_CLASSES.index(p) if p in PRIORITY_CLASSES else 1)
+        cost = sum(self.estimate_tokens(item[0]) for item in live)
+        try:
+            async with LLM_LIMITER.acquire(priority, cost=cost):
+                completions = await self.send_batch([item[0] for item in live])
+            if len(completions) != len(live):
+                raise ValueError(f"Batch of {len(live)} prompts returned {len(completions)} completions")
+        except Exception as e:
+            for _, _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_sent += 1
+        self.prompts_sent += len(live)
+        for (_, _, future), completion in zip(live, completions):
+            if not future.done():
+                future.set_result(completion)
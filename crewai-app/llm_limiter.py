@@ -0,0 +1,141 @@
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+import asyncio
+import heapq
+import itertools
+import os
+import time
+
+# Priority classes, most urgent first. Calls on a workflow's critical path jump the queue
+# ahead of background work such as responding to feedback.
+PRIORITY_CLASSES = ["critical", "normal", "background"]
+
+# Which priority class an activity's LLM calls belong to (anything else is "normal")
+ACTIVITY_PRIORITIES = {
+    "collaborative_report_writing": "critical",
+    "collaborative_research": "critical",
+    "writer_create_report": "critical",
+    "revise_report_sections": "critical",
+    "researcher_perform_research": "critical",
+    "agent_response_to_feedback": "background",
+    "resolve_agent_disagreement": "background",
+}
+
+# Worker-wide limits, overridable per deployment
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+LLM_TOKENS_PER_SECOND = float(os.environ.get("LLM_TOKENS_PER_SECOND", "2000"))
+LLM_TOKEN_BURST = float(os.environ.get("LLM_TOKEN_BURST", "8000"))
+RECENT_WAIT_WEIGHT = 0.2  # Weight of the newest grant in the moving average of recent waits
+
+@dataclass
+class PriorityStats:
+    granted: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    recent_wait: float = 0.0  # Exponentially weighted, so it follows the current load
+
+class LLMLimiter:
+    """Token bucket plus concurrency cap for LLM calls, granted strictly by priority class"""
+
+    def __init__(self, max_concurrency: int, tokens_per_second: float, burst: float):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_second = tokens_per_second
+        self.burst = burst
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+        self._active = 0
+        self._waiters: List[tuple] = []  # Heap of (priority rank, arrival order, cost, future, priority)
+        self._order = itertools.count()
+        self._retry_handle: Optional[asyncio.TimerHandle] = None
+        self._stats = {priority: PriorityStats() for priority in PRIORITY_CLASSES}
+
+    @asynccontextmanager
+    async def acquire(self, priority: str = "normal", cost: float = 1.0):
+        """Wait for a concurrency slot and `cost` tokens, then hold the slot for the block"""
+        if priority not in self._stats:
+            priority = "normal"
+        # A single call larger than the bucket could never be granted, so cap it at the burst size
+        cost = min(cost, self.burst)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITY_CLASSES.index(priority), next(self._order), cost, future, priority))
+        queued_at = time.monotonic()
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted at the same moment the caller was cancelled; hand the slot back
+                self._release()
+            else:
+                future.cancel()
+            raise
+
+        waited = time.monotonic() - queued_at
+        stats = self._stats[priority]
+        stats.granted += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+        stats.recent_wait += (waited - stats.recent_wait) * RECENT_WAIT_WEIGHT
+
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.tokens_per_second)
+        self._refilled_at = now
+
+    def _dispatch(self) -> None:
+        """Grant waiting calls in priority order while slots and tokens are available"""
+        self._refill()
+        while self._waiters and self._active < self.max_concurrency:
+            _, _, cost, future, _ = self._waiters[0]
+            if future.cancelled():
+                heapq.heappop(self._waiters)
+                continue
+            if self._tokens < cost:
+                # Come back once the bucket has refilled enough for the head of the queue
+                if self._retry_handle is None or self._retry_handle.cancelled():
+                    delay = (cost - self._tokens) / self.tokens_per_second
+                    self._retry_handle = asyncio.get_running_loop().call_later(delay, self._retry_dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self._tokens -= cost
+            self._active += 1
+            future.set_result(None)
+
+    def _retry_dispatch(self) -> None:
+        self._retry_handle = None
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and wait-time metrics per priority class"""
+        depth = {priority: 0 for priority in PRIORITY_CLASSES}
+        for _, _, _, future, priority in self._waiters:
+            if not future.done():
+                depth[priority] += 1
+        return {
+            "active": self._active,
+            "available_tokens": self._tokens,
+            "queue_depth": depth,
+            "wait_seconds": {
+                priority: {
+                    "granted": stats.granted,
+                    "mean": stats.total_wait / stats.granted if stats.granted else 0.0,
+                    "max": stats.max_wait,
+                    "recent": stats.recent_wait,
+                }
+                for priority, stats in self._stats.items()
+            },
+        }
+
+# Shared by every activity running on this worker
+LLM_LIMITER = LLMLimiter(LLM_MAX_CONCURRENCY, LLM_TOKENS_PER_SECOND, LLM_TOKEN_BURST)
@@ -0,0 +1,246 @@
+"""Offline capacity-planning analytics over the segmented message log
+
+Each segment is memory-mapped and parsed one record at a time in a worker process, which
+reduces it to small aggregates (counts per conversation and per sender -> recipient pair,
+question -> answer gaps, thinking steps per phase). Only those aggregates cross process
+boundaries, so memory stays bounded by the number of conversations rather than messages:
+thinking steps are kept as one bitmask of step numbers per workflow run and phase (so a step
+logged again by a retried activity counts once), and a question still unanswered after
+ANSWER_WINDOW_SEGMENTS more segments is counted as unanswered and forgotten, unless the caller
+asks for details (exact matching across the whole log, and the ids of unanswered questions).
+
+    python message_analytics.py --format json
+    python message_analytics.py --format csv --output /tmp/agent_analytics
+    python message_analytics.py --details     # Match answers across any number of segments
+    python message_analytics.py --on-worker  # On a worker's process pool, after reindexing search
+"""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+import argparse
+import contextlib
+import csv
+import json
+import mmap
+import os
+import sys
+import numpy as np
+
+THINKING_MESSAGE_TYPE = "thinking"
+PERCENTILES = [50, 90, 99]
+# Segments after its own in which an answer to a question is still looked for (without details)
+ANSWER_WINDOW_SEGMENTS = int(os.environ.get("ANALYTICS_ANSWER_WINDOW_SEGMENTS", "4"))
+
+def scan_segment(path: str) -> Dict[str, Any]:
+    """Reduce one segment to mergeable aggregates (runs in a worker process)"""
+    conversations = []
+    pairs = []
+    question_ids = []
+    question_times = []
+    answer_parents = []
+    answer_times = []
+    # (phase, conversation, workflow run) -> bitmask of the step numbers logged in this segment
+    thinking: Dict[Tuple[str, str, str], int] = {}
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return _empty_partial()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start = 0
+            while True:
+                end = mapped.find(b"\n", start)
+                if end == -1:
+                    break  # Anything after the last newline is a torn write
+                record = json.loads(mapped[start:end])
+                start = end + 1
+
+                message = record["message"]
+                message_type = message.get("message_type")
+                if message_type == THINKING_MESSAGE_TYPE:
+                    metadata = message.get("metadata") or {}
+                    phase = metadata.get("phase", "unknown")
+                    # The id is thinking-<workflow>-<run>-<phase>-<step>, the same on every attempt
+                    run = message["message_id"].rsplit("-", 1)[0]
+                    key = (phase, record["conversation_id"], run)
+                    thinking[key] = thinking.get(key, 0) | (1 << int(metadata.get("step", 0)))
+                    continue
+                conversations.append(record["conversation_id"])
+                sender = message.get("sender")
+                for recipient in message.get("recipients") or [message.get("recipient")]:
+                    pairs.append(f"{sender}\t{recipient}")
+                if message_type == "question":
+                    question_ids.append(message["message_id"])
+                    question_times.append(message.get("timestamp") or 0.0)
+                elif message_type == "answer" and message.get("related_to"):
+                    answer_parents.append(message["related_to"])
+                    answer_times.append(message.get("timestamp") or 0.0)
+
+    # Vectorized reductions over this segment's columns (fixed-width strings sort far faster than objects)
+    conversation_keys, conversation_counts = np.unique(np.array(conversations, dtype=str), return_counts=True)
+    pair_keys, pair_counts = np.unique(np.array(pairs, dtype=str), return_counts=True)
+
+    # Match answers to questions within the segment by binary search; the rest is resolved after merging
+    question_ids_array = np.array(question_ids, dtype=str)
+    answer_parents_array = np.array(answer_parents, dtype=str)
+    order = np.argsort(question_ids_array)
+    sorted_ids = question_ids_array[order]
+    positions = np.minimum(np.searchsorted(sorted_ids, answer_parents_array), max(len(sorted_ids) - 1, 0))
+    answered = sorted_ids[positions] == answer_parents_array if len(sorted_ids) else np.zeros(len(answer_parents), bool)
+    asked_at = np.asarray(question_times, dtype=np.float64)[order[positions[answered]]]
+    gaps = np.asarray(answer_times, dtype=np.float64)[answered] - asked_at
+    matched = set(answer_parents_array[answered].tolist())
+
+    return {
+        "conversations": dict(zip(conversation_keys.tolist(), conversation_counts.tolist())),
+        "pairs": dict(zip(pair_keys.tolist(), pair_counts.tolist())),
+        "gaps": gaps,
+        "open_questions": {qid: t for qid, t in zip(question_ids, question_times) if qid not in matched},
+        "open_answers": [(parent, t) for parent, t, hit in zip(answer_parents, answer_times, answered) if not hit],
+        "thinking": thinking,
+    }
+
+def _empty_partial() -> Dict[str, Any]:
+    return {"conversations": {}, "pairs": {}, "gaps": np.empty(0), "open_questions": {},
+            "open_answers": [], "thinking": {}}
+
+def _distribution(values: np.ndarray) -> Dict[str, float]:
+    if values.size == 0:
+        return {"count": 0}
+    summary = {"count": int(values.size), "mean": float(values.mean()), "max": float(values.max())}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{p}"] = float(value)
+    return summary
+
+def analyze(paths: List[str], max_workers: Optional[int] = None,
+            details: bool = False) -> Tuple[Dict[str, Any], Counter]:
+    """Scan segments in a process pool (or in this process when max_workers is 1); return the
+    merged summary and the message count per conversation. With `details`, questions wait for
+    their answer until the end of the log and the summary lists the ids of unanswered ones."""
+    conversations = Counter()
+    pairs = Counter()
+    gaps = []
+    open_questions: Dict[str, Tuple[float, int]] = {}  # Question id -> (asked at, segment), oldest first
+    expired_questions = 0
+    unmatched = 0
+    thinking: Dict[Tuple[str, str, str], int] = {}
+
+    with contextlib.ExitStack() as stack:
+        scan = map if max_workers == 1 else stack.enter_context(ProcessPoolExecutor(max_workers=max_workers)).map
+        # Results arrive in segment order, so questions are seen before later answers
+        for segment, partial in enumerate(scan(scan_segment, paths)):
+            conversations.update(partial["conversations"])
+            pairs.update(partial["pairs"])
+            gaps.append(partial["gaps"])
+            while not details and open_questions:
+                oldest = next(iter(open_questions))
+                if open_questions[oldest][1] >= segment - ANSWER_WINDOW_SEGMENTS:
+                    break
+                del open_questions[oldest]
+                expired_questions += 1
+            # Answers whose question lives in an earlier segment
+            cross_segment = []
+            for parent, answered_at in partial["open_answers"]:
+                asked = open_questions.pop(parent, None)
+                if asked is None:
+                    unmatched += 1
+                else:
+                    cross_segment.append(answered_at - asked[0])
+            gaps.append(np.asarray(cross_segment, dtype=np.float64))
+            open_questions.update((qid, (t, segment)) for qid, t in partial["open_questions"].items())
+            for key, steps in partial["thinking"].items():
+                thinking[key] = thinking.get(key, 0) | steps
+
+    per_phase: Dict[str, Counter] = {}
+    for (phase, conversation, _), steps in thinking.items():
+        per_phase.setdefault(phase, Counter())[conversation] += bin(steps).count("1")
+    sizes = np.fromiter(conversations.values(), dtype=np.int64, count=len(conversations))
+
+    summary = {
+        "segments": len(paths),
+        "messages": int(sizes.sum()),
+        "conversations": len(conversations),
+        "messages_per_conversation": _distribution(sizes),
+        "pairs": [
+            {"sender": key.split("\t")[0], "recipient": key.split("\t")[1], "messages": count}
+            for key, count in pairs.most_common()
+        ],
+        "response_gaps_seconds": {
+            **_distribution(np.concatenate(gaps)),
+            "unanswered_questions": len(open_questions) + expired_questions,
+            "answers_without_question": unmatched,
+        },
+        "thinking_steps_per_phase": [
+            {"phase": phase, "steps": sum(runs.values()), "runs": len(runs),
+             "mean_per_run": sum(runs.values()) / len(runs)}
+            for phase, runs in sorted(per_phase.items())
+        ],
+    }
+    if details:
+        summary["response_gaps_seconds"]["unanswered_question_ids"] = list(open_questions)
+    return summary, conversations
+
+def write_csv(summary: Dict[str, Any], conversation_sizes: Counter, output_dir: str) -> None:
+    """Write one CSV per aggregate into output_dir"""
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "messages_per_conversation.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["conversation_id", "messages"])
+        writer.writerows(conversation_sizes.items())
+    with open(os.path.join(output_dir, "pairs.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["sender", "recipient", "messages"])
+        writer.writeheader()
+        writer.writerows(summary["pairs"])
+    with open(os.path.join(output_dir, "response_gaps.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["statistic", "value"])
+        writer.writerows((statistic, value) for statistic, value in summary["response_gaps_seconds"].items()
+                         if statistic != "unanswered_question_ids")
+    with open(os.path.join(output_dir, "thinking_steps_per_phase.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["phase", "steps", "runs", "mean_per_run"])
+        writer.writeheader()
+        writer.writerows(summary["thinking_steps_per_phase"])
+    print(f"Wrote CSV summaries to {output_dir}")
+
+async def analyze_on_worker(log_dir: str) -> Dict[str, Any]:
+    """Run MessageLogAnalyticsWorkflow on the bulk lane; `log_dir` is read on the worker's host"""
+    import time
+    from temporalio.client import Client as TemporalClient
+    from priority_lanes import task_queue_for
+    from workflows import MessageLogAnalyticsWorkflow
+    client = await TemporalClient.connect(f"{os.environ.get('TEMPORAL_HOST', 'temporal')}:"
+                                          f"{os.environ.get('TEMPORAL_PORT', '7233')}")
+    return await client.execute_workflow(MessageLogAnalyticsWorkflow.run, log_dir,
+                                         id=f"message-log-analytics-{int(time.time())}",
+                                         task_queue=task_queue_for("bulk"))
+
+if __name__ == "__main__":
+    from message_log import segment_paths, segments_locked
+    from messages import MESSAGE_LOG_DIR
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log-dir", default=MESSAGE_LOG_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--output", help="JSON file, or directory for CSV files (default: stdout / ./analytics)")
+    parser.add_argument("--details", action="store_true",
+                        help="Match answers across the whole log and list unanswered question ids")
+    parser.add_argument("--on-worker", action="store_true",
+                        help="Reindex and analyze on a worker instead of in this process (JSON only)")
+    args = parser.parse_args()
+    if args.on_worker and (args.format == "csv" or args.details):
+        parser.error("--on-worker returns only the JSON summary, without details")
+
+    if args.on_worker:
+        import asyncio
+        summary = asyncio.run(analyze_on_worker(args.log_dir))["summary"]
+    else:
+        with segments_locked(args.log_dir):
+            summary, conversation_sizes = analyze(segment_paths(args.log_dir), args.workers, args.details)
+    if args.format == "csv":
+        write_csv(summary, conversation_sizes, args.output or "analytics")
+    else:
+        output = json.dumps(summary, indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(output + "\n")
+        else:
+            sys.stdout.write(output + "\n")
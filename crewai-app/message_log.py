@@ -0,0 +1,417 @@
+from typing import Callable, List, Dict, Any, Optional, Tuple, Iterator, Set
+import argparse
+import asyncio
+import contextlib
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+
+# Rotate to a new segment once the active one reaches this size or age
+SEGMENT_MAX_BYTES = int(os.environ.get("MESSAGE_LOG_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+SEGMENT_MAX_AGE = float(os.environ.get("MESSAGE_LOG_SEGMENT_SECONDS", "3600"))
+# Sealed segments older than this are deleted
+RETENTION_SECONDS = float(os.environ.get("MESSAGE_LOG_RETENTION_DAYS", "7")) * 86400
+# How often the background task compacts and applies retention
+MAINTENANCE_INTERVAL = float(os.environ.get("MESSAGE_LOG_MAINTENANCE_SECONDS", "600"))
+
+SEGMENT_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+# Held by the one MessageLog that writes a directory, for as long as it writes
+WRITER_LOCK = "writer.lock"
+# Shared while segment files are scanned, exclusive while compaction or retention rewrites
+# or deletes them
+SEGMENTS_LOCK = "segments.lock"
+
+def segment_path(directory: str, seq: int) -> str:
+    return os.path.join(directory, f"segment-{seq:08d}{SEGMENT_SUFFIX}")
+
+def index_path(directory: str, seq: int) -> str:
+    return os.path.join(directory, f"segment-{seq:08d}{INDEX_SUFFIX}")
+
+def segment_paths(directory: str) -> List[str]:
+    """All segment files in a log directory, oldest first"""
+    return sorted(glob.glob(os.path.join(directory, f"segment-*{SEGMENT_SUFFIX}")))
+
+def _segment_seq(path: str) -> int:
+    return int(os.path.basename(path)[len("segment-"):-len(SEGMENT_SUFFIX)])
+
+@contextlib.contextmanager
+def segments_locked(directory: str, exclusive: bool = False) -> Iterator[None]:
+    """Hold the directory's segment lock (across processes). Take it shared around listing and
+    reading segments outside the writer, e.g. in a process pool, so no segment is merged away
+    or deleted between the two."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, SEGMENTS_LOCK), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def iter_segment_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream the records of one segment: {"conversation_id", "topic", "message"} per line"""
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # A torn final write from a crash; everything before it is intact
+            yield json.loads(line)
+
+def _scan_segment(path: str) -> List[Tuple[str, int, int]]:
+    """Rebuild a segment's index entries (conversation_id, offset, length) from its records"""
+    entries = []
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            entries.append((json.loads(line)["conversation_id"], offset, len(line)))
+            offset += len(line)
+    return entries
+
+class MessageLog:
+    """Append-only message log split into size- and time-bounded segments
+
+    Each segment holds one JSON record per message, from any number of conversations,
+    and has a small sidecar index of (conversation_id, offset, length) lines. The sidecars
+    are loaded into a dict on first use, so finding a conversation's messages is a single
+    lookup followed by one read per record, however many segments exist.
+
+    `on_expire` is called with the message ids of each segment retention is about to delete,
+    so derived stores (e.g. the search index) can drop them too; if it raises, the segment is
+    kept and retried on the next pass.
+
+    A directory has a single writer: the in-memory index and the next segment number are this
+    process's alone, so the first append, compaction or retention pass takes an exclusive
+    lock on the directory and raises RuntimeError if another process holds it. Run one worker
+    process per log directory (its lane workers share the process's MessageLog), and run the
+    maintenance commands below only while no worker is writing. Other processes may read the
+    segment files under segments_locked.
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int = SEGMENT_MAX_BYTES,
+                 segment_max_age: float = SEGMENT_MAX_AGE, retention: float = RETENTION_SECONDS,
+                 on_expire: Optional[Callable[[List[str]], Any]] = None):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self.retention = retention
+        self.on_expire = on_expire
+        self._lock = threading.RLock()
+        self._loaded = False
+        # conversation_id -> [(segment seq, offset, length)] in append order
+        self._index: Dict[str, List[Tuple[int, int, int]]] = {}
+        self._segment_conversations: Dict[int, Set[str]] = {}
+        self._active_seq: Optional[int] = None
+        self._active = None
+        self._active_index = None
+        self._active_opened = 0.0
+        self._writer_lock = None
+
+    # Nothing touches the filesystem until first use, so importing this module stays side-effect free
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for path in segment_paths(self.directory):
+            seq = _segment_seq(path)
+            idx = index_path(self.directory, seq)
+            try:
+                with open(idx) as f:
+                    entries = [tuple(json.loads(line)) for line in f if line.endswith("\n")]
+            except (OSError, ValueError):
+                # Missing or damaged sidecar: rebuild it from the segment itself
+                entries = _scan_segment(path)
+                self._write_index(idx, entries)
+            self._add_entries(seq, entries)
+        self._loaded = True
+
+    def _acquire_writer(self) -> None:
+        """Take (once) the directory's writer lock, failing if another process writes it"""
+        if self._writer_lock is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        lock = open(os.path.join(self.directory, WRITER_LOCK), "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            raise RuntimeError(f"Message log {self.directory} is being written by another process; "
+                               f"only one process may write a log directory") from None
+        self._writer_lock = lock
+
+    def _add_entries(self, seq: int, entries: List[Tuple[str, int, int]]) -> None:
+        conversations = self._segment_conversations.setdefault(seq, set())
+        for conversation_id, offset, length in entries:
+            self._index.setdefault(conversation_id, []).append((seq, offset, length))
+            conversations.add(conversation_id)
+
+    @staticmethod
+    def _write_index(path: str, entries: List[Tuple[str, int, int]]) -> None:
+        with open(path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(list(entry)) + "\n")
+
+    def _seal_active(self) -> None:
+        if self._active is not None:
+            self._active.close()
+            self._active_index.close()
+            self._active = self._active_index = None
+            self._active_seq = None
+
+    def _open_segment(self) -> None:
+        # A restarted worker always starts a new segment; compaction folds small ones together
+        existing = list(self._segment_conversations)
+        self._active_seq = max(existing) + 1 if existing else 1
+        self._active = open(segment_path(self.directory, self._active_seq), "ab")
+        self._active_index = open(index_path(self.directory, self._active_seq), "a")
+        self._active_opened = time.time()
+        self._segment_conversations[self._active_seq] = set()
+
+    def append(self, conversation_id: str, topic: Optional[str], message: Dict[str, Any]) -> None:
+        """Append one message to the active segment, rotating it first when it is full or old"""
+        self.append_batch([(conversation_id, topic, message)])
+
+    def append_batch(self, records: List[Tuple[str, Optional[str], Dict[str, Any]]]) -> None:
+        """Append (conversation_id, topic, message) records with one write and one flush per segment"""
+        lines = [
+            (conversation_id, (json.dumps({"conversation_id": conversation_id, "topic": topic, "message": message},
+                                          default=str) + "\n").encode())
+            for conversation_id, topic, message in records
+        ]
+        with self._lock:
+            self._acquire_writer()
+            self._ensure_loaded()
+            pending, pending_index, entries = [], [], []
+            pending_bytes = 0
+            for conversation_id, line in lines:
+                if self._active is not None and (
+                    self._active.tell() + pending_bytes + len(line) > self.segment_max_bytes
+                    or time.time() - self._active_opened > self.segment_max_age
+                ):
+                    self._flush_pending(pending, pending_index, entries)
+                    pending_bytes = 0
+                    self._seal_active()
+                if self._active is None:
+                    self._open_segment()
+                offset = self._active.tell() + pending_bytes
+                pending_bytes += len(line)
+                pending.append(line)
+                pending_index.append(json.dumps([conversation_id, offset, len(line)]) + "\n")
+                entries.append((conversation_id, offset, len(line)))
+            self._flush_pending(pending, pending_index, entries)
+
+    def _flush_pending(self, pending: List[bytes], pending_index: List[str],
+                       entries: List[Tuple[str, int, int]]) -> None:
+        if not pending:
+            return
+        self._active.write(b"".join(pending))
+        self._active.flush()
+        self._active_index.write("".join(pending_index))
+        self._active_index.flush()
+        self._add_entries(self._active_seq, entries)
+        pending.clear()
+        pending_index.clear()
+        entries.clear()
+
+    def read_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Return {"conversation_id", "topic", "messages"} for a logged conversation, or None"""
+        with self._lock:
+            self._ensure_loaded()
+            entries = self._index.get(conversation_id)
+            if not entries:
+                return None
+            topic = None
+            messages = []
+            seen = set()
+            files = {}
+            try:
+                for seq, offset, length in entries:
+                    f = files.get(seq)
+                    if f is None:
+                        f = files[seq] = open(segment_path(self.directory, seq), "rb")
+                    f.seek(offset)
+                    record = json.loads(f.read(length))
+                    topic = topic or record.get("topic")
+                    # A compaction interrupted before cleanup can leave a message in two segments
+                    if record["message"]["message_id"] not in seen:
+                        seen.add(record["message"]["message_id"])
+                        messages.append(record["message"])
+            finally:
+                for f in files.values():
+                    f.close()
+            return {"conversation_id": conversation_id, "topic": topic, "messages": messages}
+
+    def conversation_ids(self) -> List[str]:
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._index)
+
+    def _forget_segment(self, seq: int) -> None:
+        """Remove a segment's entries from the in-memory index"""
+        for conversation_id in self._segment_conversations.pop(seq, set()):
+            remaining = [entry for entry in self._index.get(conversation_id, []) if entry[0] != seq]
+            if remaining:
+                self._index[conversation_id] = remaining
+            else:
+                self._index.pop(conversation_id, None)
+
+    def _drop_segment(self, seq: int) -> None:
+        """Forget a sealed segment and delete its files"""
+        self._forget_segment(seq)
+        for path in (segment_path(self.directory, seq), index_path(self.directory, seq)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _sealed_segments(self) -> List[int]:
+        return sorted(seq for seq in self._segment_conversations if seq != self._active_seq)
+
+    def apply_retention(self, now: Optional[float] = None) -> int:
+        """Delete sealed segments last written more than `retention` seconds ago"""
+        now = time.time() if now is None else now
+        # Wait for readers of the segment files before taking the log's lock, so appends go on meanwhile
+        with segments_locked(self.directory, exclusive=True), self._lock:
+            self._acquire_writer()
+            self._ensure_loaded()
+            return self._expire(now)
+
+    def _expire(self, now: float) -> int:
+        removed = 0
+        for seq in self._sealed_segments():
+            try:
+                modified = os.path.getmtime(segment_path(self.directory, seq))
+            except FileNotFoundError:
+                modified = 0
+            if now - modified > self.retention:
+                if self.on_expire is not None and modified:  # A missing segment has nothing to unindex
+                    records = iter_segment_records(segment_path(self.directory, seq))
+                    self.on_expire([record["message"]["message_id"] for record in records])
+                self._drop_segment(seq)
+                removed += 1
+        return removed
+
+    def compact(self) -> int:
+        """Merge runs of small sealed segments into one, grouping each conversation's records together
+
+        Returns the number of segments removed. The merged segment keeps the lowest sequence
+        number of its run, so segment order (and message order per conversation) is unchanged.
+        """
+        with segments_locked(self.directory, exclusive=True), self._lock:
+            self._acquire_writer()
+            self._ensure_loaded()
+            runs = []
+            run, run_bytes = [], 0
+            for seq in self._sealed_segments():
+                size = os.path.getsize(segment_path(self.directory, seq))
+                small = size < self.segment_max_bytes // 2
+                if small and run and seq == run[-1] + 1 and run_bytes + size <= self.segment_max_bytes:
+                    run.append(seq)
+                    run_bytes += size
+                    continue
+                if len(run) > 1:
+                    runs.append(run)
+                run, run_bytes = ([seq], size) if small else ([], 0)
+            if len(run) > 1:
+                runs.append(run)
+
+            removed = 0
+            for run in runs:
+                removed += self._merge(run)
+            return removed
+
+    def _merge(self, run: List[int]) -> int:
+        target = run[0]
+        grouped: Dict[str, List[bytes]] = {}
+        for seq in run:
+            with open(segment_path(self.directory, seq), "rb") as f:
+                for line in f:
+                    if line.endswith(b"\n"):
+                        grouped.setdefault(json.loads(line)["conversation_id"], []).append(line)
+
+        tmp_segment = segment_path(self.directory, target) + ".tmp"
+        tmp_index = index_path(self.directory, target) + ".tmp"
+        entries = []
+        offset = 0
+        with open(tmp_segment, "wb") as f:
+            for conversation_id, lines in grouped.items():
+                for line in lines:
+                    f.write(line)
+                    entries.append((conversation_id, offset, len(line)))
+                    offset += len(line)
+        self._write_index(tmp_index, entries)
+        # The merged segment expires with the newest message it holds, not when it was rewritten
+        modified = max(os.path.getmtime(segment_path(self.directory, seq)) for seq in run)
+        for path in (tmp_segment, tmp_index):
+            os.utime(path, (modified, modified))
+
+        # Swap in the merged segment before deleting the rest of the run, so a crash in between
+        # leaves duplicates (skipped when reading) rather than losing messages
+        os.replace(tmp_segment, segment_path(self.directory, target))
+        os.replace(tmp_index, index_path(self.directory, target))
+        self._forget_segment(target)
+        self._add_entries(target, entries)
+        for conversation_id in grouped:
+            self._index[conversation_id].sort()  # Back into (segment, offset) order
+        for seq in run[1:]:
+            self._drop_segment(seq)
+        return len(run) - 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._seal_active()
+            if self._writer_lock is not None:
+                self._writer_lock.close()  # Closing the file releases the lock
+                self._writer_lock = None
+
+async def run_maintenance(log: MessageLog, interval: float = MAINTENANCE_INTERVAL) -> None:
+    """Periodically compact small segments and apply retention, off the event loop"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            compacted = await asyncio.to_thread(log.compact)
+            expired = await asyncio.to_thread(log.apply_retention)
+            if compacted or expired:
+                print(f"Message log maintenance: merged away {compacted} segments, deleted {expired} expired")
+        except Exception as e:
+            print(f"Warning: Message log maintenance failed: {e}")
+
+def migrate_legacy_logs(log: MessageLog) -> int:
+    """Move per-conversation conversation_*.json files into the segmented log and delete them"""
+    migrated = 0
+    for path in sorted(glob.glob(os.path.join(log.directory, "conversation_*.json"))):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read message log {path}: {e}")
+            continue
+        for message in data.get("messages", []):
+            log.append(data["conversation_id"], data.get("topic"), message)
+            migrated += 1
+        os.remove(path)
+    return migrated
+
+if __name__ == "__main__":
+    from messages import MESSAGE_LOG_DIR
+    parser = argparse.ArgumentParser(description="Maintain the segmented agent message log")
+    parser.add_argument("command", choices=["stats", "compact", "retention", "migrate"])
+    parser.add_argument("--log-dir", default=MESSAGE_LOG_DIR)
+    args = parser.parse_args()
+
+    from search_index import delete_messages
+    log = MessageLog(args.log_dir, on_expire=delete_messages)
+    if args.command == "compact":
+        print(f"Merged away {log.compact()} segments")
+    elif args.command == "retention":
+        print(f"Deleted {log.apply_retention()} expired segments")
+    elif args.command == "migrate":
+        print(f"Migrated {migrate_legacy_logs(log)} messages from per-conversation files")
+    log.close()
+    with segments_locked(args.log_dir):
+        paths = segment_paths(args.log_dir)
+        size = sum(os.path.getsize(p) for p in paths)
+    print(f"{len(paths)} segments, {size} bytes, {len(log.conversation_ids())} conversations")
@@ -1,10 +1,14 @@
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
+import asyncio
+import bisect
+import os
 import time
+from collections import deque, OrderedDict
 from temporalio import activity
 import uuid
-import json
-import os
+from message_log import MessageLog
+from write_behind import WriteBehindWriter
 
 @dataclass
 class Message:
@@ -16,6 +20,7 @@ class Message:
     timestamp: float = field(default_factory=time.time)
     related_to: Optional[str] = None  # ID of message this is responding to
     metadata: Dict[str, Any] = field(default_factory=dict)
+    recipients: List[str] = field(default_factory=list)  # Individual recipient names
 
 @dataclass
 class Conversation:
@@ -25,10 +30,116 @@ class Conversation:
     status: str = "active"  # active, completed, etc.
     timestamp: float = field(default_factory=time.time)
 
+@dataclass
+class Mailbox:
+    owner: str
+    messages: List[Message] = field(default_factory=list)
+    timestamps: List[float] = field(default_factory=list)  # Parallel to messages, kept sorted
+    start: int = 0  # Entries before this index were trimmed and are no longer part of the mailbox
+
 # Global store for conversations
 CONVERSATION_STORE = {}
 MESSAGE_LOG_DIR = "/tmp/agent_messages"
 
+def _unindex_expired(message_ids: List[str]) -> None:
+    """Drop messages in a segment that retention is deleting from the full-text search index"""
+    from search_index import delete_messages
+    delete_messages(message_ids)
+
+# Segmented on-disk log of every message, shared by all conversations
+MESSAGE_LOG = MessageLog(MESSAGE_LOG_DIR, on_expire=_unindex_expired)
+
+def _index_written(records: List[tuple]) -> None:
+    """Add a freshly written batch to the full-text search index, one transaction per conversation"""
+    from search_index import index_messages
+    by_conversation: Dict[str, List[Dict[str, Any]]] = {}
+    for conversation_id, _, message in records:
+        by_conversation.setdefault(conversation_id, []).append(message)
+    for conversation_id, batch in by_conversation.items():
+        index_messages(batch, conversation_id)
+
+# Writes the log (and the search index) from a background thread, off the event loop
+MESSAGE_WRITER = WriteBehindWriter(MESSAGE_LOG, after_write=_index_written)
+
+# Mailbox index keyed by agent name, so an agent's inbox never requires scanning conversations
+MAILBOX_INDEX: Dict[str, Mailbox] = {}
+# Messages kept per mailbox; older ones are dropped from memory (the message log keeps them)
+MAILBOX_MAX_MESSAGES = int(os.environ.get("MAILBOX_MAX_MESSAGES", "10000"))
+
+# Reply-thread indexes: message_id -> message, and parent message_id -> replies (via related_to).
+# They hold the newest MESSAGE_INDEX_SIZE messages; older ones are evicted (the message log keeps them).
+MESSAGE_INDEX_SIZE = int(os.environ.get("MESSAGE_INDEX_SIZE", "100000"))
+MESSAGE_INDEX: "OrderedDict[str, Message]" = OrderedDict()
+REPLY_INDEX: Dict[str, List[Message]] = {}
+
+def deliver_to_mailboxes(message: Message, recipient_names: List[str]) -> None:
+    """Deliver one message to every recipient's mailbox in a single pass"""
+    for name in dict.fromkeys(recipient_names):  # Deduplicate while keeping order
+        mailbox = MAILBOX_INDEX.get(name)
+        if mailbox is None:
+            mailbox = MAILBOX_INDEX[name] = Mailbox(owner=name)
+        # Messages normally arrive in timestamp order, so this is an append
+        position = bisect.bisect_right(mailbox.timestamps, message.timestamp, lo=mailbox.start)
+        mailbox.timestamps.insert(position, message.timestamp)
+        mailbox.messages.insert(position, message)
+        # Trim by moving the start; the trimmed prefix is only deleted once it is as long as the
+        # mailbox, so each message is shifted a constant number of times on average
+        mailbox.start = max(mailbox.start, len(mailbox.messages) - MAILBOX_MAX_MESSAGES)
+        if mailbox.start >= MAILBOX_MAX_MESSAGES:
+            del mailbox.timestamps[:mailbox.start]
+            del mailbox.messages[:mailbox.start]
+            mailbox.start = 0
+
+def read_inbox(agent_name: str, since: Optional[float] = None) -> List[Message]:
+    """Return the messages delivered to an agent (the newest MAILBOX_MAX_MESSAGES), optionally only those newer than `since`"""
+    mailbox = MAILBOX_INDEX.get(agent_name)
+    if mailbox is None:
+        return []
+    if since is None:
+        return mailbox.messages[mailbox.start:]
+    start = bisect.bisect_right(mailbox.timestamps, since, lo=mailbox.start)
+    return mailbox.messages[start:]
+
+def index_message(message: Message) -> None:
+    """Add a message to the id map and to its parent's reply list, evicting the oldest beyond the cap"""
+    MESSAGE_INDEX[message.message_id] = message
+    if message.related_to is not None:
+        REPLY_INDEX.setdefault(message.related_to, []).append(message)
+    while len(MESSAGE_INDEX) > MESSAGE_INDEX_SIZE:
+        _, evicted = MESSAGE_INDEX.popitem(last=False)
+        # Replies arrive after their parent, so the oldest message's replies become thread roots
+        REPLY_INDEX.pop(evicted.message_id, None)
+        siblings = REPLY_INDEX.get(evicted.related_to)
+        if siblings is not None:
+            siblings.remove(evicted)
+            if not siblings:
+                del REPLY_INDEX[evicted.related_to]
+
+def collect_thread(message_id: str) -> List[Message]:
+    """Return the whole thread containing a message, root first, in reply order"""
+    # Walk up related_to links to the root that is still known to the index
+    root_id = message_id
+    seen = {root_id}
+    while root_id in MESSAGE_INDEX:
+        parent_id = MESSAGE_INDEX[root_id].related_to
+        if parent_id is None or parent_id not in MESSAGE_INDEX or parent_id in seen:
+            break
+        root_id = parent_id
+        seen.add(root_id)
+    
+    # Walk down the reply index breadth-first, touching only messages in this thread
+    thread = [MESSAGE_INDEX[root_id]] if root_id in MESSAGE_INDEX else []
+    pending = deque([root_id])
+    visited = {root_id}
+    while pending:
+        parent_id = pending.popleft()
+        for reply in REPLY_INDEX.get(parent_id, []):
+            if reply.message_id not in visited:
+                visited.add(reply.message_id)
+                thread.append(reply)
+                pending.append(reply.message_id)
+    return thread
+
 # Do NOT create directories here, as it will be executed inside workflow sandbox
 # Instead, we'll create the directory during activity execution
 
@@ -39,7 +150,16 @@ async def send_message(sender: Dict[str, Any], recipient: Any,
                       conversation_id: Optional[str] = None,
                       related_to: Optional[str] = None) -> Dict[str, Any]:
     """Send a message from one agent to another or to multiple agents"""
+    from tracing import span
     sender_name = sender["name"] if isinstance(sender, dict) else sender.name
+    with span("messages.send_message", agent=sender_name, message_type=message_type,
+              conversation_id=conversation_id):
+        return await _deliver_message(sender_name, recipient, content, message_type,
+                                      conversation_id, related_to)
+
+async def _deliver_message(sender_name: str, recipient: Any, content: str, message_type: str,
+                           conversation_id: Optional[str], related_to: Optional[str]) -> Dict[str, Any]:
+    from tracing import span
     
     # Handle individual recipient or list of recipients
     if isinstance(recipient, list):
@@ -54,6 +174,7 @@ async def send_message(sender: Dict[str, Any], recipient: Any,
     else:
         # Single recipient
         recipient_name = recipient["name"] if isinstance(recipient, dict) else recipient.name
+        recipient_names = [recipient_name]
     
     # Create the message
     message = Message(
@@ -61,19 +182,25 @@ async def send_message(sender: Dict[str, Any], recipient: Any,
         recipient=recipient_name,
         content=content,
         message_type=message_type,
-        related_to=related_to
+        related_to=related_to,
+        recipients=recipient_names
     )
     
     # Create or retrieve conversation
     if conversation_id is None or conversation_id not in CONVERSATION_STORE:
         conversation = Conversation(topic=f"Conversation between {sender_name} and {recipient_name}")
+        if conversation_id is not None:
+            # Keep a known id (e.g. one resumed from a checkpoint after a worker restart)
+            conversation.conversation_id = conversation_id
         CONVERSATION_STORE[conversation.conversation_id] = conversation
         conversation_id = conversation.conversation_id
     else:
         conversation = CONVERSATION_STORE[conversation_id]
     
-    # Add message to conversation
+    # Add message to conversation and deliver it to each recipient's mailbox
     conversation.messages.append(message)
+    index_message(message)
+    deliver_to_mailboxes(message, recipient_names)
     
     # Log the message
     timestamp = time.strftime("%H:%M:%S")
@@ -81,19 +208,19 @@ async def send_message(sender: Dict[str, Any], recipient: Any,
     print(f"  Type: {message_type}")
     print(f"  Content: {content}")
     
-    # Create directory and save message to file - safe in an activity
+    # Hand the message to the write-behind writer, which persists and indexes it in batches
     try:
-        os.makedirs(MESSAGE_LOG_DIR, exist_ok=True)
-        log_file = f"{MESSAGE_LOG_DIR}/conversation_{conversation_id}.json"
-        with open(log_file, "w") as f:
-            json.dump({
-                "conversation_id": conversation_id,
-                "topic": conversation.topic,
-                "messages": [vars(msg) for msg in conversation.messages]
-            }, f, indent=2, default=str)
+        with span("messages.enqueue", agent=sender_name, message_type=message_type,
+                  conversation_id=conversation_id):
+            await MESSAGE_WRITER.submit((conversation_id, conversation.topic, dict(vars(message))))
     except Exception as e:
         print(f"Warning: Could not save message log: {e}")
     
+    # Count the message once per recipient
+    from metrics import record_message
+    for name in recipient_names:
+        record_message(message_type, sender_name, name)
+    
     # Return message info
     return {
         "message_id": message.message_id,
@@ -159,18 +286,39 @@ async def provide_feedback(sender: Dict[str, Any], recipient: Dict[str, Any],
 @activity.defn
 async def get_conversation_history(conversation_id: str) -> List[Dict[str, Any]]:
     """Retrieve the conversation history"""
-    if conversation_id not in CONVERSATION_STORE:
-        return []
-    
-    conversation = CONVERSATION_STORE[conversation_id]
-    return [vars(msg) for msg in conversation.messages]
+    from tracing import span
+    with span("messages.get_conversation_history", conversation_id=conversation_id):
+        if conversation_id not in CONVERSATION_STORE:
+            # Not in memory (e.g. another worker ran it, or this one restarted): read it from the log.
+            # The read does file I/O and may wait on the log lock while compaction or retention
+            # runs, so it happens on a helper thread to keep the event loop free.
+            logged = await asyncio.to_thread(MESSAGE_LOG.read_conversation, conversation_id)
+            return logged["messages"] if logged is not None else []
+        
+        conversation = CONVERSATION_STORE[conversation_id]
+        return [vars(msg) for msg in conversation.messages]
+
+@activity.defn
+async def get_thread(message_id: str) -> List[Dict[str, Any]]:
+    """Retrieve only the messages in the reply thread containing `message_id`"""
+    return [vars(msg) for msg in collect_thread(message_id)]
+
+@activity.defn
+async def get_inbox(agent: Any, since: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Retrieve the messages delivered to an agent, optionally only those after `since`"""
+    agent_name = agent if isinstance(agent, str) else (agent["name"] if isinstance(agent, dict) else agent.name)
+    return [vars(msg) for msg in read_inbox(agent_name, since)]
+
+class InvalidDecisionError(ValueError):
+    """A collaboration that can never succeed as requested (e.g. fewer than two agents); retrying it
+    fails the same way, so the activity policies list it as non-retryable"""
 
 @activity.defn
 async def collaborate_on_decision(agents: List[Dict[str, Any]], topic: str, 
                                  initial_proposal: str) -> Dict[str, Any]:
     """Orchestrate a collaborative decision-making process between agents"""
     if len(agents) < 2:
-        raise ValueError("Collaboration requires at least two agents")
+        raise InvalidDecisionError("Collaboration requires at least two agents")
     
     # Create a new conversation for this collaboration
     conversation = Conversation(topic=f"Collaboration on: {topic}")
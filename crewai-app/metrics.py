@@ -0,0 +1,98 @@
+from typing import List, Optional
+import asyncio
+import os
+from temporalio.common import MetricMeter
+from temporalio.runtime import Runtime, TelemetryConfig, PrometheusConfig
+
+# Local Prometheus scrape endpoint served by the Temporal runtime (http://<address>/metrics)
+METRICS_BIND_ADDRESS = os.environ.get("METRICS_BIND_ADDRESS", "0.0.0.0:9464")
+METRICS_PREFIX = "crewai_"
+
+_runtime: Optional[Runtime] = None
+_instruments = {}
+
+def init_runtime(bind_address: str = METRICS_BIND_ADDRESS) -> Runtime:
+    """Create the Temporal runtime that serves SDK and agent metrics on a Prometheus endpoint
+
+    The SDK's own telemetry (task slots, poll latency, sticky cache hits, per-activity
+    execution latency histograms) and the agent counters below share this endpoint.
+    """
+    global _runtime
+    if _runtime is None:
+        _runtime = Runtime(telemetry=TelemetryConfig(
+            metrics=PrometheusConfig(bind_address=bind_address, durations_as_seconds=True)
+        ))
+        print(f"Serving Prometheus metrics on http://{bind_address}/metrics")
+    return _runtime
+
+def _instrument(kind: str, name: str, description: str):
+    """Create each instrument once; until init_runtime() is called, recording is a no-op"""
+    if _runtime is None:
+        return getattr(MetricMeter.noop, f"create_{kind}")(name, description)
+    key = (kind, name)
+    if key not in _instruments:
+        _instruments[key] = getattr(_runtime.metric_meter, f"create_{kind}")(METRICS_PREFIX + name, description)
+    return _instruments[key]
+
+def record_message(message_type: str, sender: str, recipient: str) -> None:
+    """Count one delivered message by type and by sender -> recipient pair"""
+    _instrument("counter", "messages_total", "Messages delivered between agents").add(
+        1, {"message_type": message_type, "sender": sender, "recipient": recipient}
+    )
+
+def record_blocked_communication(sender: str, recipient: str) -> None:
+    """Count a message blocked by the communication matrix"""
+    _instrument("counter", "blocked_communications_total", "Messages blocked by the communication matrix").add(
+        1, {"sender": sender, "recipient": recipient}
+    )
+
+def record_thinking_step(agent: str, kind: str) -> None:
+    """Count one recorded thinking step"""
+    _instrument("counter", "thinking_steps_total", "Thinking steps recorded by agents").add(
+        1, {"agent": agent, "kind": kind}
+    )
+
+def record_write_backpressure() -> None:
+    """Count a message persist that had to wait for room in the write-behind queue"""
+    _instrument("counter", "message_write_backpressure_total",
+                "Message persists that waited for room in the write queue").add(1)
+
+def record_write_queue_depth(depth: int) -> None:
+    """Publish how many messages are waiting for the write-behind thread"""
+    _instrument("gauge", "message_write_queue_depth", "Messages waiting to be persisted").set(depth)
+
+def record_admission(limit: float, in_flight: int, queued: int) -> None:
+    """Publish the admission controller's crew limit, crews in flight and starts waiting"""
+    _instrument("gauge_float", "admission_limit", "Crews the admission controller lets run at once").set(limit)
+    _instrument("gauge", "admission_in_flight", "Crews started and not yet finished").set(in_flight)
+    _instrument("gauge", "admission_queued", "Workflow starts waiting for admission").set(queued)
+
+async def monitor_event_loop_lag(interval: float = 0.25, samples: Optional[List[float]] = None) -> None:
+    """Record how late the event loop wakes from a sleep, i.e. how long something blocked it
+
+    Lag samples are also appended to `samples` when given, for benchmarks.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        _instrument("histogram_float", "event_loop_lag_seconds", "Delay before the event loop ran a due callback").record(lag)
+        if samples is not None:
+            samples.append(lag)
+
+async def sample_llm_limiter(interval: float = 5.0) -> None:
+    """Periodically publish the LLM limiter's queue depth and wait times as gauges"""
+    from llm_limiter import LLM_LIMITER
+    while True:
+        stats = LLM_LIMITER.stats()
+        _instrument("gauge", "llm_active_calls", "LLM calls currently holding a limiter slot").set(stats["active"])
+        for priority, depth in stats["queue_depth"].items():
+            attributes = {"priority": priority}
+            _instrument("gauge", "llm_queue_depth", "LLM calls waiting for a limiter slot").set(depth, attributes)
+            waits = stats["wait_seconds"][priority]
+            _instrument("gauge_float", "llm_wait_seconds_mean", "Mean LLM limiter wait").set(waits["mean"], attributes)
+            _instrument("gauge_float", "llm_wait_seconds_max", "Longest LLM limiter wait").set(waits["max"], attributes)
+            _instrument("gauge_float", "llm_wait_seconds_recent", "Moving average of recent LLM limiter waits").set(
+                waits["recent"], attributes)
+        await asyncio.sleep(interval)
@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional
+from temporalio import activity
+
+# Completed research phases, reused by later workflows on the same topic with the same team
+# and model. Off by default; keep the TTL well under the message log retention so the cached
+# conversation id still resolves to a conversation.
+PHASE_CACHE_ENABLED = os.environ.get("PHASE_CACHE_ENABLED", "false").lower() == "true"
+PHASE_CACHE_TTL = float(os.environ.get("PHASE_CACHE_TTL_SECONDS", str(6 * 3600)))
+PHASE_CACHE_PATH = os.environ.get("PHASE_CACHE_PATH", "/tmp/agent_phase_cache/phase_cache.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS phases (
+    key TEXT PRIMARY KEY,
+    phase TEXT NOT NULL,
+    topic TEXT,
+    stored_at REAL NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phases_stored_at ON phases(stored_at);
+"""
+
+_connection = None
+_lock = threading.Lock()
+
+def get_connection(path: str = PHASE_CACHE_PATH) -> sqlite3.Connection:
+    """Open (once) the phase cache database and make sure the schema exists"""
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _connection = sqlite3.connect(path, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.executescript(SCHEMA)
+    return _connection
+
+def normalize_topic(topic: str) -> str:
+    """Key under which requests share research: case, spacing and trailing punctuation ignored"""
+    return re.sub(r"\s+", " ", topic).strip().rstrip(".?!").lower()
+
+def phase_key(phase: str, topic: str, team: List[Any], model: str) -> str:
+    """Cache key for a phase: the normalized topic, who is on the team and which model runs it"""
+    members = sorted(
+        (agent["name"], agent["role"], agent["goal"]) if isinstance(agent, dict) else (agent.name, agent.role, agent.goal)
+        for agent in team
+    )
+    key = json.dumps([phase, normalize_topic(topic), members, model])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def lookup(key: str, ttl: float = PHASE_CACHE_TTL, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """The cached phase output stored under `key` within the TTL, or None"""
+    now = time.time() if now is None else now
+    with _lock:
+        row = get_connection().execute(
+            "SELECT stored_at, value FROM phases WHERE key = ? AND stored_at >= ?", (key, now - ttl)
+        ).fetchone()
+    if row is None:
+        return None
+    value = json.loads(row[1])
+    value["cached_at"] = row[0]
+    return value
+
+def store(key: str, phase: str, topic: str, value: Dict[str, Any], ttl: float = PHASE_CACHE_TTL,
+          now: Optional[float] = None) -> None:
+    """Store a phase output under `key` and drop entries that have outlived the TTL"""
+    now = time.time() if now is None else now
+    with _lock:
+        connection = get_connection()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO phases VALUES (?, ?, ?, ?, ?)",
+                               (key, phase, topic, now, json.dumps(value, default=str)))
+            connection.execute("DELETE FROM phases WHERE stored_at < ?", (now - ttl,))
+
+@activity.defn
+async def lookup_research_phase(research_topic: str, team: List[Any]) -> Dict[str, Any]:
+    """Look up completed research for this topic, team and model. Running this as an activity
+    records the answer in history, so replays reuse (or skip) the cache exactly as the original run did."""
+    if not PHASE_CACHE_ENABLED:
+        return {"enabled": False, "research": None}
+    from llm import model_id
+    key = phase_key("research", research_topic, team, model_id())
+    research = await asyncio.to_thread(lookup, key)
+    if research is not None:
+        print(f"♻️  Reusing research on '{research_topic}' cached {time.time() - research['cached_at']:.0f}s ago")
+    return {"enabled": True, "research": research}
+
+@activity.defn
+async def store_research_phase(research_topic: str, team: List[Any], research: Dict[str, Any]) -> None:
+    """Cache a completed research phase (findings, thinking records and conversation id)"""
+    from llm import model_id
+    key = phase_key("research", research_topic, team, model_id())
+    await asyncio.to_thread(store, key, "research", research_topic, research)
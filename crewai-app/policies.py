@@ -0,0 +1,213 @@
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import List, Dict, Any, Optional
+import asyncio
+import os
+import time
+from temporalio import activity
+from temporalio.common import RetryPolicy
+from temporalio.worker import ActivityInboundInterceptor, ExecuteActivityInput, Interceptor
+
+# Timeouts (seconds) used until enough latency samples have been observed for an activity
+DEFAULT_TIMEOUTS = {
+    "setup_researcher_agent": 30,
+    "setup_writer_agent": 30,
+    "setup_critic_agent": 30,
+    "setup_integrator_agent": 30,
+    "setup_reviewer_agent": 30,
+    "agent_response_to_feedback": 15,
+    "resolve_agent_disagreement": 15,
+    "researcher_detailed_thinking": 10,
+    "writer_detailed_thinking": 10,
+    "researcher_perform_research": 300,
+    "writer_create_report": 300,
+    "collaborative_research": 300,
+    "collaborative_report_writing": 300,
+    "revise_report_sections": 60,
+    "store_report": 10,
+    "lookup_research_phase": 10,
+    "store_research_phase": 10,
+    "ask_question": 10,
+    "provide_answer": 10,
+    "make_proposal": 15,
+    "provide_feedback": 10,
+    "send_message": 10,
+    "get_conversation_history": 10,
+    "get_thread": 10,
+    "get_inbox": 10,
+    "collaborate_on_decision": 15,
+    "analyze_message_log": 600,
+    "reindex_message_log": 600,
+}
+FALLBACK_TIMEOUT = 30
+
+# Errors that will fail the same way on every attempt, so retrying them only wastes time.
+# collaborate_on_decision raises InvalidDecisionError for fewer than two agents, and the
+# collaborative tasks surface that error unchanged because they call it directly. Plain
+# ValueErrors (e.g. a model batch returning the wrong number of completions) stay retryable.
+NON_RETRYABLE_ERRORS = {
+    "collaborate_on_decision": ["InvalidDecisionError"],
+    "collaborative_research": ["InvalidDecisionError"],
+    "collaborative_report_writing": ["InvalidDecisionError"],
+}
+
+# Derivation parameters
+MIN_SAMPLES = 20  # Below this the defaults are used
+TIMEOUT_MULTIPLIER = 3.0  # Headroom over the observed p99
+MIN_TIMEOUT = 5.0
+MAX_TIMEOUT = 30 * 60.0
+# Attempts per activity; 0 retries until the workflow gives up (Temporal's default), so a short
+# model or server outage delays a crew instead of failing it. Set a cap only to fail fast.
+MAX_ATTEMPTS = int(os.environ.get("ACTIVITY_MAX_ATTEMPTS", "0"))
+# Samples lose half their weight every half-life, so percentiles follow the current backend
+LATENCY_HALF_LIFE = float(os.environ.get("ACTIVITY_LATENCY_HALF_LIFE_SECONDS", "3600"))
+
+# Histogram bucket upper bounds in seconds: 10ms doubling up to ~22 minutes
+BUCKET_BOUNDS = [0.01 * 2 ** i for i in range(18)]
+
+@dataclass
+class LatencyHistogram:
+    counts: List[float] = field(default_factory=lambda: [0.0] * (len(BUCKET_BOUNDS) + 1))
+    total: float = 0.0  # Decayed weight of the samples in the buckets
+    failures: int = 0  # Failed executions are counted but kept out of the latency buckets
+    timeouts: int = 0  # Attempts cut off by their timeout, bucketed at (at least) the timeout
+    half_life: float = LATENCY_HALF_LIFE
+    updated: float = field(default_factory=time.monotonic)
+
+    def decay(self, now: Optional[float] = None) -> None:
+        """Age the samples: every half-life without new ones halves their weight"""
+        now = time.monotonic() if now is None else now
+        factor = 0.5 ** ((now - self.updated) / self.half_life)
+        self.counts = [count * factor for count in self.counts]
+        self.total *= factor
+        self.updated = now
+
+    def observe(self, seconds: float, now: Optional[float] = None) -> None:
+        """Record one execution time in its bucket"""
+        self.decay(now)
+        index = len(BUCKET_BOUNDS)
+        for i, bound in enumerate(BUCKET_BOUNDS):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.total += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the bucket upper bound containing the q-th percentile (0-100)"""
+        if self.total == 0:
+            return None
+        target = q / 100 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else MAX_TIMEOUT
+        return MAX_TIMEOUT
+
+# Per-activity latency histograms collected on this worker
+LATENCY_HISTOGRAMS: Dict[str, LatencyHistogram] = {}
+
+def record_latency(activity_name: str, seconds: float, failed: bool = False, timed_out: bool = False) -> None:
+    """Add an observed activity execution time to that activity's histogram
+
+    A timed-out attempt still counts as a sample of `seconds` (at least its timeout), so a
+    timeout that is too tight shows up in the percentiles and grows instead of failing forever.
+    """
+    histogram = LATENCY_HISTOGRAMS.get(activity_name)
+    if histogram is None:
+        histogram = LATENCY_HISTOGRAMS[activity_name] = LatencyHistogram()
+    if timed_out:
+        histogram.timeouts += 1
+        histogram.observe(seconds)
+    elif failed:
+        histogram.failures += 1
+    else:
+        histogram.observe(seconds)
+
+def derive_policy(activity_name: str) -> Dict[str, Any]:
+    """Derive the timeout and retry backoff for an activity from its latency percentiles"""
+    default_timeout = DEFAULT_TIMEOUTS.get(activity_name, FALLBACK_TIMEOUT)
+    histogram = LATENCY_HISTOGRAMS.get(activity_name)
+    if histogram is not None:
+        histogram.decay()
+
+    # Too few recent samples (none yet, or only stale ones) fall back to the defaults
+    if histogram is None or histogram.total < MIN_SAMPLES:
+        timeout = default_timeout
+        initial_interval = 1.0
+        source = "default"
+    else:
+        p50 = histogram.percentile(50)
+        p99 = histogram.percentile(99)
+        # Healthy slow calls fit under p99 with headroom; hung calls are cut off well before the old defaults
+        timeout = min(max(p99 * TIMEOUT_MULTIPLIER, MIN_TIMEOUT), MAX_TIMEOUT)
+        # Back off on the scale of a typical call so retries do not pile onto a slow backend
+        initial_interval = min(max(p50, 1.0), 30.0)
+        source = f"p50={p50:.2f}s p99={p99:.2f}s n={histogram.total:.0f} timeouts={histogram.timeouts}"
+
+    return {
+        "activity": activity_name,
+        "start_to_close_seconds": timeout,
+        "initial_interval_seconds": initial_interval,
+        "backoff_coefficient": 2.0,
+        "maximum_interval_seconds": max(initial_interval, min(timeout, 60.0)),
+        "maximum_attempts": MAX_ATTEMPTS,
+        "non_retryable_error_types": NON_RETRYABLE_ERRORS.get(activity_name, []),
+        "source": source,
+    }
+
+def activity_options(policy: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a derived policy into execute_activity keyword arguments (safe inside workflows)"""
+    return {
+        "start_to_close_timeout": timedelta(seconds=policy["start_to_close_seconds"]),
+        "retry_policy": RetryPolicy(
+            initial_interval=timedelta(seconds=policy["initial_interval_seconds"]),
+            backoff_coefficient=policy["backoff_coefficient"],
+            maximum_interval=timedelta(seconds=policy["maximum_interval_seconds"]),
+            maximum_attempts=policy["maximum_attempts"],
+            non_retryable_error_types=policy["non_retryable_error_types"],
+        ),
+    }
+
+@activity.defn
+async def get_activity_policies(activity_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Return the current timeout and retry policy for each activity
+
+    Running this as an activity records the policies in workflow history, so
+    workflows stay deterministic on replay even as the histograms change.
+    """
+    return {name: derive_policy(name) for name in activity_names}
+
+class _LatencyActivityInboundInterceptor(ActivityInboundInterceptor):
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        activity_name = activity.info().activity_type
+        timeout = activity.info().start_to_close_timeout
+        # The worker is not told when an attempt times out (it runs on unless it heartbeats), so a
+        # watchdog counts the attempt as a sample of its timeout once it outlives it
+        fired = []
+        
+        def on_timeout() -> None:
+            fired.append(True)
+            record_latency(activity_name, timeout.total_seconds(), timed_out=True)
+        
+        watchdog = asyncio.get_running_loop().call_later(timeout.total_seconds(), on_timeout) if timeout else None
+        start = time.monotonic()
+        try:
+            result = await self.next.execute_activity(input)
+        except BaseException:
+            if not fired:
+                record_latency(activity_name, time.monotonic() - start, failed=True)
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+        if not fired:
+            record_latency(activity_name, time.monotonic() - start)
+        return result
+
+class LatencyInterceptor(Interceptor):
+    """Worker interceptor that feeds every activity execution time into LATENCY_HISTOGRAMS"""
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _LatencyActivityInboundInterceptor(next)
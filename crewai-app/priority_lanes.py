@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional
+import asyncio
+import os
+import threading
+from temporalio.worker import (CustomSlotSupplier, FixedSizeSlotSupplier, SlotMarkUsedContext, SlotPermit,
+                               SlotReleaseContext, SlotReserveContext, WorkerTuner)
+
+# Each priority class has its own task queue, so interactive crews never queue behind bulk runs
+TASK_QUEUE = "collaborative-agent-queue"
+PRIORITY_LANES = {
+    "interactive": f"{TASK_QUEUE}-interactive",
+    "bulk": f"{TASK_QUEUE}-bulk",
+}
+DEFAULT_LANE = "bulk"  # Where work on an unrecognised task queue is counted
+
+# Share of the worker's slots reserved for each lane; override with LANE_WEIGHTS="interactive=1,bulk=3"
+DEFAULT_LANE_WEIGHTS = {"interactive": 1.0, "bulk": 3.0}
+WORKER_ACTIVITY_SLOTS = int(os.environ.get("WORKER_ACTIVITY_SLOTS", "64"))
+WORKER_WORKFLOW_TASK_SLOTS = int(os.environ.get("WORKER_WORKFLOW_TASK_SLOTS", "32"))
+WORKER_LOCAL_ACTIVITY_SLOTS = 32
+WORKER_NEXUS_SLOTS = 8
+
+# LLM calls made from a lane are demoted to this limiter priority class, so bulk work never
+# takes a model slot ahead of an interactive crew
+LANE_LLM_PRIORITY = {"bulk": "background"}
+
+def lane_weights() -> Dict[str, float]:
+    """Slot weights per lane, with LANE_WEIGHTS overrides applied"""
+    weights = dict(DEFAULT_LANE_WEIGHTS)
+    for entry in filter(None, os.environ.get("LANE_WEIGHTS", "").split(",")):
+        lane, _, weight = entry.partition("=")
+        if lane.strip() not in PRIORITY_LANES:
+            raise ValueError(f"Unknown priority lane {lane.strip()!r}")
+        weights[lane.strip()] = float(weight)
+    return weights
+
+def task_queue_for(priority: str) -> str:
+    """Task queue of a priority class"""
+    if priority not in PRIORITY_LANES:
+        raise ValueError(f"Unknown priority class {priority!r}; expected one of {', '.join(PRIORITY_LANES)}")
+    return PRIORITY_LANES[priority]
+
+def lane_for_queue(task_queue: str) -> str:
+    """Priority class of a task queue (sticky queues count toward the lane they belong to)"""
+    for lane, queue in PRIORITY_LANES.items():
+        if task_queue == queue:
+            return lane
+    for lane, queue in PRIORITY_LANES.items():
+        if queue in task_queue:
+            return lane
+    return DEFAULT_LANE
+
+def llm_priority(task_queue: str, priority: str) -> str:
+    """The limiter priority class for an LLM call made by an activity on `task_queue`"""
+    return LANE_LLM_PRIORITY.get(lane_for_queue(task_queue), priority)
+
+class LanePermit(SlotPermit):
+    def __init__(self, lane: str):
+        self.lane = lane
+
+class WeightedSlotPool(CustomSlotSupplier):
+    """One pool of task slots shared by the workers of every lane. Each lane is guaranteed its
+    weighted share; beyond that it may borrow only slots that no other lane is owed, so a busy
+    bulk lane fills its share without taking the headroom an interactive crew needs, while an
+    interactive burst can use whatever bulk leaves idle."""
+
+    def __init__(self, total: int, weights: Dict[str, float]):
+        weight_sum = sum(weights.values())
+        self.total = total
+        self.reserved = {lane: max(1, int(total * weight / weight_sum)) for lane, weight in weights.items()}
+        self.held = {lane: 0 for lane in weights}
+        self._lock = threading.Lock()  # Releases may arrive from outside the event loop
+        self._waiters: List[asyncio.Future] = []
+
+    def _take(self, lane: str) -> Optional[LanePermit]:
+        held_total = sum(self.held.values())
+        if held_total >= self.total:
+            return None
+        if self.held[lane] >= self.reserved[lane]:
+            owed = sum(max(0, self.reserved[other] - held) for other, held in self.held.items() if other != lane)
+            if self.total - held_total <= owed:
+                return None
+        self.held[lane] += 1
+        return LanePermit(lane)
+
+    async def reserve_slot(self, ctx: SlotReserveContext) -> SlotPermit:
+        lane = lane_for_queue(ctx.task_queue)
+        while True:
+            with self._lock:
+                permit = self._take(lane)
+                if permit is not None:
+                    return permit
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+            # Woken on every release; check again, since another lane may have taken the slot
+            await waiter
+
+    def try_reserve_slot(self, ctx: SlotReserveContext) -> Optional[SlotPermit]:
+        with self._lock:
+            return self._take(lane_for_queue(ctx.task_queue))
+
+    def mark_slot_used(self, ctx: SlotMarkUsedContext) -> None:
+        pass
+
+    def release_slot(self, ctx: SlotReleaseContext) -> None:
+        with self._lock:
+            self.held[ctx.permit.lane] -= 1
+            waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {lane: {"held": self.held[lane], "reserved": self.reserved[lane]} for lane in self.held}
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+def lane_tuner(weights: Optional[Dict[str, float]] = None) -> WorkerTuner:
+    """Tuner for the lane workers: workflow-task and activity slots come from shared weighted pools"""
+    weights = lane_weights() if weights is None else weights
+    return WorkerTuner.create_composite(
+        workflow_supplier=WeightedSlotPool(WORKER_WORKFLOW_TASK_SLOTS, weights),
+        activity_supplier=WeightedSlotPool(WORKER_ACTIVITY_SLOTS, weights),
+        local_activity_supplier=FixedSizeSlotSupplier(WORKER_LOCAL_ACTIVITY_SLOTS),
+        nexus_supplier=FixedSizeSlotSupplier(WORKER_NEXUS_SLOTS),
+    )
@@ -0,0 +1,113 @@
+from collections import Counter
+from typing import Any, Optional, Set
+import os
+import random
+import sys
+import threading
+import time
+from temporalio import activity
+from temporalio.worker import ActivityInboundInterceptor, ExecuteActivityInput, Interceptor
+
+# Opt-in: profile this fraction of activity executions, plus every execution of the named activities
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_ACTIVITIES = {name for name in os.environ.get("PROFILE_ACTIVITIES", "").split(",") if name}
+PROFILE_OUTPUT_DIR = os.environ.get("PROFILE_OUTPUT_DIR", "/tmp/agent_profiles")
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000
+
+# Stack recorded for samples taken while the activity was suspended at an await
+AWAITING_FRAME = "[awaiting]"
+
+def _frame_label(frame) -> str:
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+
+class StackSampler:
+    """Sample the Python stacks that are running one activity's code, in a background thread"""
+
+    def __init__(self, code, interval: float):
+        self.code = code
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="activity-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            found = False
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                labels = []
+                running_activity = False
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    running_activity = running_activity or frame.f_code is self.code
+                    frame = frame.f_back
+                # Keep only stacks executing this activity, so concurrent activities do not pollute the profile
+                if running_activity:
+                    self.stacks[";".join(reversed(labels))] += 1
+                    found = True
+            if not found:
+                self.stacks[AWAITING_FRAME] += 1
+
+    def write_collapsed(self, path: str) -> None:
+        """Write 'frame;frame;frame count' lines, the input format of flamegraph.pl and speedscope"""
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+class _ProfilingActivityInboundInterceptor(ActivityInboundInterceptor):
+    def __init__(self, next: ActivityInboundInterceptor, sample_rate: float, activities: Set[str],
+                 output_dir: str, interval: float):
+        super().__init__(next)
+        self.sample_rate = sample_rate
+        self.activities = activities
+        self.output_dir = output_dir
+        self.interval = interval
+
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        info = activity.info()
+        if info.activity_type not in self.activities and random.random() >= self.sample_rate:
+            return await self.next.execute_activity(input)
+
+        fn = getattr(input.fn, "__wrapped__", input.fn)
+        sampler = StackSampler(getattr(fn, "__code__", None), self.interval)
+        sampler.start()
+        try:
+            return await self.next.execute_activity(input)
+        finally:
+            sampler.stop()
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                path = os.path.join(
+                    self.output_dir,
+                    f"{info.activity_type}-{info.workflow_id}-{info.activity_id}-{int(time.time())}.collapsed"
+                )
+                sampler.write_collapsed(path)
+                print(f"Wrote activity profile: {path}")
+            except OSError as e:
+                print(f"Warning: Could not write activity profile: {e}")
+
+class ProfilingInterceptor(Interceptor):
+    """Worker interceptor that profiles sampled activity executions into collapsed-stack files"""
+
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, activities: Optional[Set[str]] = None,
+                 output_dir: str = PROFILE_OUTPUT_DIR, interval: float = PROFILE_INTERVAL):
+        self.sample_rate = sample_rate
+        self.activities = PROFILE_ACTIVITIES if activities is None else activities
+        self.output_dir = output_dir
+        self.interval = interval
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        # When disabled, leave the interceptor chain untouched so there is no per-activity cost
+        if self.sample_rate <= 0 and not self.activities:
+            return next
+        return _ProfilingActivityInboundInterceptor(next, self.sample_rate, self.activities,
+                                                    self.output_dir, self.interval)
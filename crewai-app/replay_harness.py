@@ -0,0 +1,140 @@
+"""Record CollaborativeAgentWorkflow histories of increasing size and measure how replay scales
+
+Recording runs the workflow with an in-process worker against a Temporal server (or a
+downloaded dev server with --dev-server) for every combination of feedback rounds and
+additional reviewer agents, and saves each history as JSON. Replaying loads every saved
+history, plus the histories checked in under histories/ that older versions of the
+workflow recorded, replays it with the current workflow code and reports replay time and
+peak Python memory against event count. Any replay failure, such as a nondeterminism error
+after a workflow change that is not gated by workflow.patched, is reported and makes the
+command exit non-zero.
+
+    python replay_harness.py record --rounds 1 2 4 8 16 32 --reviewers 0 2 8
+    python replay_harness.py replay --repeat 5
+"""
+import argparse
+import asyncio
+import glob
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import List
+
+from temporalio.client import Client as TemporalClient, WorkflowHistory
+from temporalio.worker import Replayer, Worker
+
+from sandbox import workflow_runner
+from workflows import CollaborativeAgentWorkflow, ResearchWorkflow, BatchReportWorkflow
+
+HISTORY_DIR = os.environ.get("HISTORY_DIR", "/tmp/agent_histories")
+# Histories recorded by earlier versions of the workflow; every change must still replay them
+RECORDED_HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "histories")
+TASK_QUEUE = "replay-harness-queue"
+
+def history_path(history_dir: str, rounds: int, reviewers: int) -> str:
+    return os.path.join(history_dir, f"collaborative-{rounds:03d}-rounds-{reviewers:02d}-reviewers.json")
+
+async def record(client: TemporalClient, rounds: List[int], reviewers: List[int], history_dir: str) -> None:
+    """Run the workflow once per (feedback rounds, additional reviewers) pair and save each history to disk"""
+    from app import WORKER_ACTIVITIES, WORKER_WORKFLOWS
+    from activity_executors import activity_thread_pool
+    os.makedirs(history_dir, exist_ok=True)
+    async with Worker(client, task_queue=TASK_QUEUE, workflows=WORKER_WORKFLOWS,
+                      activities=WORKER_ACTIVITIES, activity_executor=activity_thread_pool(),
+                      workflow_runner=workflow_runner()):
+        for count in rounds:
+            for extra in reviewers:
+                handle = await client.start_workflow(
+                    CollaborativeAgentWorkflow.run,
+                    args=["Integration of Temporal with AI systems", "Benefits of Temporal for AI Workflows",
+                          count, None, extra],
+                    id=f"replay-harness-{count}-rounds-{extra}-reviewers-{int(time.time())}",
+                    task_queue=TASK_QUEUE,
+                )
+                await handle.result()
+                history = await handle.fetch_history()
+                path = history_path(history_dir, count, extra)
+                with open(path, "w") as f:
+                    f.write(history.to_json())
+                print(f"Recorded {len(history.events)} events with {count} feedback rounds and "
+                      f"{extra} additional reviewers: {path}")
+
+async def replay(history_dir: str, repeat: int) -> bool:
+    """Replay every saved history, print time and memory per event count, return False on any failure"""
+    recorded = sorted(glob.glob(os.path.join(RECORDED_HISTORY_DIR, "*.json")))
+    paths = recorded + sorted(glob.glob(os.path.join(history_dir, "*.json")))
+    if len(paths) == len(recorded):
+        print(f"No histories found in {history_dir}; run 'record' first")
+
+    replayer = Replayer(workflows=[CollaborativeAgentWorkflow, ResearchWorkflow, BatchReportWorkflow],
+                        workflow_runner=workflow_runner())
+    rows = []
+    ok = True
+    print(f"{'history':<52} {'events':>7} {'replay ms':>10} {'us/event':>9} {'peak KiB':>9}")
+    for path in paths:
+        workflow_id = os.path.splitext(os.path.basename(path))[0]
+        with open(path) as f:
+            history = WorkflowHistory.from_json(workflow_id, f.read())
+
+        result = await replayer.replay_workflow(history, raise_on_replay_failure=False)
+        if result.replay_failure is not None:
+            ok = False
+            print(f"{workflow_id:<52} {len(history.events):>7} FAILED: {result.replay_failure}")
+            continue
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await replayer.replay_workflow(history)
+            timings.append(time.perf_counter() - start)
+        elapsed = statistics.median(timings)
+
+        # Measured in a separate pass, since tracing allocations slows replay down considerably
+        tracemalloc.start()
+        await replayer.replay_workflow(history)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        events = len(history.events)
+        rows.append((events, elapsed))
+        print(f"{workflow_id:<52} {events:>7} {elapsed * 1000:>10.1f} "
+              f"{elapsed / events * 1e6:>9.1f} {peak / 1024:>9.0f}")
+
+    if len({events for events, _ in rows}) >= 2:
+        fit = statistics.linear_regression([events for events, _ in rows], [elapsed for _, elapsed in rows])
+        print(f"Replay cost: {fit.intercept * 1000:.1f}ms fixed + {fit.slope * 1e6:.1f}us per event")
+    return ok
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history-dir", default=HISTORY_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Run workflows and save their histories")
+    record_parser.add_argument("--rounds", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    record_parser.add_argument("--reviewers", type=int, nargs="+", default=[0, 2, 8],
+                               help="Reviewer agents added to the team of four")
+    record_parser.add_argument("--address", default=f"{os.environ.get('TEMPORAL_HOST', 'localhost')}:"
+                                                    f"{os.environ.get('TEMPORAL_PORT', '7233')}")
+    record_parser.add_argument("--dev-server", action="store_true",
+                               help="Start a local Temporal dev server instead of connecting to --address")
+
+    replay_parser = subparsers.add_parser("replay", help="Replay saved histories and report their cost")
+    replay_parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        if args.dev_server:
+            from temporalio.testing import WorkflowEnvironment
+            async with await WorkflowEnvironment.start_local() as env:
+                await record(env.client, args.rounds, args.reviewers, args.history_dir)
+        else:
+            await record(await TemporalClient.connect(args.address), args.rounds, args.reviewers,
+                         args.history_dir)
+        return 0
+    return 0 if await replay(args.history_dir, args.repeat) else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
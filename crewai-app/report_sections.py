@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+
+# Generated section content cached by the hash of everything the section's prompt depends on, so
+# a retry, a second run on the same findings and conversation or a revision that leaves a section
+# alone reuses it
+REPORT_SECTION_CACHE_SIZE = int(os.environ.get("REPORT_SECTION_CACHE_SIZE", "512"))
+# Finished reports, stored by content hash so workflow results only need to carry the hash. The
+# store_report activity writes on the worker's host: processes on other hosts can read reports by
+# id only if REPORT_DIR is shared storage mounted on every worker (app.fetch_report queries the
+# workflow instead, and uses the store only when no worker answers)
+REPORT_DIR = os.environ.get("REPORT_DIR", "/tmp/agent_reports")
+SECTION_LATENCY = 1  # Simulated model latency per generated section
+
+@dataclass
+class ReportSection:
+    key: str
+    heading: Optional[str]  # None for the untitled block at the top of the report
+    content: str
+    inputs_hash: str = ""
+    content_hash: str = ""
+    feedback: List[str] = field(default_factory=list)  # Feedback applied to this section so far
+
+@dataclass
+class SectionSpec:
+    key: str
+    heading: Optional[str]
+    draft: Callable[[Dict[str, Any]], str]  # Builds the section text from the report inputs
+    inputs: List[str] = field(default_factory=list)  # Report inputs the section depends on
+    keywords: List[str] = field(default_factory=list)  # Words in feedback that address this section
+    generated: bool = True  # False for sections assembled directly, without a model call
+
+SECTION_CACHE: "OrderedDict[str, str]" = OrderedDict()
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+def inputs_hash(spec: SectionSpec, inputs: Dict[str, Any], draft: str, feedback: List[str],
+                context: str = "") -> str:
+    """Hash of the section's own draft, inputs, feedback and conversation context (everything in its
+    prompt); changes elsewhere in the report leave it alone"""
+    values = {"section": spec.key, "draft": draft, "feedback": feedback, "context": hash_text(context)}
+    values.update({name: inputs[name] for name in spec.inputs})
+    return hash_text(json.dumps(values, sort_keys=True, default=str))
+
+def report_path(report_id: str, directory: str = REPORT_DIR) -> str:
+    return os.path.join(directory, f"{report_id}.txt")
+
+def save_report(report: str, directory: str = REPORT_DIR) -> str:
+    """Write the report to the store (once per distinct content) and return its id"""
+    report_id = hash_text(report)
+    path = report_path(report_id, directory)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            f.write(report)
+        os.replace(path + ".tmp", path)
+    return report_id
+
+def load_report(report_id: str, directory: str = REPORT_DIR) -> Optional[str]:
+    """Read a stored report by id, or None if it is not in the store"""
+    try:
+        with open(report_path(report_id, directory)) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def render_report(sections: List[ReportSection]) -> str:
+    """Join sections into the report text, each heading on the line above its content"""
+    return "\n\n".join(section.content if section.heading is None else f"{section.heading}\n{section.content}"
+                       for section in sections)
+
+def apply_section_updates(sections: List[ReportSection], updates: List[ReportSection]) -> List[ReportSection]:
+    """Replace sections by key with their revised versions, keeping the report order"""
+    revised = {section.key: section for section in updates}
+    return [revised.get(section.key, section) for section in sections]
+
+def targeted_sections(specs: List[SectionSpec], feedback: str) -> List[str]:
+    """Keys of the sections the feedback mentions, or every section when it names none"""
+    text = feedback.lower()
+    keys = [spec.key for spec in specs if any(keyword in text for keyword in spec.keywords)]
+    return keys or [spec.key for spec in specs]
+
+async def build_section(spec: SectionSpec, inputs: Dict[str, Any], author: str, context: str = "",
+                        feedback: Optional[List[str]] = None) -> ReportSection:
+    """Generate one section, or reuse the cached text when its inputs and feedback are unchanged"""
+    feedback = list(feedback or [])
+    draft = spec.draft(inputs)
+    key = inputs_hash(spec, inputs, draft, feedback, context)
+    content = SECTION_CACHE.get(key)
+    if content is not None:
+        SECTION_CACHE.move_to_end(key)
+    else:
+        content = draft
+        if spec.generated:
+            from llm import generate
+            # Simulated: the draft with a note for each piece of feedback it now addresses
+            simulated = draft + "".join(f"\nRevised to address: {item}" for item in feedback)
+            prompt = f"{context}\n\nYou are {author}. Write the {spec.heading} section of a report on {inputs['task']}."
+            prompt += "".join(f"\nUse this input ({name}):\n{inputs[name]}" for name in spec.inputs if name != "task")
+            if feedback:
+                prompt += "\nAddress this feedback:\n" + "\n".join(f"- {item}" for item in feedback)
+            # Only the conversation context may differ between prompts that share a cached answer
+            content = await generate(prompt, simulated_response=simulated, simulated_latency=SECTION_LATENCY,
+                                     cache=True, cache_scope=inputs_hash(spec, inputs, draft, feedback))
+        SECTION_CACHE[key] = content
+        if len(SECTION_CACHE) > REPORT_SECTION_CACHE_SIZE:
+            SECTION_CACHE.popitem(last=False)
+    return ReportSection(spec.key, spec.heading, content, key, hash_text(content), feedback)
+
+async def write_sections(specs: List[SectionSpec], inputs: Dict[str, Any], author: str,
+                         context: str = "") -> List[ReportSection]:
+    """Build every section of a report concurrently"""
+    return list(await asyncio.gather(*[build_section(spec, inputs, author, context) for spec in specs]))
+
+async def revise_sections(specs: List[SectionSpec], sections: List[ReportSection], inputs: Dict[str, Any],
+                          feedback: str, author: str, context: str = "") -> List[ReportSection]:
+    """Regenerate only the sections the feedback targets and return those whose content changed"""
+    current = {section.key: section for section in sections}
+    targets = [spec for spec in specs if spec.key in targeted_sections(specs, feedback) and spec.generated]
+    revised = await asyncio.gather(*[
+        build_section(spec, inputs, author, context, current[spec.key].feedback + [feedback])
+        for spec in targets
+    ])
+    return [section for section in revised if section.content_hash != current[section.key].content_hash]
@@ -0,0 +1,19 @@
+from temporalio.worker.workflow_sandbox import SandboxedWorkflowRunner, SandboxRestrictions
+
+# Modules shared with the worker instead of re-imported into each workflow's sandbox. Workflow
+# code only references activity functions from them and never touches their module state.
+WORKFLOW_PASSTHROUGH_MODULES = [
+    # Activity modules and the helpers they import
+    "agents", "tasks", "thinking", "messages", "message_log", "write_behind", "policies",
+    "report_sections", "phase_cache", "priority_lanes",
+    "llm", "llm_limiter", "llm_batching", "semantic_cache", "context_builder",
+    "metrics", "tracing", "profiling", "search_index", "cpu_activities", "activity_executors",
+    # Heavy third-party dependencies those modules may pull in
+    "numpy", "opentelemetry", "crewai", "langchain", "langchain_core",
+]
+
+def workflow_runner() -> SandboxedWorkflowRunner:
+    """Sandboxed runner with the default restrictions plus passthrough for the modules above"""
+    return SandboxedWorkflowRunner(
+        restrictions=SandboxRestrictions.default.with_passthrough_modules(*WORKFLOW_PASSTHROUGH_MODULES)
+    )
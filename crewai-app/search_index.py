@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable
+
+# SQLite database holding the message table and its FTS5 inverted index
+SEARCH_INDEX_PATH = "/tmp/agent_messages/search_index.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    message_id TEXT UNIQUE NOT NULL,
+    conversation_id TEXT,
+    sender TEXT,
+    recipient TEXT,
+    message_type TEXT,
+    timestamp REAL,
+    related_to TEXT,
+    content TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_sender ON messages(sender, timestamp);
+CREATE INDEX IF NOT EXISTS messages_type ON messages(message_type, timestamp);
+CREATE INDEX IF NOT EXISTS messages_timestamp ON messages(timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='rowid'
+);
+-- Keep the inverted index in step with the table; ignored duplicates never reach it
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+END;
+"""
+
+COLUMNS = ["message_id", "conversation_id", "sender", "recipient",
+           "message_type", "timestamp", "related_to", "content"]
+
+_connection = None
+_lock = threading.Lock()
+
+def get_connection(path: str = SEARCH_INDEX_PATH) -> sqlite3.Connection:
+    """Open (once) the search index database and make sure the schema exists"""
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _connection = sqlite3.connect(path, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.executescript(SCHEMA)
+    return _connection
+
+def _to_row(message: Dict[str, Any], conversation_id: str) -> tuple:
+    return (
+        message["message_id"],
+        conversation_id,
+        message.get("sender"),
+        message.get("recipient"),
+        message.get("message_type"),
+        message.get("timestamp"),
+        message.get("related_to"),
+        message.get("content"),
+    )
+
+def _insert_rows(rows: List[tuple]) -> int:
+    """Insert index rows in one transaction and return how many were new"""
+    with _lock:
+        connection = get_connection()
+        with connection:
+            cursor = connection.executemany(
+                f"INSERT OR IGNORE INTO messages ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in COLUMNS)})",
+                rows
+            )
+            # rowcount excludes the FTS trigger writes and the ignored duplicates
+            return cursor.rowcount
+
+def index_messages(messages: Iterable[Dict[str, Any]], conversation_id: str) -> int:
+    """Incrementally add messages to the index; already indexed message ids are skipped"""
+    from tracing import span
+    with span("search_index.insert", conversation_id=conversation_id):
+        return _insert_rows([_to_row(msg, conversation_id) for msg in messages])
+
+def delete_messages(message_ids: Iterable[str]) -> int:
+    """Remove messages (e.g. those in an expired log segment) from the index; returns how many were indexed"""
+    with _lock:
+        connection = get_connection()
+        with connection:
+            cursor = connection.executemany("DELETE FROM messages WHERE message_id = ?",
+                                            [(message_id,) for message_id in message_ids])
+            return cursor.rowcount
+
+def match_expression(query: str) -> str:
+    """FTS5 MATCH expression requiring every word of `query`, each quoted as a literal phrase so that
+    user input (quotes, parentheses, AND/OR/NEAR, *) cannot be parsed as query syntax"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+def search_messages(query: Optional[str] = None, sender: Optional[str] = None,
+                    message_type: Optional[str] = None, since: Optional[float] = None,
+                    until: Optional[float] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """Search indexed messages by full-text query (messages containing all of its words), sender,
+    message type and time range"""
+    clauses = []
+    params: List[Any] = []
+    if query and query.split():
+        sql = (f"SELECT {', '.join('m.' + c for c in COLUMNS)} FROM messages_fts "
+               "JOIN messages m ON m.rowid = messages_fts.rowid")
+        clauses.append("messages_fts MATCH ?")
+        params.append(match_expression(query))
+    else:
+        sql = f"SELECT {', '.join('m.' + c for c in COLUMNS)} FROM messages m"
+    if sender is not None:
+        clauses.append("m.sender = ?")
+        params.append(sender)
+    if message_type is not None:
+        clauses.append("m.message_type = ?")
+        params.append(message_type)
+    if since is not None:
+        clauses.append("m.timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("m.timestamp < ?")
+        params.append(until)
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY m.timestamp LIMIT ?"
+    params.append(limit)
+
+    with _lock:
+        rows = get_connection().execute(sql, params).fetchall()
+    return [dict(zip(COLUMNS, row)) for row in rows]
+
+def _load_segment(path: str) -> List[tuple]:
+    """Parse one message log segment into index rows (runs in a worker process)"""
+    from message_log import iter_segment_records
+    try:
+        return [_to_row(record["message"], record["conversation_id"]) for record in iter_segment_records(path)]
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read message log {path}: {e}")
+        return []
+
+def reindex_logs(log_dir: Optional[str] = None, max_workers: Optional[int] = None) -> int:
+    """Rebuild the index from the persisted message log, parsing segments in a process pool"""
+    from message_log import segment_paths, segments_locked
+    if log_dir is None:
+        from messages import MESSAGE_LOG_DIR
+        log_dir = MESSAGE_LOG_DIR
+
+    indexed = 0
+    # Keep compaction and retention from merging away or deleting segments while they are read
+    with segments_locked(log_dir), ProcessPoolExecutor(max_workers=max_workers) as pool:
+        paths = segment_paths(log_dir)
+        # Parsing is spread across processes; SQLite has a single writer, so inserts stay here
+        for rows in pool.map(_load_segment, paths):
+            if rows:
+                indexed += _insert_rows(rows)
+
+    print(f"Reindexed {len(paths)} log segments ({indexed} new messages)")
+    return indexed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the agent message logs")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    reindex_parser = subcommands.add_parser("reindex", help="Index the existing message log")
+    reindex_parser.add_argument("--log-dir", default=None)
+    reindex_parser.add_argument("--workers", type=int, default=None)
+
+    search_parser = subcommands.add_parser("search", help="Query the message index")
+    search_parser.add_argument("query", nargs="?", default=None)
+    search_parser.add_argument("--sender")
+    search_parser.add_argument("--type", dest="message_type")
+    search_parser.add_argument("--since", type=float)
+    search_parser.add_argument("--until", type=float)
+    search_parser.add_argument("--limit", type=int, default=100)
+
+    args = parser.parse_args()
+    if args.command == "reindex":
+        reindex_logs(args.log_dir, args.workers)
+    else:
+        for result in search_messages(args.query, args.sender, args.message_type,
+                                      args.since, args.until, args.limit):
+            print(json.dumps(result, default=str))
@@ -0,0 +1,87 @@
+from typing import Any, Optional, Tuple
+import hashlib
+import json
+import re
+import zlib
+import numpy as np
+
+# Hashed character n-gram embedding: no model download, stable across processes
+EMBEDDING_DIM = 2048
+NGRAM_SIZE = 3
+
+def embed(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Embed text as an L2-normalized vector of signed, hashed character n-gram counts"""
+    normalized = " " + re.sub(r"\s+", " ", text.lower()).strip() + " "
+    hashes = np.fromiter(
+        (zlib.crc32(normalized[i:i + NGRAM_SIZE].encode()) for i in range(len(normalized) - NGRAM_SIZE + 1)),
+        dtype=np.uint32
+    )
+    vector = np.zeros(dim, dtype=np.float32)
+    if hashes.size == 0:
+        return vector
+    # Low bits choose the slot, one high bit chooses the sign, so collisions tend to cancel out
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes % dim).astype(np.int64), signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def namespace_key(*parts: Any) -> int:
+    """Stable 64-bit key of the exact values a cached answer depends on"""
+    digest = hashlib.blake2b(json.dumps(parts, sort_keys=True, default=str).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+class SemanticCache:
+    """Bounded near-duplicate prompt cache answering top-1 cosine lookups over a NumPy matrix.
+    Entries are partitioned by namespace: a lookup only scores prompts stored under the same
+    key, so prompts that differ in an exact input (a topic, a section's draft) never match
+    however similar the rest of their text is."""
+
+    def __init__(self, capacity: int, threshold: float, dim: int = EMBEDDING_DIM):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.dim = dim
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._answers = [None] * capacity
+        self._namespaces = np.zeros(capacity, dtype=np.int64)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def lookup(self, prompt: str, namespace: int = 0) -> Optional[Tuple[str, float]]:
+        """Return (cached answer, similarity) for the closest prompt stored under `namespace`
+        above the threshold"""
+        rows = np.flatnonzero(self._namespaces[:self._size] == namespace)
+        if rows.size == 0:
+            self.misses += 1
+            return None
+        # Rows are unit vectors, so one matrix-vector product gives every cosine similarity
+        scores = self._vectors[rows] @ embed(prompt, self.dim)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        row = int(rows[best])
+        self._last_used[row] = self._tick()
+        return self._answers[row], float(scores[best])
+
+    def store(self, prompt: str, answer: str, namespace: int = 0) -> None:
+        """Cache an answer, evicting the least recently used entry once the cache is full"""
+        if self._size < self.capacity:
+            slot = self._size
+            self._size += 1
+        else:
+            slot = int(np.argmin(self._last_used))
+        self._vectors[slot] = embed(prompt, self.dim)
+        self._answers[slot] = answer
+        self._namespaces[slot] = namespace
+        self._last_used[slot] = self._tick()
+
+    def __len__(self) -> int:
+        return self._size
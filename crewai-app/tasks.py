@@ -1,8 +1,132 @@
-from typing import Tuple, List, Any, Optional
+from contextlib import asynccontextmanager
+from typing import Tuple, List, Dict, Any, Optional
 import asyncio
 from temporalio import activity
 from agents import AgentConfig
 from thinking import ThinkingStep
+from phase_cache import normalize_topic
+from report_sections import (ReportSection, SectionSpec, render_report, write_sections, revise_sections,
+                             save_report)
+
+RECOMMENDATIONS = (
+    "1. Start with a pilot project: Choose a non-critical AI workflow to implement with Temporal\n"
+    "2. Develop workflow patterns: Create reusable patterns for common AI tasks\n"
+    "3. Integrate monitoring: Leverage Temporal's visibility tools for operational insights\n"
+    "4. Scale gradually: Expand to more critical AI systems as your team gains experience"
+)
+
+# The writer's report, section by section, with the inputs each section depends on
+REPORT_SECTIONS = [
+    SectionSpec("header", None, lambda inputs: f"REPORT: {inputs['task'].upper()}\nPrepared by: {inputs['primary']}",
+                inputs=["task", "primary"], generated=False),
+    SectionSpec("executive_summary", "EXECUTIVE SUMMARY", lambda inputs: (
+        "This report outlines how Temporal can be integrated with AI systems to enhance reliability, "
+        "enable complex workflow orchestration, and improve production operations. Our analysis shows "
+        "that organizations implementing Temporal for AI workflows can expect improved development "
+        "velocity, reduced operational failures, and better visibility into their AI systems."
+    ), inputs=["task"], keywords=["summary", "executive"]),
+    SectionSpec("findings", "FINDINGS", lambda inputs: "Based on our research:\n" + inputs["research_findings"],
+                inputs=["task", "research_findings"], keywords=["finding", "research"]),
+    SectionSpec("recommendations", "IMPLEMENTATION RECOMMENDATIONS", lambda inputs: RECOMMENDATIONS,
+                inputs=["task"], keywords=["recommendation", "implementation"]),
+    SectionSpec("conclusion", "CONCLUSION", lambda inputs: (
+        "Temporal provides significant advantages for AI systems at scale. Organizations that adopt this "
+        "technology can expect more reliable AI operations, faster development cycles, and better "
+        "visibility into complex workflows. We recommend proceeding with implementation following "
+        "the phased approach outlined in this report."
+    ), inputs=["task"], keywords=["conclusion"]),
+]
+
+# The collaborative report adds the sections the supporting agents asked for
+COLLABORATIVE_REPORT_SECTIONS = [
+    SectionSpec("header", None, lambda inputs: (
+        f"COLLABORATIVE REPORT: {inputs['task'].upper()}\n"
+        f"Primary Author: {inputs['primary']} with contributions from {inputs['supporting']}"
+    ), inputs=["task", "primary", "supporting"], generated=False),
+    SectionSpec("executive_summary", "EXECUTIVE SUMMARY", lambda inputs: (
+        "This collaboratively developed report outlines how Temporal can be integrated with AI systems to enhance reliability, "
+        "enable complex workflow orchestration, and improve production operations. Our multi-agent analysis shows "
+        "that organizations implementing Temporal for AI workflows can expect improved development "
+        "velocity, reduced operational failures, and better visibility into their AI systems."
+    ), inputs=["task"], keywords=["summary", "executive"]),
+    SectionSpec("technical_findings", "TECHNICAL FINDINGS",
+                lambda inputs: "Based on our collaborative research:\n" + inputs["research_findings"],
+                inputs=["task", "research_findings"], keywords=["finding", "technical", "research"]),
+    SectionSpec("recommendations", "IMPLEMENTATION RECOMMENDATIONS", lambda inputs: RECOMMENDATIONS,
+                inputs=["task"], keywords=["recommendation", "implementation"]),
+    SectionSpec("challenges", "CHALLENGES AND LIMITATIONS", lambda inputs: (  # Added based on feedback
+        "1. Learning curve: Teams may need time to adapt to the Temporal programming model\n"
+        "2. Initial setup: Establishing proper monitoring and alerting requires upfront investment\n"
+        "3. Integration complexity: Existing systems may need adapters or modifications"
+    ), inputs=["task"], keywords=["challenge", "limitation", "risk"]),
+    SectionSpec("business_impact", "BUSINESS IMPACT", lambda inputs: (
+        "1. Reduced downtime through improved error handling and recovery\n"
+        "2. Lower operational costs through automation and efficient resource usage\n"
+        "3. Faster time-to-market for AI features through reliable orchestration"
+    ), inputs=["task"], keywords=["business", "impact", "cost"]),
+    SectionSpec("conclusion", "CONCLUSION", lambda inputs: (
+        "Through our collaborative analysis, we've determined that Temporal provides significant advantages for AI systems at scale. "
+        "Organizations that adopt this technology can expect more reliable AI operations, faster development cycles, and better "
+        "visibility into complex workflows. We recommend proceeding with implementation following "
+        "the phased approach outlined in this report."
+    ), inputs=["task"], keywords=["conclusion"]),
+]
+
+# How often progress is re-sent while a long step (a model call or a wait on the LLM limiter)
+# runs; well inside the 30s heartbeat timeout the workflows give the collaborative tasks
+HEARTBEAT_INTERVAL = 5.0
+
+def report_inputs(primary_agent: Any, supporting_agents: List[Any], task: str, research_findings: str) -> Dict[str, Any]:
+    """Everything a report section can depend on"""
+    return {
+        "task": task,
+        "primary": primary_agent["name"] if isinstance(primary_agent, dict) else primary_agent.name,
+        "supporting": ", ".join(agent["name"] if isinstance(agent, dict) else agent.name
+                                for agent in supporting_agents),
+        "research_findings": research_findings,
+    }
+
+def heartbeat_progress(stage: str, thinking_steps: List[ThinkingStep], partial_output: Optional[str] = None,
+                       checkpoint: Optional[Dict[str, Any]] = None) -> None:
+    """Heartbeat the thinking steps produced so far so they are visible before the activity completes"""
+    # Heartbeat details replace each other, so always send the cumulative progress
+    if activity.in_activity():
+        activity.heartbeat({
+            "stage": stage,
+            "thinking_steps": thinking_steps,
+            "partial_output": partial_output,
+            "checkpoint": checkpoint
+        })
+
+@asynccontextmanager
+async def heartbeat_while(stage: str, thinking_steps: List[ThinkingStep], partial_output: Optional[str] = None,
+                          checkpoint: Optional[Dict[str, Any]] = None, interval: Optional[float] = None):
+    """Keep heartbeating the current progress while the enclosed step runs, so the heartbeat
+    timeout only fires when the worker is gone and not while a step waits on the model"""
+    interval = HEARTBEAT_INTERVAL if interval is None else interval
+    
+    async def beat() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            heartbeat_progress(stage, thinking_steps, partial_output, checkpoint)
+    
+    beater = asyncio.create_task(beat()) if activity.in_activity() else None
+    try:
+        yield
+    finally:
+        if beater is not None:
+            beater.cancel()
+
+def load_checkpoint() -> Dict[str, Any]:
+    """Return the checkpoint saved in the last heartbeat of a previous attempt, if any"""
+    if activity.in_activity():
+        details = activity.info().heartbeat_details
+        if details and isinstance(details[0], dict) and details[0].get("checkpoint"):
+            checkpoint = details[0]["checkpoint"]
+            print(f"Resuming {activity.info().activity_type} from checkpoint after: "
+                  f"{', '.join(checkpoint['completed'])}")
+            return checkpoint
+    return {"completed": [], "conversation_id": None, "results": {}, "partial_text": None}
 
 @activity.defn
 async def researcher_perform_research(agent: Any, task: str) -> Tuple[str, List[ThinkingStep]]:
@@ -10,6 +134,9 @@ async def researcher_perform_research(agent: Any, task: str) -> Tuple[str, List[
     # Handle both AgentConfig objects and dictionaries
     agent_name = agent["name"] if isinstance(agent, dict) else agent.name
     
+    from llm import generate
+    from tracing import span
+    
     print(f"Agent '{agent_name}' is researching: {task}")
     
     # Create detailed thinking steps that show the reasoning process
@@ -45,9 +172,18 @@ async def researcher_perform_research(agent: Any, task: str) -> Tuple[str, List[
         ),
     ]
     
-    # Simulate actual work
-    for step in thinking_steps:
-        await asyncio.sleep(1)  # Simulate thinking time
+    # Simulate actual work, reporting each thinking step as soon as it is done
+    for i, step in enumerate(thinking_steps):
+        # Each thinking step is one model call (simulated: the prepared conclusion after a delay)
+        with span("tasks.thinking_step", agent=agent_name, step=step.step_number):
+            step.conclusion = await generate(
+                f"You are {agent_name}. Task: {task}\nThought: {step.content}\nReasoning: {step.reasoning}\nConclude:",
+                simulated_response=step.conclusion,
+                simulated_latency=1,
+                cache=True,
+                cache_scope=(normalize_topic(task), step.content)
+            )
+        heartbeat_progress("researching", thinking_steps[:i + 1])
     
     # Create the research findings based on the thinking steps
     result = f"Research findings on {task} by {agent_name}:\n\n"
@@ -75,6 +211,9 @@ async def writer_create_report(agent: Any, task: str, research_findings: str) ->
     # Handle both AgentConfig objects and dictionaries
     agent_name = agent["name"] if isinstance(agent, dict) else agent.name
     
+    from llm import generate
+    from tracing import span
+    
     print(f"Agent '{agent_name}' is writing: {task}")
     print(f"Using research: {research_findings[:100]}...")
     
@@ -126,35 +265,23 @@ async def writer_create_report(agent: Any, task: str, research_findings: str) ->
         ),
     ]
     
-    # Simulate actual writing work
-    for step in thinking_steps:
-        await asyncio.sleep(1)  # Simulate thinking time
-    
-    # Create the report based on the thinking steps
-    report = f"REPORT: {task.upper()}\n"
-    report += f"Prepared by: {agent_name}\n\n"
-    
-    report += "EXECUTIVE SUMMARY\n"
-    report += "This report outlines how Temporal can be integrated with AI systems to enhance reliability, "
-    report += "enable complex workflow orchestration, and improve production operations. Our analysis shows "
-    report += "that organizations implementing Temporal for AI workflows can expect improved development "
-    report += "velocity, reduced operational failures, and better visibility into their AI systems.\n\n"
-    
-    report += "FINDINGS\n"
-    report += "Based on our research:\n"
-    report += research_findings + "\n\n"
-    
-    report += "IMPLEMENTATION RECOMMENDATIONS\n"
-    report += "1. Start with a pilot project: Choose a non-critical AI workflow to implement with Temporal\n"
-    report += "2. Develop workflow patterns: Create reusable patterns for common AI tasks\n"
-    report += "3. Integrate monitoring: Leverage Temporal's visibility tools for operational insights\n"
-    report += "4. Scale gradually: Expand to more critical AI systems as your team gains experience\n\n"
-    
-    report += "CONCLUSION\n"
-    report += "Temporal provides significant advantages for AI systems at scale. Organizations that adopt this "
-    report += "technology can expect more reliable AI operations, faster development cycles, and better "
-    report += "visibility into complex workflows. We recommend proceeding with implementation following "
-    report += "the phased approach outlined in this report."
+    # Simulate actual writing work, reporting each thinking step as soon as it is done
+    for i, step in enumerate(thinking_steps):
+        # Each thinking step is one model call (simulated: the prepared conclusion after a delay)
+        with span("tasks.thinking_step", agent=agent_name, step=step.step_number):
+            step.conclusion = await generate(
+                f"You are {agent_name}. Task: {task}\nThought: {step.content}\nReasoning: {step.reasoning}\nConclude:",
+                simulated_response=step.conclusion,
+                simulated_latency=1,
+                cache=True,
+                cache_scope=(normalize_topic(task), step.content)
+            )
+        heartbeat_progress("writing", thinking_steps[:i + 1])
+    
+    # Build the report section by section; sections whose inputs are unchanged come from the cache
+    with span("tasks.report", agent=agent_name):
+        sections = await write_sections(REPORT_SECTIONS, report_inputs(agent, [], task, research_findings), agent_name)
+    report = render_report(sections)
     
     print(f"Agent '{agent_name}' completed writing report with {len(thinking_steps)} thinking steps")
     return (report, thinking_steps)
@@ -174,6 +301,16 @@ async def collaborative_research(primary_agent: Any, supporting_agents: List[Any
     
     # Import collaboration activities
     from messages import ask_question, provide_answer, collaborate_on_decision
+    from llm import generate
+    from context_builder import build_context
+    from tracing import span
+    
+    # Resume from the last checkpoint of a failed attempt instead of repeating finished sub-steps
+    checkpoint = load_checkpoint()
+    completed = checkpoint["completed"]
+    results = checkpoint["results"]
+    if checkpoint["conversation_id"] is not None:
+        conversation_id = checkpoint["conversation_id"]
     
     # Initialize collaborative research
     if conversation_id is None:
@@ -184,6 +321,7 @@ async def collaborative_research(primary_agent: Any, supporting_agents: List[Any
             initial_proposal=f"Let's divide the research on {task} into subtopics"
         )
         conversation_id = collaboration["collaboration_id"]
+    checkpoint["conversation_id"] = conversation_id
     
     # Simulate collaborative thinking process
     thinking_steps = [
@@ -214,59 +352,85 @@ async def collaborative_research(primary_agent: Any, supporting_agents: List[Any
         ),
     ]
     
+    heartbeat_progress("dividing research", thinking_steps[:1], checkpoint=checkpoint)
+    
     # Simulate collaboration with questions and answers
     # Ask question to a supporting agent
-    question = await ask_question(
-        sender=primary_agent,
-        recipient=supporting_agents[0],
-        question=f"What specific aspects of {task} should we prioritize in our research?",
-        conversation_id=conversation_id
-    )
+    if "question" not in completed:
+        async with heartbeat_while("dividing research", thinking_steps[:1], checkpoint=checkpoint):
+            results["question"] = await ask_question(
+                sender=primary_agent,
+                recipient=supporting_agents[0],
+                question=f"What specific aspects of {task} should we prioritize in our research?",
+                conversation_id=conversation_id
+            )
+        completed.append("question")
+        heartbeat_progress("dividing research", thinking_steps[:1], checkpoint=checkpoint)
     
     # Get answer from supporting agent
-    answer = await provide_answer(
-        sender=supporting_agents[0],
-        recipient=primary_agent,
-        answer=f"Based on current trends, we should focus on scalability and error handling aspects of {task}.",
-        question_message_id=question["message_id"],
-        conversation_id=conversation_id
-    )
-    
-    # Simulate research work based on the collaboration
-    await asyncio.sleep(2)  # Simulate time spent on research
-    
-    # Create the collaborative research results
-    result = f"Collaborative Research Findings on {task}:\n\n"
-    result += f"Led by: {primary_name} with contributions from {', '.join(supporting_names)}\n\n"
-    
-    result += "1. Temporal provides durability and reliability for AI workflows:\n"
-    result += "   - Automatic retries for failed operations (validated by Critic)\n"
-    result += "   - State persistence across system failures (researched by Researcher)\n"
-    result += "   - Versioning support for evolving AI models (added by Integrator)\n\n"
-    
-    result += "2. Temporal enables complex AI orchestration:\n"
-    result += "   - Coordination of distributed training jobs\n"
-    result += "   - Management of data preprocessing pipelines\n"
-    result += "   - Scheduling of model evaluation and retraining\n\n"
-    
-    result += "3. Benefits for production AI systems:\n"
-    result += "   - Enhanced observability through workflow history\n"
-    result += "   - Simplified debugging of complex AI pipelines\n"
-    result += "   - Scalable architecture for growing AI workloads\n\n"
-    
-    result += "4. Implementation considerations (contributed by multiple agents):\n"
-    result += "   - Start with small, non-critical workflows\n"
-    result += "   - Develop standardized patterns for common AI tasks\n"
-    result += "   - Plan for observability from the beginning"
-    
+    if "answer" not in completed:
+        async with heartbeat_while("dividing research", thinking_steps[:1], checkpoint=checkpoint):
+            await provide_answer(
+                sender=supporting_agents[0],
+                recipient=primary_agent,
+                answer=f"Based on current trends, we should focus on scalability and error handling aspects of {task}.",
+                question_message_id=results["question"]["message_id"],
+                conversation_id=conversation_id
+            )
+        completed.append("answer")
+    heartbeat_progress("incorporating feedback", thinking_steps[:2], checkpoint=checkpoint)
+    
+    if "research" in completed:
+        result = checkpoint["partial_text"]
+    else:
+        # Create the collaborative research results
+        result = f"Collaborative Research Findings on {task}:\n\n"
+        result += f"Led by: {primary_name} with contributions from {', '.join(supporting_names)}\n\n"
+        
+        result += "1. Temporal provides durability and reliability for AI workflows:\n"
+        result += "   - Automatic retries for failed operations (validated by Critic)\n"
+        result += "   - State persistence across system failures (researched by Researcher)\n"
+        result += "   - Versioning support for evolving AI models (added by Integrator)\n\n"
+        
+        result += "2. Temporal enables complex AI orchestration:\n"
+        result += "   - Coordination of distributed training jobs\n"
+        result += "   - Management of data preprocessing pipelines\n"
+        result += "   - Scheduling of model evaluation and retraining\n\n"
+        
+        result += "3. Benefits for production AI systems:\n"
+        result += "   - Enhanced observability through workflow history\n"
+        result += "   - Simplified debugging of complex AI pipelines\n"
+        result += "   - Scalable architecture for growing AI workloads\n\n"
+        
+        result += "4. Implementation considerations (contributed by multiple agents):\n"
+        result += "   - Start with small, non-critical workflows\n"
+        result += "   - Develop standardized patterns for common AI tasks\n"
+        result += "   - Plan for observability from the beginning"
+        
+        # Have the model write up the findings (simulated: the draft above after research time)
+        with span("tasks.research_findings", agent=primary_name, conversation_id=conversation_id):
+            async with heartbeat_while("incorporating feedback", thinking_steps[:2], checkpoint=checkpoint):
+                context = await build_context(conversation_id, primary_name)
+                result = await generate(
+                    f"{context}\n\nYou are {primary_name}. Write collaborative research findings on {task}, "
+                    f"incorporating input from {', '.join(supporting_names)}.",
+                    simulated_response=result,
+                    simulated_latency=2,
+                    cache=True,
+                    cache_scope=(normalize_topic(task), primary_name, supporting_names)
+                )
+        checkpoint["partial_text"] = result
+        completed.append("research")
+    
+    heartbeat_progress("synthesizing findings", thinking_steps, result, checkpoint)
     print(f"Collaborative research completed with {len(thinking_steps)} thinking steps")
     return (result, thinking_steps, conversation_id)
 
 @activity.defn
 async def collaborative_report_writing(primary_agent: Any, supporting_agents: List[Any],
                                       task: str, research_findings: str,
-                                      conversation_id: Optional[str] = None) -> Tuple[str, List[ThinkingStep], str]:
-    """Write a report collaboratively between multiple agents"""
+                                      conversation_id: Optional[str] = None) -> Tuple[List[ReportSection], List[ThinkingStep], str]:
+    """Write a report collaboratively between multiple agents, returned as addressable sections"""
     # Extract the primary agent's name
     primary_name = primary_agent["name"] if isinstance(primary_agent, dict) else primary_agent.name
     
@@ -278,6 +442,15 @@ async def collaborative_report_writing(primary_agent: Any, supporting_agents: Li
     
     # Import collaboration activities
     from messages import send_message, make_proposal, provide_feedback
+    from context_builder import build_context
+    from tracing import span
+    
+    # Resume from the last checkpoint of a failed attempt instead of repeating finished sub-steps
+    checkpoint = load_checkpoint()
+    completed = checkpoint["completed"]
+    results = checkpoint["results"]
+    if checkpoint["conversation_id"] is not None:
+        conversation_id = checkpoint["conversation_id"]
     
     # Initialize collaborative writing
     if conversation_id is None:
@@ -289,6 +462,7 @@ async def collaborative_report_writing(primary_agent: Any, supporting_agents: Li
             initial_proposal=f"Let's create a comprehensive report on {task} with different sections"
         )
         conversation_id = collaboration["collaboration_id"]
+    checkpoint["conversation_id"] = conversation_id
     
     # Simulate collaborative thinking process
     thinking_steps = [
@@ -328,71 +502,90 @@ async def collaborative_report_writing(primary_agent: Any, supporting_agents: Li
         ),
     ]
     
+    heartbeat_progress("planning", thinking_steps[:1], checkpoint=checkpoint)
+    
     # Simulate collaborative writing with proposals and feedback
     # Make initial proposal about report structure
-    proposal = await make_proposal(
-        sender=primary_agent,
-        recipient=supporting_agents[0],
-        proposal=f"I propose structuring the report with: Executive Summary, Technical Findings, Implementation Guide, and Business Impact sections.",
-        conversation_id=conversation_id
-    )
+    if "proposal" not in completed:
+        async with heartbeat_while("planning", thinking_steps[:1], checkpoint=checkpoint):
+            results["proposal"] = await make_proposal(
+                sender=primary_agent,
+                recipient=supporting_agents[0],
+                proposal=f"I propose structuring the report with: Executive Summary, Technical Findings, Implementation Guide, and Business Impact sections.",
+                conversation_id=conversation_id
+            )
+        completed.append("proposal")
+        heartbeat_progress("planning", thinking_steps[:1], checkpoint=checkpoint)
     
     # Get feedback on the proposal
-    feedback = await provide_feedback(
-        sender=supporting_agents[0],
-        recipient=primary_agent,
-        feedback="The structure looks good, but I suggest adding a 'Challenges and Limitations' section to provide a balanced view.",
-        proposal_message_id=proposal["message_id"],
-        conversation_id=conversation_id
-    )
+    if "feedback" not in completed:
+        async with heartbeat_while("planning", thinking_steps[:1], checkpoint=checkpoint):
+            await provide_feedback(
+                sender=supporting_agents[0],
+                recipient=primary_agent,
+                feedback="The structure looks good, but I suggest adding a 'Challenges and Limitations' section to provide a balanced view.",
+                proposal_message_id=results["proposal"]["message_id"],
+                conversation_id=conversation_id
+            )
+        completed.append("feedback")
+    heartbeat_progress("structuring", thinking_steps[:2], checkpoint=checkpoint)
     
     # Additional exchanges between agents
-    await send_message(
-        sender=supporting_agents[1] if len(supporting_agents) > 1 else supporting_agents[0],
-        recipient=primary_agent,
-        content="I've drafted the Technical Findings section. Please review and let me know if you need any changes.",
-        message_type="update",
-        conversation_id=conversation_id
-    )
-    
-    # Simulate writing work
-    await asyncio.sleep(3)  # Simulate collaborative writing time
-    
-    # Create the collaborative report
-    report = f"COLLABORATIVE REPORT: {task.upper()}\n"
-    report += f"Primary Author: {primary_name} with contributions from {', '.join(supporting_names)}\n\n"
-    
-    report += "EXECUTIVE SUMMARY\n"
-    report += "This collaboratively developed report outlines how Temporal can be integrated with AI systems to enhance reliability, "
-    report += "enable complex workflow orchestration, and improve production operations. Our multi-agent analysis shows "
-    report += "that organizations implementing Temporal for AI workflows can expect improved development "
-    report += "velocity, reduced operational failures, and better visibility into their AI systems.\n\n"
-    
-    report += "TECHNICAL FINDINGS\n"
-    report += "Based on our collaborative research:\n"
-    report += research_findings + "\n\n"
-    
-    report += "IMPLEMENTATION RECOMMENDATIONS\n"
-    report += "1. Start with a pilot project: Choose a non-critical AI workflow to implement with Temporal\n"
-    report += "2. Develop workflow patterns: Create reusable patterns for common AI tasks\n"
-    report += "3. Integrate monitoring: Leverage Temporal's visibility tools for operational insights\n"
-    report += "4. Scale gradually: Expand to more critical AI systems as your team gains experience\n\n"
-    
-    report += "CHALLENGES AND LIMITATIONS\n"  # Added based on feedback
-    report += "1. Learning curve: Teams may need time to adapt to the Temporal programming model\n"
-    report += "2. Initial setup: Establishing proper monitoring and alerting requires upfront investment\n"
-    report += "3. Integration complexity: Existing systems may need adapters or modifications\n\n"
-    
-    report += "BUSINESS IMPACT\n"
-    report += "1. Reduced downtime through improved error handling and recovery\n"
-    report += "2. Lower operational costs through automation and efficient resource usage\n"
-    report += "3. Faster time-to-market for AI features through reliable orchestration\n\n"
-    
-    report += "CONCLUSION\n"
-    report += "Through our collaborative analysis, we've determined that Temporal provides significant advantages for AI systems at scale. "
-    report += "Organizations that adopt this technology can expect more reliable AI operations, faster development cycles, and better "
-    report += "visibility into complex workflows. We recommend proceeding with implementation following "
-    report += "the phased approach outlined in this report."
-    
+    if "update" not in completed:
+        async with heartbeat_while("structuring", thinking_steps[:2], checkpoint=checkpoint):
+            await send_message(
+                sender=supporting_agents[1] if len(supporting_agents) > 1 else supporting_agents[0],
+                recipient=primary_agent,
+                content="I've drafted the Technical Findings section. Please review and let me know if you need any changes.",
+                message_type="update",
+                conversation_id=conversation_id
+            )
+        completed.append("update")
+    heartbeat_progress("revising", thinking_steps[:3], checkpoint=checkpoint)
+    
+    if "writing" in completed:
+        sections = [ReportSection(**section) for section in results["sections"]]
+    else:
+        # Have the model write each section (simulated: the drafted text after writing time)
+        with span("tasks.report", agent=primary_name, conversation_id=conversation_id):
+            async with heartbeat_while("revising", thinking_steps[:3], checkpoint=checkpoint):
+                context = await build_context(conversation_id, primary_name)
+                sections = await write_sections(
+                    COLLABORATIVE_REPORT_SECTIONS,
+                    report_inputs(primary_agent, supporting_agents, task, research_findings),
+                    primary_name, context
+                )
+        results["sections"] = [vars(section) for section in sections]
+        completed.append("writing")
+    
+    heartbeat_progress("finalizing", thinking_steps, render_report(sections), checkpoint)
     print(f"Collaborative writing completed with {len(thinking_steps)} thinking steps")
-    return (report, thinking_steps, conversation_id) 
\ No newline at end of file
+    return (sections, thinking_steps, conversation_id)
+
+@activity.defn
+async def revise_report_sections(primary_agent: Any, supporting_agents: List[Any], task: str,
+                                 research_findings: str, sections: List[ReportSection], feedback: str,
+                                 conversation_id: Optional[str] = None) -> List[ReportSection]:
+    """Revise the collaborative report for one piece of feedback, returning only the sections that changed"""
+    primary_name = primary_agent["name"] if isinstance(primary_agent, dict) else primary_agent.name
+    
+    from context_builder import build_context
+    from tracing import span
+    
+    with span("tasks.revise_report", agent=primary_name, conversation_id=conversation_id):
+        context = await build_context(conversation_id, primary_name) if conversation_id else ""
+        changed = await revise_sections(
+            COLLABORATIVE_REPORT_SECTIONS, sections,
+            report_inputs(primary_agent, supporting_agents, task, research_findings),
+            feedback, primary_name, context
+        )
+    print(f"Agent '{primary_name}' revised {len(changed)} of {len(sections)} report sections: "
+          f"{', '.join(section.key for section in changed) or 'none'}")
+    return changed
+
+@activity.defn
+async def store_report(report: str) -> str:
+    """Save the finished report to the report store and return its id (the content hash)"""
+    report_id = await asyncio.to_thread(save_report, report)
+    print(f"Stored report {report_id} ({len(report)} characters)")
+    return report_id
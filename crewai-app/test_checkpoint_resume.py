@@ -0,0 +1,237 @@
+"""Checkpoint resume and heartbeating of the collaborative task activities
+
+Most tests run an activity in an ActivityEnvironment whose heartbeat details are those a
+previous attempt left behind when its worker died, and check which sub-steps run again. The
+worker tests run the activity on a real worker against a local Temporal dev server (set
+TEMPORAL_DEV_SERVER_PATH to use an already downloaded `temporal` binary), stop that worker
+mid-activity and let a new worker pick up the retry.
+
+    python -m pytest -q test_checkpoint_resume.py
+"""
+import asyncio
+import dataclasses
+import os
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List
+
+import pytest
+from temporalio import activity, workflow
+from temporalio.common import RetryPolicy
+from temporalio.testing import ActivityEnvironment, WorkflowEnvironment
+from temporalio.worker import Worker
+
+import llm
+import messages
+import tasks
+from agents import AgentConfig
+from report_sections import ReportSection
+
+TEAM = [AgentConfig(name=name, role=name, goal="", backstory="") for name in ("Researcher", "Critic", "Integrator")]
+
+def resumed(activity_type: str, checkpoint: Dict[str, Any]) -> ActivityEnvironment:
+    """An environment for a retry whose previous attempt heartbeated `checkpoint`"""
+    env = ActivityEnvironment()
+    env.info = dataclasses.replace(env.info, activity_type=activity_type, attempt=2, heartbeat_details=[
+        {"stage": "interrupted", "thinking_steps": [], "partial_output": None, "checkpoint": checkpoint}
+    ])
+    return env
+
+@pytest.fixture
+def calls(monkeypatch) -> List[str]:
+    """Record every messaging and model call the activities make"""
+    made: List[str] = []
+
+    def fake(name: str):
+        async def call(*args, **kwargs) -> Dict[str, Any]:
+            made.append(name)
+            return {"message_id": f"{name}-id", "collaboration_id": "new-conversation"}
+        return call
+
+    for name in ("ask_question", "provide_answer", "collaborate_on_decision", "make_proposal",
+                 "provide_feedback", "send_message"):
+        monkeypatch.setattr(messages, name, fake(name))
+
+    async def generate(prompt: str, simulated_response: str = "", *args, **kwargs) -> str:
+        made.append("generate")
+        return simulated_response
+    monkeypatch.setattr(llm, "generate", generate)
+    return made
+
+def test_research_skips_every_completed_step(calls):
+    env = resumed("collaborative_research", {
+        "completed": ["question", "answer", "research"],
+        "conversation_id": "conversation-1",
+        "results": {"question": {"message_id": "question-1"}},
+        "partial_text": "Findings saved by the first attempt",
+    })
+    findings, thinking_steps, conversation_id = asyncio.run(
+        env.run(tasks.collaborative_research, TEAM[0], TEAM[1:], "Temporal")
+    )
+    assert calls == []
+    assert findings == "Findings saved by the first attempt"
+    assert conversation_id == "conversation-1"
+    assert len(thinking_steps) == 3
+
+def test_research_resumes_after_the_exchanges(calls):
+    env = resumed("collaborative_research", {
+        "completed": ["question", "answer"],
+        "conversation_id": "conversation-1",
+        "results": {"question": {"message_id": "question-1"}},
+        "partial_text": None,
+    })
+    findings, _, conversation_id = asyncio.run(env.run(tasks.collaborative_research, TEAM[0], TEAM[1:], "Temporal"))
+    # The question and answer are not sent again, and the conversation is the original one
+    assert calls == ["generate"]
+    assert conversation_id == "conversation-1"
+    assert findings.startswith("Collaborative Research Findings on Temporal")
+
+def test_writing_skips_every_completed_step(calls):
+    saved = [ReportSection("header", None, "REPORT"), ReportSection("conclusion", "CONCLUSION", "Done")]
+    env = resumed("collaborative_report_writing", {
+        "completed": ["proposal", "feedback", "update", "writing"],
+        "conversation_id": "conversation-2",
+        "results": {"proposal": {"message_id": "proposal-1"}, "sections": [vars(s) for s in saved]},
+        "partial_text": None,
+    })
+    sections, _, conversation_id = asyncio.run(
+        env.run(tasks.collaborative_report_writing, TEAM[0], TEAM[1:], "Report", "Findings")
+    )
+    assert calls == []
+    assert sections == saved
+    assert conversation_id == "conversation-2"
+
+def test_heartbeats_continue_during_a_long_model_call(calls, monkeypatch):
+    async def slow_generate(prompt: str, simulated_response: str = "", *args, **kwargs) -> str:
+        await asyncio.sleep(0.5)
+        return simulated_response
+    monkeypatch.setattr(llm, "generate", slow_generate)
+    monkeypatch.setattr(tasks, "HEARTBEAT_INTERVAL", 0.05)
+
+    heartbeats = []
+    env = ActivityEnvironment()
+    env.info = dataclasses.replace(env.info, activity_type="collaborative_research")
+    env.on_heartbeat = lambda *details: heartbeats.append(details[0])
+    asyncio.run(env.run(tasks.collaborative_research, TEAM[0], TEAM[1:], "Temporal"))
+
+    during_call = [beat for beat in heartbeats if beat["stage"] == "incorporating feedback"]
+    assert len(during_call) >= 5
+    # Each one carries the checkpoint, so a retry after a crash mid-call skips the exchanges
+    assert all(beat["checkpoint"]["completed"][:2] == ["question", "answer"] for beat in during_call)
+
+@workflow.defn(sandboxed=False)
+class ResearchActivityWorkflow:
+    """Runs collaborative_research alone, retrying quickly once its heartbeats stop"""
+    @workflow.run
+    async def run(self) -> Any:
+        return await workflow.execute_activity(
+            tasks.collaborative_research,
+            args=[TEAM[0], TEAM[1:], "Temporal"],
+            start_to_close_timeout=timedelta(seconds=60),
+            heartbeat_timeout=timedelta(seconds=2),
+            retry_policy=RetryPolicy(initial_interval=timedelta(milliseconds=100), maximum_attempts=3),
+        )
+
+async def start_server() -> WorkflowEnvironment:
+    try:
+        return await WorkflowEnvironment.start_local(
+            dev_server_existing_path=os.environ.get("TEMPORAL_DEV_SERVER_PATH"))
+    except RuntimeError as e:
+        pytest.skip(f"Temporal dev server unavailable: {e}")
+
+def research_worker(env: WorkflowEnvironment, task_queue: str) -> Worker:
+    return Worker(env.client, task_queue=task_queue, workflows=[ResearchActivityWorkflow],
+                  activities=[tasks.collaborative_research], graceful_shutdown_timeout=timedelta(0))
+
+async def recorded_checkpoint(env: WorkflowEnvironment, handle) -> Dict[str, Any]:
+    """The checkpoint in the last heartbeat the server recorded for the running activity"""
+    description = await handle.describe()
+    for pending in description.raw_description.pending_activities:
+        if pending.heartbeat_details.payloads:
+            details = await env.client.data_converter.decode(pending.heartbeat_details.payloads)
+            return details[0]["checkpoint"]
+    return {"completed": []}
+
+@pytest.fixture
+def attempts(monkeypatch) -> List[tuple]:
+    """Record (attempt, call, arguments) for every messaging and model call of a worker run"""
+    made: List[tuple] = []
+
+    def fake(name: str):
+        async def call(*args, **kwargs) -> Dict[str, Any]:
+            attempt = activity.info().attempt
+            made.append((attempt, name, kwargs))
+            if name == "provide_answer" and attempt == 1:
+                await asyncio.Event().wait()  # Still answering when the worker goes away
+            return {"message_id": f"{name}-{attempt}", "collaboration_id": f"conversation-{attempt}"}
+        return call
+
+    for name in ("ask_question", "provide_answer", "collaborate_on_decision"):
+        monkeypatch.setattr(messages, name, fake(name))
+
+    async def generate(prompt: str, simulated_response: str = "", *args, **kwargs) -> str:
+        attempt = activity.info().attempt
+        made.append((attempt, "generate", {}))
+        return f"Findings written by attempt {attempt}"
+    monkeypatch.setattr(llm, "generate", generate)
+    monkeypatch.setattr(tasks, "HEARTBEAT_INTERVAL", 0.1)
+    return made
+
+def test_retry_after_worker_shutdown_resumes_from_checkpoint(attempts):
+    async def run() -> Any:
+        async with await start_server() as env:
+            task_queue = f"checkpoint-{uuid.uuid4()}"
+            worker = research_worker(env, task_queue)
+            async with worker:
+                handle = await env.client.start_workflow(ResearchActivityWorkflow.run, id=f"research-{uuid.uuid4()}",
+                                                         task_queue=task_queue)
+                # Stop the worker once the server holds a heartbeat saying the question was asked
+                for _ in range(100):
+                    if (await recorded_checkpoint(env, handle))["completed"] == ["question"]:
+                        break
+                    await asyncio.sleep(0.1)
+                else:
+                    pytest.fail("No checkpoint heartbeat was recorded")
+            async with research_worker(env, task_queue):
+                return await handle.result()
+
+    findings, _, conversation_id = asyncio.run(run())
+    assert [(attempt, name) for attempt, name, _ in attempts] == [
+        (1, "collaborate_on_decision"), (1, "ask_question"), (1, "provide_answer"),
+        (2, "provide_answer"), (2, "generate"),
+    ]
+    # The retry answers the question the first attempt asked, in the first attempt's conversation
+    retried_answer = attempts[3][2]
+    assert retried_answer["question_message_id"] == "ask_question-1"
+    assert retried_answer["conversation_id"] == "conversation-1"
+    assert conversation_id == "conversation-1"
+    assert findings == "Findings written by attempt 2"
+
+def test_retry_after_checkpointed_findings_keeps_them(attempts, monkeypatch):
+    heartbeat_progress = tasks.heartbeat_progress
+
+    def lose_first_result(stage: str, *args, **kwargs) -> None:
+        heartbeat_progress(stage, *args, **kwargs)
+        if stage == "synthesizing findings" and activity.info().attempt == 1:
+            raise RuntimeError("Worker lost before reporting the result")
+    monkeypatch.setattr(tasks, "heartbeat_progress", lose_first_result)
+
+    async def provide_answer(**kwargs) -> Dict[str, Any]:
+        return {"message_id": "answer"}
+    # Let the first attempt answer, so it gets as far as writing the findings
+    monkeypatch.setattr(messages, "provide_answer", provide_answer)
+
+    async def run() -> Any:
+        async with await start_server() as env:
+            task_queue = f"checkpoint-{uuid.uuid4()}"
+            async with research_worker(env, task_queue):
+                return await env.client.execute_workflow(ResearchActivityWorkflow.run, id=f"research-{uuid.uuid4()}",
+                                                         task_queue=task_queue)
+
+    findings, _, conversation_id = asyncio.run(run())
+    # Nothing runs again: the findings come from the first attempt's checkpoint
+    assert [(attempt, name) for attempt, name, _ in attempts] == [
+        (1, "collaborate_on_decision"), (1, "ask_question"), (1, "generate"),
+    ]
+    assert findings == "Findings written by attempt 1"
+    assert conversation_id == "conversation-1"
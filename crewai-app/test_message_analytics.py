@@ -0,0 +1,58 @@
+"""Thinking step counts from the message log when activities are retried, and answers matched
+to questions in earlier segments
+
+    python -m pytest -q test_message_analytics.py
+"""
+import asyncio
+import dataclasses
+
+from temporalio.testing import ActivityEnvironment
+
+import message_analytics
+import messages
+from agents import AgentConfig
+from message_analytics import analyze
+from message_log import MessageLog, segment_paths
+from thinking import ThinkingStep, researcher_detailed_thinking
+from write_behind import DURABILITY_INLINE, WriteBehindWriter
+
+RESEARCHER = AgentConfig(name="Researcher", role="Research Expert", goal="", backstory="")
+
+def test_retried_thinking_steps_count_once(tmp_path, monkeypatch):
+    log = MessageLog(str(tmp_path))
+    monkeypatch.setattr(messages, "MESSAGE_WRITER", WriteBehindWriter(log, durability=DURABILITY_INLINE))
+
+    for step, attempts in ((1, 1), (2, 3)):
+        for attempt in range(1, attempts + 1):
+            env = ActivityEnvironment()
+            env.info = dataclasses.replace(env.info, workflow_id="crew-1", workflow_run_id="run-1", attempt=attempt)
+            asyncio.run(env.run(researcher_detailed_thinking, RESEARCHER,
+                                ThinkingStep(content=f"Step {step}", step_number=step, reasoning="")))
+            if attempt == 2:
+                log._seal_active()  # The retry lands in a later segment
+    log.close()
+
+    summary, _ = analyze(segment_paths(str(tmp_path)), max_workers=1)
+    assert summary["thinking_steps_per_phase"] == [{"phase": "research", "steps": 2, "runs": 1, "mean_per_run": 2.0}]
+    assert len(log.read_conversation("thinking-crew-1")["messages"]) == 2
+
+def test_answers_match_questions_in_earlier_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(message_analytics, "ANSWER_WINDOW_SEGMENTS", 2)
+    log = MessageLog(str(tmp_path))
+    exchanges = [("q1", "question", None, 10.0), ("q2", "question", None, 20.0),
+                 ("a1", "answer", "q1", 15.0), ("m1", "message", None, 30.0), ("a2", "answer", "q2", 50.0)]
+    for message_id, message_type, related_to, timestamp in exchanges:
+        log.append("c1", "topic", {"message_id": message_id, "sender": "Writer", "recipient": "Researcher",
+                                   "message_type": message_type, "related_to": related_to,
+                                   "timestamp": timestamp, "content": ""})
+        log._seal_active()  # One segment per message
+    log.close()
+    paths = segment_paths(str(tmp_path))
+
+    # q2 is forgotten before its answer arrives, three segments later
+    gaps = analyze(paths, max_workers=1)[0]["response_gaps_seconds"]
+    assert (gaps["count"], gaps["max"], gaps["unanswered_questions"], gaps["answers_without_question"]) == (1, 5.0, 1, 1)
+    assert "unanswered_question_ids" not in gaps
+
+    gaps = analyze(paths, max_workers=1, details=True)[0]["response_gaps_seconds"]
+    assert (gaps["count"], gaps["max"], gaps["unanswered_questions"], gaps["unanswered_question_ids"]) == (2, 30.0, 0, [])
@@ -0,0 +1,130 @@
+"""Retention of the segmented message log, after compaction and in the search index, searching
+the index with arbitrary text, the locks that keep other processes from writing or rewriting
+segments under it, and the write-behind writer outliving the event loops of its senders
+
+    python -m pytest -q test_message_log.py
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import search_index
+from message_log import MessageLog, segment_path, segments_locked
+from write_behind import DURABILITY_FIRE_AND_FORGET, DURABILITY_FLUSH, WriteBehindWriter
+
+DAY = 86400
+
+def message(message_id: str, content: str = "durable execution") -> dict:
+    return {"message_id": message_id, "sender": "Researcher", "recipient": "Writer",
+            "message_type": "message", "timestamp": 0.0, "related_to": None, "content": content}
+
+def write_segment(log: MessageLog, conversation_id: str, message_ids, age: float) -> None:
+    """Append messages to a segment of their own and backdate it by `age` seconds"""
+    log.append_batch([(conversation_id, "topic", message(message_id)) for message_id in message_ids])
+    seq = log._active_seq
+    log._seal_active()
+    written = time.time() - age
+    os.utime(segment_path(log.directory, seq), (written, written))
+
+@pytest.fixture
+def index(monkeypatch) -> sqlite3.Connection:
+    connection = sqlite3.connect(":memory:", check_same_thread=False)
+    connection.executescript(search_index.SCHEMA)
+    monkeypatch.setattr(search_index, "_connection", connection)
+    return connection
+
+def test_compacted_segments_still_expire(tmp_path):
+    log = MessageLog(str(tmp_path), retention=7 * DAY)
+    write_segment(log, "old", ["m1"], age=9 * DAY)
+    write_segment(log, "old", ["m2"], age=8 * DAY)
+    assert log.compact() == 1
+    # The merged segment keeps the time of its newest message rather than that of the merge
+    assert log.apply_retention() == 1
+    assert log.read_conversation("old") is None
+
+def test_compaction_keeps_the_newest_message_time(tmp_path):
+    log = MessageLog(str(tmp_path), retention=7 * DAY)
+    write_segment(log, "mixed", ["m1"], age=9 * DAY)
+    write_segment(log, "mixed", ["m2"], age=1 * DAY)
+    assert log.compact() == 1
+    assert log.apply_retention() == 0
+    assert [m["message_id"] for m in log.read_conversation("mixed")["messages"]] == ["m1", "m2"]
+
+def test_retention_removes_expired_messages_from_the_search_index(tmp_path, index):
+    log = MessageLog(str(tmp_path), retention=7 * DAY, on_expire=search_index.delete_messages)
+    write_segment(log, "old", ["m1", "m2"], age=8 * DAY)
+    write_segment(log, "new", ["m3"], age=0)
+    search_index.index_messages([message("m1"), message("m2")], "old")
+    search_index.index_messages([message("m3")], "new")
+
+    assert log.apply_retention() == 1
+    assert [row["message_id"] for row in search_index.search_messages("durable")] == ["m3"]
+    assert index.execute("SELECT count(*) FROM messages").fetchone()[0] == 1
+    # The inverted index no longer holds the deleted rows (raises if it is out of step)
+    index.execute("INSERT INTO messages_fts(messages_fts, rank) VALUES ('integrity-check', 1)")
+
+def test_search_treats_query_syntax_as_words(index):
+    search_index.index_messages([message("m1", "durable execution"), message("m2", "AND (gate)")], "c1")
+    assert [row["message_id"] for row in search_index.search_messages('durable"')] == ["m1"]
+    assert [row["message_id"] for row in search_index.search_messages("AND (")] == ["m2"]
+    assert [row["message_id"] for row in search_index.search_messages("execution durable")] == ["m1"]
+    assert search_index.search_messages('NEAR(durable "') == []
+
+def test_a_second_writer_is_refused(tmp_path):
+    # flock conflicts between separate opens of the lock file, so two instances stand in for two processes
+    writer = MessageLog(str(tmp_path))
+    writer.append("c1", "topic", message("m1"))
+    other = MessageLog(str(tmp_path))
+    with pytest.raises(RuntimeError, match="another process"):
+        other.append("c1", "topic", message("m2"))
+    with pytest.raises(RuntimeError, match="another process"):
+        other.compact()
+    writer.close()
+    other.append("c1", "topic", message("m2"))
+    other.close()
+
+def test_compaction_waits_for_segment_readers_without_blocking_appends(tmp_path):
+    log = MessageLog(str(tmp_path), retention=7 * DAY)
+    write_segment(log, "old", ["m1"], age=2 * DAY)
+    write_segment(log, "old", ["m2"], age=1 * DAY)
+    merged = []
+    with segments_locked(str(tmp_path)):
+        compaction = threading.Thread(target=lambda: merged.append(log.compact()))
+        compaction.start()
+        compaction.join(0.2)
+        assert compaction.is_alive() and not merged
+        log.append("new", "topic", message("m3"))
+    compaction.join()
+    assert merged == [1]
+    assert [m["message_id"] for m in log.read_conversation("old")["messages"]] == ["m1", "m2"]
+
+def test_writer_keeps_draining_after_a_sender_loop_closes(tmp_path):
+    log = MessageLog(str(tmp_path))
+    writing = threading.Event()
+    release = threading.Event()
+    append_batch = log.append_batch
+
+    def slow_append(records):
+        writing.set()
+        release.wait()
+        append_batch(records)
+    log.append_batch = slow_append
+    writer = WriteBehindWriter(log)
+
+    # A sender waiting for durability whose loop is gone by the time its batch is written
+    loop = asyncio.new_event_loop()
+    sender = loop.create_task(writer.submit(("c1", "topic", message("m1")), DURABILITY_FLUSH))
+    loop.run_until_complete(asyncio.to_thread(writing.wait))
+    sender.cancel()
+    loop.run_until_complete(asyncio.gather(sender, return_exceptions=True))
+    loop.close()
+    asyncio.run(writer.submit(("c1", "topic", message("m2")), DURABILITY_FIRE_AND_FORGET))
+    release.set()
+    writer.close(timeout=5)
+
+    assert not writer._thread.is_alive()
+    assert [m["message_id"] for m in log.read_conversation("c1")["messages"]] == ["m1", "m2"]
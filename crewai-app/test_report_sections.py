@@ -0,0 +1,42 @@
+"""Section cache keys: a section is reused only when everything in its prompt is unchanged
+
+    python -m pytest -q test_report_sections.py
+"""
+import asyncio
+from typing import List
+
+import pytest
+
+import llm
+import report_sections
+from report_sections import SectionSpec, build_section
+
+SUMMARY = SectionSpec("summary", "SUMMARY", lambda inputs: f"About {inputs['task']}", inputs=["task"])
+
+@pytest.fixture
+def prompts(monkeypatch) -> List[str]:
+    """Record the prompts that reach the model, starting from an empty section cache"""
+    made: List[str] = []
+
+    async def model(prompt: str, simulated_response: str, *args) -> str:
+        made.append(prompt)
+        return simulated_response
+    monkeypatch.setattr(llm, "_generate", model)
+    monkeypatch.setattr(report_sections, "SECTION_CACHE", report_sections.OrderedDict())
+    return made
+
+def test_same_context_reuses_the_section(prompts):
+    async def scenario():
+        return [await build_section(SUMMARY, {"task": "Temporal"}, "Writer", "Critic: cite sources")
+                for _ in range(2)]
+    first, second = asyncio.run(scenario())
+    assert first.inputs_hash == second.inputs_hash
+    assert len(prompts) == 1
+
+def test_changed_context_regenerates_the_section(prompts):
+    async def scenario():
+        return [await build_section(SUMMARY, {"task": "Temporal"}, "Writer", context)
+                for context in ("Critic: cite sources", "Critic: shorten the summary")]
+    first, second = asyncio.run(scenario())
+    assert first.inputs_hash != second.inputs_hash
+    assert len(prompts) == 2 and "shorten the summary" in prompts[1]
@@ -0,0 +1,79 @@
+"""Semantic cache isolation: prompts that differ in an exact input never share an answer,
+while prompts that differ only in the wording of their topic do
+
+    python -m pytest -q test_semantic_cache.py
+"""
+import asyncio
+from typing import List
+
+import pytest
+
+import llm
+import tasks
+from agents import AgentConfig
+from semantic_cache import SemanticCache, embed, namespace_key
+
+CONTEXT = "Conversation so far:\n" + "\n".join(f"Agent {i}: notes on retries, durability and state." for i in range(40))
+
+def findings_prompt(topic: str, context: str = CONTEXT) -> str:
+    return f"{context}\n\nYou are Researcher. Write collaborative research findings on {topic}."
+
+@pytest.fixture
+def model_calls(monkeypatch) -> List[str]:
+    """Enable a fresh semantic cache and record the prompts that reach the model"""
+    made: List[str] = []
+
+    async def model(prompt: str, simulated_response: str, *args) -> str:
+        made.append(prompt)
+        return simulated_response
+    monkeypatch.setattr(llm, "_generate", model)
+    monkeypatch.setattr(llm, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm, "_semantic_cache", SemanticCache(capacity=16, threshold=0.95))
+    return made
+
+def test_topics_alone_are_similar_enough_to_collide():
+    # The prompts differ only in the topic, well above the threshold on similarity alone
+    assert float(embed(findings_prompt("Temporal")) @ embed(findings_prompt("Kafka"))) > 0.95
+
+def test_different_topics_do_not_share_an_answer(model_calls):
+    async def scenario():
+        temporal = await llm.generate(findings_prompt("Temporal"), "About Temporal", cache=True,
+                                      cache_scope=("Temporal", "Researcher"))
+        kafka = await llm.generate(findings_prompt("Kafka"), "About Kafka", cache=True,
+                                   cache_scope=("Kafka", "Researcher"))
+        return temporal, kafka
+    assert asyncio.run(scenario()) == ("About Temporal", "About Kafka")
+    assert len(model_calls) == 2
+
+def test_default_scope_only_reuses_identical_prompts(model_calls):
+    async def scenario():
+        first = await llm.generate(findings_prompt("Temporal"), "About Temporal", cache=True)
+        other = await llm.generate(findings_prompt("Kafka"), "About Kafka", cache=True)
+        again = await llm.generate(findings_prompt("Temporal"), "Not called", cache=True)
+        return first, other, again
+    assert asyncio.run(scenario()) == ("About Temporal", "About Kafka", "About Temporal")
+    assert len(model_calls) == 2
+
+def test_similar_context_within_a_scope_is_reused(model_calls):
+    async def scenario():
+        first = await llm.generate(findings_prompt("Temporal"), "About Temporal", cache=True,
+                                   cache_scope=("Temporal", "Researcher"))
+        again = await llm.generate(findings_prompt("Temporal", CONTEXT + "\nAgent 41: agreed."), "Not called",
+                                   cache=True, cache_scope=("Temporal", "Researcher"))
+        return first, again
+    assert asyncio.run(scenario()) == ("About Temporal", "About Temporal")
+    assert len(model_calls) == 1
+
+def test_lookup_scores_only_its_namespace():
+    cache = SemanticCache(capacity=4, threshold=0.95)
+    cache.store(findings_prompt("Temporal"), "About Temporal", namespace_key("Temporal"))
+    assert cache.lookup(findings_prompt("Temporal"), namespace_key("Kafka")) is None
+    answer, similarity = cache.lookup(findings_prompt("Temporal"), namespace_key("Temporal"))
+    assert answer == "About Temporal" and similarity > 0.99
+
+def test_reworded_topics_share_research_steps(model_calls):
+    researcher = AgentConfig(name="Researcher", role="Research Expert", goal="", backstory="")
+    for topic in ("Temporal for AI workflows", "temporal for AI  workflows?", "Kafka for AI workflows"):
+        asyncio.run(tasks.researcher_perform_research(researcher, topic))
+    # One model call per thinking step for each distinct topic; the rewording hits the cache
+    assert len(model_calls) == 6
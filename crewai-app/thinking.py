@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from typing import List, Optional, Dict, Any
 import time
+import uuid
 from temporalio import activity
 import asyncio
 
@@ -13,6 +14,29 @@ class ThinkingStep:
     evidence: List[str] = None  # Supporting evidence for this thought
     conclusion: Optional[str] = None  # What was concluded from this thought
 
+async def log_thinking_step(agent_name: str, phase: str, thinking: ThinkingStep) -> None:
+    """Append a detailed thinking step to the message log, so offline analytics can count steps per phase.
+    The record id is the same on every attempt of the activity, so readers keep one record per step."""
+    from messages import Message, MESSAGE_WRITER
+    if activity.in_activity():
+        info = activity.info()
+        workflow_id, run_id, attempt = info.workflow_id, info.workflow_run_id, info.attempt
+    else:
+        workflow_id, run_id, attempt = "unknown", str(uuid.uuid4()), 1
+    record = Message(
+        sender=agent_name,
+        recipient=agent_name,
+        content=thinking.content,
+        message_type="thinking",
+        message_id=f"thinking-{workflow_id}-{run_id}-{phase}-{thinking.step_number}",
+        metadata={"phase": phase, "step": thinking.step_number, "attempt": attempt},
+        recipients=[agent_name]
+    )
+    try:
+        await MESSAGE_WRITER.submit((f"thinking-{workflow_id}", f"Thinking steps of {workflow_id}", vars(record)))
+    except Exception as e:
+        print(f"Warning: Could not log thinking step: {e}")
+
 # Define thinking activities
 @activity.defn
 async def researcher_detailed_thinking(agent: Any, thinking: ThinkingStep) -> Dict[str, Any]:
@@ -35,6 +59,10 @@ async def researcher_detailed_thinking(agent: Any, thinking: ThinkingStep) -> Di
     if thinking.conclusion:
         print(f"  CONCLUSION: {thinking.conclusion}")
     
+    from metrics import record_thinking_step
+    record_thinking_step(agent_name, "researcher_detailed")
+    await log_thinking_step(agent_name, "research", thinking)
+    
     # Return the complete thinking step as a dict for logging
     return {
         "agent": agent_name,
@@ -67,6 +95,10 @@ async def writer_detailed_thinking(agent: Any, thinking: ThinkingStep) -> Dict[s
     if thinking.conclusion:
         print(f"  CONCLUSION: {thinking.conclusion}")
     
+    from metrics import record_thinking_step
+    record_thinking_step(agent_name, "writer_detailed")
+    await log_thinking_step(agent_name, "writing", thinking)
+    
     # Return the complete thinking step as a dict for logging
     return {
         "agent": agent_name,
@@ -85,6 +117,8 @@ async def researcher_think(agent: Any, thought: str) -> str:
     # Handle both AgentConfig objects and dictionaries
     agent_name = agent["name"] if isinstance(agent, dict) else agent.name
     print(f"[{timestamp}] 🧠 {agent_name} is thinking: {thought}")
+    from metrics import record_thinking_step
+    record_thinking_step(agent_name, "researcher")
     return f"Thought recorded: {thought}"
 
 @activity.defn
@@ -94,4 +128,6 @@ async def writer_think(agent: Any, thought: str) -> str:
     # Handle both AgentConfig objects and dictionaries
     agent_name = agent["name"] if isinstance(agent, dict) else agent.name
     print(f"[{timestamp}] 🧠 {agent_name} is thinking: {thought}")
+    from metrics import record_thinking_step
+    record_thinking_step(agent_name, "writer")
     return f"Thought recorded: {thought}" 
\ No newline at end of file
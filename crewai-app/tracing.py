@@ -0,0 +1,79 @@
+from contextlib import nullcontext
+from typing import Optional, Sequence, Any
+import os
+import threading
+
+# Tracing is optional: without the OpenTelemetry packages every span below is a no-op
+try:
+    from google.protobuf.json_format import MessageToJson
+    from opentelemetry import trace
+    from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider, ReadableSpan
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+    TRACING_AVAILABLE = True
+except ImportError:
+    TRACING_AVAILABLE = False
+
+# Spans are appended here as OTLP/JSON lines, the format the collector's otlpjsonfile receiver reads
+TRACE_EXPORT_PATH = os.environ.get("TRACE_EXPORT_PATH", "/tmp/agent_traces/spans.jsonl")
+TRACER_NAME = "crewai-app"
+
+if TRACING_AVAILABLE:
+    class OTLPFileSpanExporter(SpanExporter):
+        """Write each exported batch of spans as one OTLP/JSON line, for offline analysis without a collector"""
+
+        def __init__(self, path: str):
+            self.path = path
+            self._lock = threading.Lock()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        def export(self, spans: Sequence[ReadableSpan]) -> "SpanExportResult":
+            line = MessageToJson(encode_spans(spans), indent=None)
+            try:
+                with self._lock, open(self.path, "a") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"Warning: Could not write traces: {e}")
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            pass
+
+def init_tracing(service_name: str = "crewai-worker", path: str = TRACE_EXPORT_PATH) -> Optional[Any]:
+    """Install a tracer provider exporting to disk and return the Temporal tracing interceptor
+
+    Pass the interceptor to Client.connect(); workers created from that client pick it up,
+    so workflow, activity and client calls are traced alongside the spans below.
+    """
+    if not TRACING_AVAILABLE:
+        print("OpenTelemetry is not installed; tracing disabled")
+        return None
+    from temporalio.contrib.opentelemetry import TracingInterceptor
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPFileSpanExporter(path)))
+    trace.set_tracer_provider(provider)
+    print(f"Writing traces to {path}")
+    return TracingInterceptor()
+
+def current_link() -> Optional[Any]:
+    """A link to the active span, for work it hands to another thread (None without tracing)"""
+    if not TRACING_AVAILABLE:
+        return None
+    context = trace.get_current_span().get_span_context()
+    return trace.Link(context) if context.is_valid else None
+
+def span(name: str, agent: Optional[str] = None, message_type: Optional[str] = None,
+         conversation_id: Optional[str] = None, links: Optional[Sequence[Any]] = None, **attributes: Any):
+    """Start a span carrying the agent name, message type and conversation_id when known, linked
+    to the spans in `links` (e.g. those of the senders whose work a batch does)"""
+    if not TRACING_AVAILABLE:
+        return nullcontext()
+    if agent is not None:
+        attributes["agent.name"] = agent
+    if message_type is not None:
+        attributes["message.type"] = message_type
+    if conversation_id is not None:
+        attributes["conversation.id"] = conversation_id
+    return trace.get_tracer(TRACER_NAME).start_as_current_span(name, attributes=attributes, links=links)
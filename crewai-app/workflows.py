@@ -1,57 +1,207 @@
 from datetime import timedelta
 from temporalio import workflow
-from typing import Dict, Any, List
+from temporalio.exceptions import ChildWorkflowError
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import asyncio
+
+# Import activity references once, outside the sandbox. The workflow only needs the function
+# objects for their names and type hints; without the passthrough every run re-imports these
+# modules (and everything they pull in) into a fresh sandbox on its first workflow task.
+with workflow.unsafe.imports_passed_through():
+    from agents import (setup_researcher_agent, setup_writer_agent, 
+                       setup_critic_agent, setup_integrator_agent, setup_reviewer_agent,
+                       agent_response_to_feedback, resolve_agent_disagreement)
+    from tasks import (collaborative_research, collaborative_report_writing, revise_report_sections,
+                       store_report)
+    from thinking import ThinkingStep, researcher_detailed_thinking, writer_detailed_thinking
+    from messages import (ask_question, provide_answer, make_proposal, 
+                         provide_feedback, get_conversation_history)
+    from policies import get_activity_policies, activity_options
+    from phase_cache import lookup_research_phase, store_research_phase, normalize_topic
+    from report_sections import render_report, apply_section_updates
+    from cpu_activities import analyze_message_log, reindex_message_log
+
+# Changes to the commands CollaborativeAgentWorkflow issues, each gated by workflow.patched so
+# that runs started before the change (and their saved histories) replay on the old path:
+#   research-phase-cache - look up and store the research phase in the phase cache
+#   report-sections      - writing returns sections, which each feedback round revises
+#   store-report         - the finished report goes to the report store
+PATCH_RESEARCH_PHASE_CACHE = "research-phase-cache"
+PATCH_REPORT_SECTIONS = "report-sections"
+PATCH_STORE_REPORT = "store-report"
+# BatchReportWorkflow runs at most `max_concurrent` children at a time; batches started before
+# the window replay with all of their children started at once
+PATCH_BATCH_WINDOW = "batch-child-window"
+
+# Children a batch runs at once unless the caller passes its own limit
+BATCH_MAX_CONCURRENT = 20
+
+# Every activity the workflows below call, for get_activity_policies
+WORKFLOW_ACTIVITY_NAMES = [
+    "setup_researcher_agent", "setup_writer_agent", "setup_critic_agent", "setup_integrator_agent",
+    "setup_reviewer_agent", "agent_response_to_feedback", "resolve_agent_disagreement",
+    "collaborative_research", "collaborative_report_writing", "revise_report_sections",
+    "researcher_detailed_thinking", "writer_detailed_thinking",
+    "ask_question", "provide_answer", "make_proposal", "provide_feedback",
+    "get_conversation_history", "store_report", "lookup_research_phase", "store_research_phase",
+]
+# Activities MessageLogAnalyticsWorkflow calls
+ANALYTICS_ACTIVITY_NAMES = ["reindex_message_log", "analyze_message_log"]
+
+async def fetch_policies(activity_names: List[str] = WORKFLOW_ACTIVITY_NAMES) -> Callable[[Any], Dict[str, Any]]:
+    """Fetch timeouts and retry policies derived from observed latency, and return a function
+    giving the execute_activity options for an activity. Running the lookup as an activity
+    records the policies in history, keeping replays deterministic."""
+    policies = await workflow.execute_activity(
+        get_activity_policies,
+        args=[activity_names],
+        start_to_close_timeout=timedelta(seconds=10),
+    )
+    
+    def options(activity_fn) -> Dict[str, Any]:
+        return activity_options(policies[activity_fn.__name__])
+    return options
+
+async def run_research(researcher: Any, supporting_agents: List[Any], research_topic: str,
+                       options: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+    """Run the collaborative research phase and log its detailed thinking steps, or reuse the
+    output of a recent identical phase from the phase cache"""
+    team = [researcher] + supporting_agents
+    cached = {"research": None, "enabled": False}
+    if workflow.patched(PATCH_RESEARCH_PHASE_CACHE):
+        cached = await workflow.execute_activity(
+            lookup_research_phase,
+            args=[research_topic, team],
+            **options(lookup_research_phase),
+        )
+    if cached["research"] is not None:
+        return cached["research"]
+    
+    findings, research_thinking, conversation_id = await workflow.execute_activity(
+        collaborative_research,
+        args=[researcher, supporting_agents, research_topic],
+        **options(collaborative_research),
+        # Short heartbeat timeout so a dead worker is noticed and the retry resumes from its checkpoint
+        heartbeat_timeout=timedelta(seconds=30),
+    )
+    
+    # Log each detailed thinking step from research
+    thinking = []
+    for thinking_step in research_thinking:
+        thinking.append(await workflow.execute_activity(
+            researcher_detailed_thinking,
+            args=[researcher, thinking_step],
+            **options(researcher_detailed_thinking),
+        ))
+    research = {"research_topic": research_topic, "findings": findings,
+                "conversation_id": conversation_id, "thinking": thinking}
+    if cached["enabled"]:
+        await workflow.execute_activity(
+            store_research_phase,
+            args=[research_topic, team, research],
+            **options(store_research_phase),
+        )
+    return research
 
 @workflow.defn
 class CollaborativeAgentWorkflow:
+    def __init__(self) -> None:
+        # Progress so far, exposed to operators and UIs through the get_progress query
+        self._phase = "initializing"
+        self._thinking: List[Dict[str, Any]] = []
+        self._partial_output = None
+        # Details kept out of the result; fetch them with the queries below (or, after the
+        # workflow is gone, from the message log and the report store)
+        self._final_report: Optional[str] = None
+        self._conversations: List[Dict[str, Any]] = []
+        self._writer_response: Optional[Dict[str, Any]] = None
+    
+    @workflow.query
+    def get_progress(self) -> Dict[str, Any]:
+        """Return the current phase, the thinking steps recorded so far and any partial output"""
+        return {
+            "phase": self._phase,
+            "thinking_steps": self._thinking,
+            "partial_output": self._partial_output
+        }
+    
+    @workflow.query
+    def get_report(self) -> Optional[str]:
+        """Return the full report text once writing has finished"""
+        return self._final_report
+    
+    @workflow.query
+    def get_conversations(self) -> List[Dict[str, Any]]:
+        """Return the full research and writing conversations"""
+        return self._conversations
+    
+    @workflow.query
+    def get_thinking(self) -> List[Dict[str, Any]]:
+        """Return every detailed thinking record"""
+        return self._thinking
+    
+    @workflow.query
+    def get_writer_response(self) -> Optional[Dict[str, Any]]:
+        """Return the writer's response to the last round of feedback"""
+        return self._writer_response
+    
     @workflow.run
-    async def run(self, research_topic: str, report_title: str) -> Dict[str, Any]:
-        # Import activities only within workflow methods to avoid sandbox issues
-        from agents import (setup_researcher_agent, setup_writer_agent, 
-                           setup_critic_agent, setup_integrator_agent,
-                           agent_response_to_feedback, resolve_agent_disagreement)
-        from tasks import (collaborative_research, collaborative_report_writing)
-        from thinking import researcher_detailed_thinking, writer_detailed_thinking
-        from messages import (ask_question, provide_answer, make_proposal, 
-                             provide_feedback, get_conversation_history)
+    async def run(self, research_topic: str, report_title: str, feedback_rounds: int = 1,
+                  research: Optional[Dict[str, Any]] = None, extra_reviewers: int = 0) -> Dict[str, Any]:
+        # `research` carries findings already produced for this topic (by a ResearchWorkflow in
+        # a batch); when given, the research phase is skipped and the report builds on it.
+        # `extra_reviewers` adds reviewer agents to the team, which take turns reviewing the report.
+        options = await fetch_policies()
         
         # Store all thinking and conversation data
-        all_thinking = []
-        all_conversations = []
+        all_thinking = self._thinking
+        all_conversations = self._conversations
         
         # Initialize the agents
         researcher = await workflow.execute_activity(
             setup_researcher_agent,
-            start_to_close_timeout=timedelta(seconds=30),
+            **options(setup_researcher_agent),
         )
         print(f"Initialized {researcher.name} agent in workflow")
         
         writer = await workflow.execute_activity(
             setup_writer_agent,
-            start_to_close_timeout=timedelta(seconds=30),
+            **options(setup_writer_agent),
         )
         print(f"Initialized {writer.name} agent in workflow")
         
         critic = await workflow.execute_activity(
             setup_critic_agent,
-            start_to_close_timeout=timedelta(seconds=30),
+            **options(setup_critic_agent),
         )
         print(f"Initialized {critic.name} agent in workflow")
         
         integrator = await workflow.execute_activity(
             setup_integrator_agent,
-            start_to_close_timeout=timedelta(seconds=30),
+            **options(setup_integrator_agent),
         )
         print(f"Initialized {integrator.name} agent in workflow")
         
+        reviewers = [critic, integrator]
+        for number in range(1, extra_reviewers + 1):
+            reviewer = await workflow.execute_activity(
+                setup_reviewer_agent,
+                args=[number],
+                **options(setup_reviewer_agent),
+            )
+            reviewers.append(reviewer)
+            print(f"Initialized {reviewer.name} agent in workflow")
+        extra = reviewers[2:]
+        
         # STAGE 1: PLANNING - Integrator coordinates the team
+        self._phase = "planning"
         print(f"\n{'='*20} PLANNING PHASE: TEAM COORDINATION {'='*20}\n")
         
         # Integrator asks each agent about their approach
         planning_question_to_researcher = await workflow.execute_activity(
             ask_question,
             args=[integrator, researcher, f"How would you approach researching {research_topic}?"],
-            start_to_close_timeout=timedelta(seconds=10),
+            **options(ask_question),
         )
         
         researcher_plan_response = await workflow.execute_activity(
@@ -63,13 +213,13 @@ class CollaborativeAgentWorkflow:
                 planning_question_to_researcher["message_id"],
                 planning_question_to_researcher["conversation_id"]
             ],
-            start_to_close_timeout=timedelta(seconds=10),
+            **options(provide_answer),
         )
         
         planning_question_to_writer = await workflow.execute_activity(
             ask_question,
             args=[integrator, writer, f"How would you structure a report on {report_title}?"],
-            start_to_close_timeout=timedelta(seconds=10),
+            **options(ask_question),
         )
         
         writer_plan_response = await workflow.execute_activity(
@@ -81,18 +231,37 @@ class CollaborativeAgentWorkflow:
                 planning_question_to_writer["message_id"],
                 planning_question_to_writer["conversation_id"]
             ],
-            start_to_close_timeout=timedelta(seconds=10),
+            **options(provide_answer),
         )
         
+        # Integrator briefs each additional reviewer
+        for reviewer in extra:
+            briefing_question = await workflow.execute_activity(
+                ask_question,
+                args=[integrator, reviewer, f"What will you check when reviewing the report on {report_title}?"],
+                **options(ask_question),
+            )
+            await workflow.execute_activity(
+                provide_answer,
+                args=[
+                    reviewer,
+                    integrator,
+                    "I will check that every claim is backed by the research and that the recommendations can be acted on.",
+                    briefing_question["message_id"],
+                    briefing_question["conversation_id"]
+                ],
+                **options(provide_answer),
+            )
+        
         # Integrator proposes a project plan
         project_plan_proposal = await workflow.execute_activity(
             make_proposal,
             args=[
                 integrator,
-                [researcher, writer, critic],  # Send to all team members
+                [researcher, writer, critic, *extra],  # Send to all team members
                 f"Based on our discussions, I propose the following plan: 1) Collaborative research led by the Researcher with Critic input, 2) Draft report creation by Writer, 3) Critical review by Critic, 4) Final integration and revisions led by me. Timeline: 2 days for research, 2 days for writing, 1 day for review, 1 day for integration."
             ],
-            start_to_close_timeout=timedelta(seconds=15),
+            **options(make_proposal),
         )
         
         # Get feedback from team members
@@ -105,7 +274,7 @@ class CollaborativeAgentWorkflow:
                 project_plan_proposal["message_id"],
                 project_plan_proposal["conversation_id"]
             ],
-            start_to_close_timeout=timedelta(seconds=10),
+            **options(provide_feedback),
         )
         
         # Resolve disagreement on timeline
@@ -119,52 +288,64 @@ class CollaborativeAgentWorkflow:
                     "3 days for research is needed for thorough investigation"
                 ]
             ],
-            start_to_close_timeout=timedelta(seconds=15),
+            **options(resolve_agent_disagreement),
         )
         
         # STAGE 2: COLLABORATIVE RESEARCH
+        self._phase = "research"
         print(f"\n{'='*20} COLLABORATIVE RESEARCH PHASE {'='*20}\n")
         
-        # Conduct collaborative research with all agents
-        research_result, research_thinking, research_conversation_id = await workflow.execute_activity(
-            collaborative_research,
-            args=[researcher, [critic, integrator], research_topic],
-            start_to_close_timeout=timedelta(minutes=5),
-        )
-        
-        # Log each detailed thinking step from research
-        for thinking_step in research_thinking:
-            thinking_record = await workflow.execute_activity(
-                researcher_detailed_thinking,
-                args=[researcher, thinking_step],
-                start_to_close_timeout=timedelta(seconds=10),
-            )
-            all_thinking.append(thinking_record)
+        # Conduct collaborative research with all agents, unless it was shared with this run
+        if research is None:
+            research = await run_research(researcher, [critic, integrator], research_topic, options)
+        else:
+            print(f"Reusing research on '{research['research_topic']}' from conversation {research['conversation_id']}")
+        research_result = research["findings"]
+        research_conversation_id = research["conversation_id"]
+        research_thinking = research.get("thinking", [])
+        all_thinking.extend(research_thinking)
+        self._partial_output = research_result
         
         # Get the conversation history from the research phase
         research_conversation = await workflow.execute_activity(
             get_conversation_history,
             args=[research_conversation_id],
-            start_to_close_timeout=timedelta(seconds=10),
+            **options(get_conversation_history),
         )
         all_conversations.append({"phase": "research", "conversation": research_conversation})
         
         # STAGE 3: COLLABORATIVE WRITING
+        self._phase = "writing"
         print(f"\n{'='*20} COLLABORATIVE WRITING PHASE {'='*20}\n")
         
-        # Writer creates report with collaboration from other agents
-        final_report, writing_thinking, writing_conversation_id = await workflow.execute_activity(
-            collaborative_report_writing,
-            args=[writer, [researcher, critic, integrator], report_title, research_result],
-            start_to_close_timeout=timedelta(minutes=5),
-        )
+        # Writer creates report with collaboration from other agents, returned as addressable sections
+        # (runs from before the change got the rendered report, and revised nothing afterwards)
+        report_sections = None
+        if workflow.patched(PATCH_REPORT_SECTIONS):
+            report_sections, writing_thinking, writing_conversation_id = await workflow.execute_activity(
+                collaborative_report_writing,
+                args=[writer, [researcher, critic, integrator], report_title, research_result],
+                **options(collaborative_report_writing),
+                # Short heartbeat timeout so a dead worker is noticed and the retry resumes from its checkpoint
+                heartbeat_timeout=timedelta(seconds=30),
+            )
+            final_report = render_report(report_sections)
+        else:
+            final_report, writing_thinking, writing_conversation_id = await workflow.execute_activity(
+                "collaborative_report_writing",
+                args=[writer, [researcher, critic, integrator], report_title, research_result],
+                result_type=Tuple[str, List[ThinkingStep], str],
+                **options(collaborative_report_writing),
+                heartbeat_timeout=timedelta(seconds=30),
+            )
+        self._partial_output = final_report
         
         # Log each detailed thinking step from writing
         for thinking_step in writing_thinking:
             thinking_record = await workflow.execute_activity(
                 writer_detailed_thinking,
                 args=[writer, thinking_step],
-                start_to_close_timeout=timedelta(seconds=10),
+                **options(writer_detailed_thinking),
             )
             all_thinking.append(thinking_record)
         
@@ -172,62 +353,287 @@ class CollaborativeAgentWorkflow:
         writing_conversation = await workflow.execute_activity(
             get_conversation_history,
             args=[writing_conversation_id],
-            start_to_close_timeout=timedelta(seconds=10),
+            **options(get_conversation_history),
         )
         all_conversations.append({"phase": "writing", "conversation": writing_conversation})
         
         # STAGE 4: FINAL REVIEW AND FEEDBACK
+        self._phase = "review"
         print(f"\n{'='*20} FINAL REVIEW PHASE {'='*20}\n")
         
-        # Critic provides final feedback on the report
-        final_feedback_message = await workflow.execute_activity(
-            provide_feedback,
-            args=[
-                critic,
-                writer,
-                "The report is comprehensive but could use more specific implementation examples in the recommendations section.",
-                "final_report",  # Treating the report itself as the "message" being responded to
-                writing_conversation_id
-            ],
-            start_to_close_timeout=timedelta(seconds=15),
-        )
+        # The critic gives the final feedback; further rounds rotate through the integrator and
+        # any additional reviewers
+        revised_sections = []
+        feedback = "The report is comprehensive but could use more specific implementation examples in the recommendations section."
+        for round_number in range(max(1, feedback_rounds)):
+            reviewer = reviewers[round_number % len(reviewers)]
+            if round_number > 0:
+                feedback = f"Round {round_number + 1} review: the revision addresses earlier feedback; tighten the summary further."
+            
+            # Reviewer provides feedback on the report
+            final_feedback_message = await workflow.execute_activity(
+                provide_feedback,
+                args=[
+                    reviewer,
+                    writer,
+                    feedback,
+                    "final_report",  # Treating the report itself as the "message" being responded to
+                    writing_conversation_id
+                ],
+                **options(provide_feedback),
+            )
+            
+            # Writer responds to feedback
+            writer_response = await workflow.execute_activity(
+                agent_response_to_feedback,
+                args=[
+                    writer,
+                    final_feedback_message["content"],
+                    report_title
+                ],
+                **options(agent_response_to_feedback),
+            )
+            
+            if report_sections is None:
+                continue
+            
+            # Writer revises only the sections the feedback targets; only those come back
+            changed_sections = await workflow.execute_activity(
+                revise_report_sections,
+                args=[
+                    writer,
+                    [researcher, critic, integrator],
+                    report_title,
+                    research_result,
+                    report_sections,
+                    final_feedback_message["content"],
+                    writing_conversation_id
+                ],
+                **options(revise_report_sections),
+            )
+            report_sections = apply_section_updates(report_sections, changed_sections)
+            revised_sections.append([section.key for section in changed_sections])
+            final_report = render_report(report_sections)
+            self._partial_output = final_report
         
-        # Writer responds to feedback
-        writer_response = await workflow.execute_activity(
-            agent_response_to_feedback,
-            args=[
-                writer,
-                final_feedback_message["content"],
-                report_title
-            ],
-            start_to_close_timeout=timedelta(seconds=15),
-        )
+        self._final_report = final_report
+        self._writer_response = writer_response
+        
+        # Keep the report body out of the result: store it and return its id (None for runs from
+        # before the report store; their report is served by the get_report query)
+        report_id = None
+        if workflow.patched(PATCH_STORE_REPORT):
+            report_id = await workflow.execute_activity(
+                store_report,
+                args=[final_report],
+                **options(store_report),
+            )
         
         # Print thinking summary
+        message_counts = {conv["phase"]: len(conv["conversation"]) for conv in all_conversations}
         print(f"\n{'='*20} COLLABORATION SUMMARY {'='*20}")
         print(f"Total thinking steps recorded: {len(all_thinking)}")
         print(f"Research thinking steps: {len(research_thinking)}")
         print(f"Writing thinking steps: {len(writing_thinking)}")
         print(f"Total conversations: {len(all_conversations)}")
-        print(f"Total messages exchanged: {sum(len(conv['conversation']) for conv in all_conversations if 'conversation' in conv)}")
+        print(f"Total messages exchanged: {sum(message_counts.values())}")
+        
+        self._phase = "completed"
         
-        # Return comprehensive results
+        # Return a compact result: ids, hashes and counts. The report, conversations, thinking
+        # records and writer response are available through the queries above.
         result = {
-            "final_report": final_report,
+            "report": {
+                "report_id": report_id,
+                "characters": len(final_report),
+                "section_hashes": {section.key: section.content_hash for section in report_sections or []},
+            },
             "collaborative_process": {
                 "thinking_steps": len(all_thinking),
-                "conversations": all_conversations,
+                "messages": message_counts,
                 "research_conversation_id": research_conversation_id,
+                "research_cached": "cached_at" in research,
                 "writing_conversation_id": writing_conversation_id,
-                "final_feedback": final_feedback_message["content"],
-                "writer_response": writer_response
+                "feedback_rounds": max(1, feedback_rounds),
+                "final_feedback_message_id": final_feedback_message["message_id"],
+                "revised_sections": revised_sections,
+                "changes_planned": len(writer_response.get("changes_planned", []))
             },
             "team": {
                 "researcher": researcher.name,
                 "writer": writer.name,
                 "critic": critic.name,
-                "integrator": integrator.name
+                "integrator": integrator.name,
+                **{f"reviewer_{number}": reviewer.name for number, reviewer in enumerate(extra, 1)}
             }
         }
         
-        return result 
\ No newline at end of file
+        return result
+
+@workflow.defn
+class ResearchWorkflow:
+    """The research phase on its own, run once per distinct topic in a batch"""
+    def __init__(self) -> None:
+        self._thinking: List[Dict[str, Any]] = []
+    
+    @workflow.query
+    def get_thinking(self) -> List[Dict[str, Any]]:
+        """Return every detailed thinking record"""
+        return self._thinking
+    
+    @workflow.run
+    async def run(self, research_topic: str) -> Dict[str, Any]:
+        options = await fetch_policies()
+        researcher = await workflow.execute_activity(setup_researcher_agent, **options(setup_researcher_agent))
+        critic = await workflow.execute_activity(setup_critic_agent, **options(setup_critic_agent))
+        integrator = await workflow.execute_activity(setup_integrator_agent, **options(setup_integrator_agent))
+        
+        research = await run_research(researcher, [critic, integrator], research_topic, options)
+        self._thinking = research.pop("thinking")
+        # The thinking records stay here (see get_thinking); the reports only need the findings
+        return research
+
+@workflow.defn
+class BatchReportWorkflow:
+    """Write one report per (research_topic, report_title) request, researching each distinct
+    topic only once. Each topic runs as a ResearchWorkflow child whose findings fan out to a
+    CollaborativeAgentWorkflow child per report. At most `max_concurrent` children (research and
+    report alike) run at once, so a large batch neither floods the task queues nor starts
+    thousands of children in one workflow task. An `admitted` batch instead starts each child
+    on a place its starter was granted by the admission controller (grant_places), and the
+    starter gives the place back once get_progress shows the child finished. Children keep
+    their own histories, but every child still adds events to this one, so split very large
+    batches (thousands of requests)."""
+    def __init__(self) -> None:
+        self._requests = 0
+        self._topics = 0
+        self._completed = 0
+        self._failed = 0
+        self._running = 0
+        self._max_concurrent = BATCH_MAX_CONCURRENT
+        self._admitted = False
+        self._granted = 0  # Admission places granted to an admitted batch so far
+        self._waiting = 0  # Children waiting for the window or a place
+        self._started = 0
+        self._finished = 0
+    
+    @workflow.query
+    def get_progress(self) -> Dict[str, Any]:
+        """Return the number of requests, distinct topics, finished reports and children waiting,
+        running and finished"""
+        return {"requests": self._requests, "distinct_topics": self._topics,
+                "completed": self._completed, "failed": self._failed,
+                "waiting": self._waiting, "running": self._running, "finished": self._finished,
+                "max_concurrent": self._max_concurrent, "granted": self._granted}
+    
+    @workflow.signal
+    def grant_places(self, count: int) -> None:
+        """Let an admitted batch start `count` more children"""
+        self._granted += count
+    
+    def _has_room(self) -> bool:
+        if self._admitted:
+            return self._started < self._granted
+        return self._running < self._max_concurrent
+    
+    async def _execute_child(self, run_fn: Any, **kwargs: Any) -> Any:
+        """Run a child workflow once the window (or a granted place) has room for it"""
+        # Every waiting condition is checked in the same pass, so several waiters can wake for
+        # one free slot; each checks again before taking it
+        self._waiting += 1
+        try:
+            while not self._has_room():
+                await workflow.wait_condition(self._has_room)
+        finally:
+            self._waiting -= 1
+        self._started += 1
+        self._running += 1
+        try:
+            return await workflow.execute_child_workflow(run_fn, **kwargs)
+        finally:
+            self._running -= 1
+            self._finished += 1
+    
+    @workflow.run
+    async def run(self, requests: List[Dict[str, str]], feedback_rounds: int = 1,
+                  max_concurrent: int = BATCH_MAX_CONCURRENT, admitted: bool = False) -> Dict[str, Any]:
+        # Group requests by normalized topic, keeping the order in which topics first appear
+        groups: Dict[str, List[int]] = {}
+        for index, request in enumerate(requests):
+            groups.setdefault(normalize_topic(request["research_topic"]), []).append(index)
+        self._requests = len(requests)
+        self._topics = len(groups)
+        # Batches started before the window ran every child (one per topic and request) at once
+        if workflow.patched(PATCH_BATCH_WINDOW):
+            self._max_concurrent = max(1, max_concurrent)
+            self._admitted = admitted
+        else:
+            self._max_concurrent = len(groups) + len(requests)
+        batch_id = workflow.info().workflow_id
+        reports: List[Dict[str, Any]] = [
+            {"research_topic": request["research_topic"], "report_title": request["report_title"]}
+            for request in requests
+        ]
+        
+        async def write_report(index: int, research: Dict[str, Any], research_id: str) -> None:
+            request = requests[index]
+            report_id = f"{batch_id}-report-{index}"
+            reports[index].update({"research_workflow_id": research_id, "workflow_id": report_id})
+            try:
+                result = await self._execute_child(
+                    CollaborativeAgentWorkflow.run,
+                    args=[request["research_topic"], request["report_title"], feedback_rounds, research],
+                    id=report_id,
+                )
+                reports[index]["report_id"] = result["report"]["report_id"]
+                self._completed += 1
+            except ChildWorkflowError as e:
+                reports[index]["error"] = str(e.cause or e)
+                self._failed += 1
+        
+        async def research_topic(number: int, indexes: List[int]) -> None:
+            research_id = f"{batch_id}-research-{number}"
+            try:
+                research = await self._execute_child(
+                    ResearchWorkflow.run, arg=requests[indexes[0]]["research_topic"], id=research_id,
+                )
+            except ChildWorkflowError as e:
+                for index in indexes:
+                    reports[index].update({"research_workflow_id": research_id, "error": str(e.cause or e)})
+                self._failed += len(indexes)
+                return
+            await asyncio.gather(*[write_report(index, research, research_id) for index in indexes])
+        
+        await asyncio.gather(*[research_topic(number, indexes)
+                               for number, indexes in enumerate(groups.values())])
+        return {
+            "requests": len(requests),
+            "distinct_topics": len(groups),
+            "research_phases_saved": len(requests) - len(groups),
+            "completed": self._completed,
+            "failed": self._failed,
+            "reports": reports,
+        }
+
+@workflow.defn
+class MessageLogAnalyticsWorkflow:
+    """Bring the search index up to date with the message log and summarize the log for capacity
+    planning. Both activities are CPU-bound, so the worker runs them on its thread or process
+    pool (activity_executors.DEFAULT_EXECUTION) instead of its event loop."""
+    @workflow.run
+    async def run(self, log_dir: str) -> Dict[str, Any]:
+        options = await fetch_policies(ANALYTICS_ACTIVITY_NAMES)
+        # Plain functions wrapped per execution mode on the worker, so they are called by name
+        indexed = await workflow.execute_activity(
+            reindex_message_log.__name__,
+            log_dir,
+            result_type=int,
+            **options(reindex_message_log),
+        )
+        summary = await workflow.execute_activity(
+            analyze_message_log.__name__,
+            log_dir,
+            result_type=Dict[str, Any],
+            **options(analyze_message_log),
+        )
+        return {"indexed": indexed, "summary": summary}
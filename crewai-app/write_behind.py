@@ -0,0 +1,139 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import os
+import queue
+import threading
+from message_log import MessageLog
+
+# Durability modes for persisted messages:
+#   flush           - return once the writer thread has written (and flushed) the message
+#   fire_and_forget - return as soon as the message is queued; a crash can lose queued messages
+#   inline          - write on the calling thread, blocking the event loop (the old behavior)
+DURABILITY_FLUSH = "flush"
+DURABILITY_FIRE_AND_FORGET = "fire_and_forget"
+DURABILITY_INLINE = "inline"
+MESSAGE_LOG_DURABILITY = os.environ.get("MESSAGE_LOG_DURABILITY", DURABILITY_FLUSH)
+
+# Queued messages beyond this make senders wait (backpressure) instead of growing memory
+WRITE_QUEUE_SIZE = int(os.environ.get("MESSAGE_LOG_QUEUE_SIZE", "10000"))
+WRITE_BATCH_SIZE = int(os.environ.get("MESSAGE_LOG_BATCH_SIZE", "500"))
+
+Record = Tuple[str, Optional[str], Dict[str, Any]]
+
+class WriteBehindWriter:
+    """Persist messages from a dedicated thread, in batches, off the worker's event loop
+
+    Records go into a bounded queue; the writer thread takes whatever has accumulated (up to
+    a batch), appends it to the log with one write, runs `after_write` on the batch (e.g.
+    search indexing) and then resolves the futures of senders waiting for durability. The
+    write is traced as one "messages.persist" span linked to the span of each sender.
+    """
+
+    def __init__(self, log: MessageLog, after_write: Optional[Callable[[List[Record]], None]] = None,
+                 durability: str = MESSAGE_LOG_DURABILITY, queue_size: int = WRITE_QUEUE_SIZE,
+                 batch_size: int = WRITE_BATCH_SIZE):
+        self.log = log
+        self.after_write = after_write
+        self.durability = durability
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches_written = 0
+        self.records_written = 0
+        self.backpressure_waits = 0
+
+    # The thread starts on first use, never at import
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+                self._thread.start()
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, record: Record, durability: Optional[str] = None) -> None:
+        """Queue a record for writing, waiting for the write itself when durability is 'flush'"""
+        from tracing import current_link
+        durability = durability or self.durability
+        if durability == DURABILITY_INLINE:
+            self._write([record])
+            return
+
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        done = loop.create_future() if durability == DURABILITY_FLUSH else None
+        item = (record, loop, done, current_link())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Backpressure: wait for room on a helper thread, so the event loop keeps running
+            self.backpressure_waits += 1
+            from metrics import record_write_backpressure
+            record_write_backpressure()
+            await asyncio.to_thread(self._queue.put, item)
+        if done is not None:
+            await done
+
+    def _write(self, records: List[Record], links: Optional[List[Any]] = None) -> None:
+        from tracing import span
+        with span("messages.persist", links=links, **{"messages.batch_size": len(records)}):
+            self.log.append_batch(records)
+        if self.after_write is not None:
+            try:
+                self.after_write(records)
+            except Exception as e:
+                print(f"Warning: Post-write hook failed: {e}")
+        self.batches_written += 1
+        self.records_written += len(records)
+
+    def _run(self) -> None:
+        from metrics import record_write_queue_depth
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            # Take everything else already queued, up to a batch, without waiting for more
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True  # Finish this batch, then stop
+                    break
+                batch.append(item)
+
+            error = None
+            try:
+                self._write([record for record, _, _, _ in batch],
+                            [link for _, _, _, link in batch if link is not None])
+            except Exception as e:
+                error = e
+                print(f"Warning: Could not save message log batch: {e}")
+            for _, loop, done, _ in batch:
+                if done is not None:
+                    try:
+                        loop.call_soon_threadsafe(_resolve, done, error)
+                    except RuntimeError:
+                        # The sender's event loop closed during shutdown; nobody is waiting anymore,
+                        # and the rest of the queue still has to be written
+                        print("Warning: Could not confirm a message log write to a closed event loop")
+            record_write_queue_depth(self._queue.qsize())
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Write everything still queued, then stop the writer thread"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+def _resolve(future: asyncio.Future, error: Optional[BaseException]) -> None:
+    if future.done():
+        return  # The waiting sender was cancelled
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)